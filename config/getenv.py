@@ -29,6 +29,7 @@ class GetEnv:
         self.MEMORY_SECTION = "MEMORY"
         self.EVAL_SECTION = "EVAL"
         self.MONITORING_SECTION = "MONITORING"
+        self.ROUTER_SECTION = "ROUTER"
         self.props.read(self.config_path, encoding='utf-8')
 
     def _ensure_dir(self, path : Union[str, os.PathLike]):
@@ -77,11 +78,97 @@ class GetEnv:
         playbook_config = self.props[self.PLAYBOOK_SECTION]
         return playbook_config
     
+    @property
+    def get_query_rewrite_policy(self) -> str:
+        return self.props.get(self.PLAYBOOK_SECTION, 'QUERY_REWRITE', fallback='auto').strip() or 'auto'
+
+    @property
+    def get_short_query_max_words(self) -> int:
+        return self.props.getint(self.PLAYBOOK_SECTION, 'SHORT_QUERY_MAX_WORDS', fallback=12)
+
+    @property
+    def get_retrieval_mode(self) -> str:
+        return self.props.get(self.PLAYBOOK_SECTION, 'RETRIEVAL_MODE', fallback='serial').strip().lower() or 'serial'
+
+    @property
+    def get_rewrite_deadline_ms(self) -> float:
+        return self.props.getfloat(self.PLAYBOOK_SECTION, 'REWRITE_DEADLINE_MS', fallback=800.0)
+
+    @property
+    def get_retrieval_merge_policy(self) -> str:
+        return self.props.get(self.PLAYBOOK_SECTION, 'MERGE_POLICY', fallback='rrf').strip().lower() or 'rrf'
+
+    @property
+    def get_speculative_retrieval(self) -> bool:
+        return self.props.getboolean(self.PLAYBOOK_SECTION, 'SPECULATIVE_RETRIEVAL', fallback=False)
+
+    @property
+    def get_router_mode(self) -> str:
+        return self.props.get(self.ROUTER_SECTION, 'ROUTER_MODE', fallback='llm').strip().lower() or 'llm'
+
+    @property
+    def get_router_chain(self) -> str:
+        return self.props.get(self.ROUTER_SECTION, 'ROUTER_CHAIN', fallback='separate').strip().lower() or 'separate'
+
+    @property
+    def get_router_confidence_margin(self) -> float:
+        return self.props.getfloat(self.ROUTER_SECTION, 'CONFIDENCE_MARGIN', fallback=0.05)
+
+    @property
+    def get_router_online_learning(self) -> bool:
+        return self.props.getboolean(self.ROUTER_SECTION, 'ONLINE_LEARNING', fallback=True)
+
+    @property
+    def get_router_max_examples(self) -> int:
+        return self.props.getint(self.ROUTER_SECTION, 'MAX_EXAMPLES', fallback=2000)
+
+    @property
+    def get_router_db_path(self):
+        router_db_name = self.props.get(self.ROUTER_SECTION, 'ROUTER_DB_NAME', fallback='router_examples.db')
+        return os.path.join(self.get_db_dir, router_db_name)
+
     @property
     def get_memory_config(self):
         memory_config = self.props[self.MEMORY_SECTION]
         return memory_config
     
+    @property
+    def get_memory_backend(self) -> str:
+        return self.props.get(self.MEMORY_SECTION, 'MEMORY_BACKEND', fallback='redis').strip().lower()
+
+    @property
+    def get_memory_db_path(self):
+        memory_db_name = self.props.get(self.MEMORY_SECTION, 'MEMORY_DB_NAME', fallback='chat_memory.db')
+        return os.path.join(self.get_db_dir, memory_db_name)
+
+    @property
+    def get_history_retention(self) -> int:
+        return self.props.getint(self.MEMORY_SECTION, 'HISTORY_RETENTION', fallback=200)
+
+    @property
+    def get_session_ttl(self) -> int:
+        return self.props.getint(self.MEMORY_SECTION, 'SESSION_TTL', fallback=604800)
+
+    @property
+    def get_history_token_budget(self) -> int:
+        return self.props.getint(self.MEMORY_SECTION, 'HISTORY_TOKEN_BUDGET', fallback=0)
+
+    @property
+    def get_summary_trigger(self) -> int:
+        return self.props.getint(self.MEMORY_SECTION, 'SUMMARY_TRIGGER', fallback=0)
+
+    @property
+    def get_recall_top_k(self) -> int:
+        return self.props.getint(self.MEMORY_SECTION, 'RECALL_TOP_K', fallback=0)
+
+    @property
+    def get_recall_threshold(self) -> float:
+        return self.props.getfloat(self.MEMORY_SECTION, 'RECALL_THRESHOLD', fallback=0.5)
+
+    @property
+    def get_session_cache_size(self) -> int:
+        return self.props.getint(self.MEMORY_SECTION, 'SESSION_CACHE_SIZE', fallback=0)
+
     @property
     def get_redis_port(self):
         return os.getenv("REDIS_PORT", 6379)
@@ -109,6 +196,44 @@ class GetEnv:
     @property
     def get_embedding_gpu(self):
         return self.props.getboolean(self.EMBEDDING_SECTION, 'USE_GPU')
+
+    @property
+    def get_embedding_precision(self) -> str:
+        return self.props.get(self.EMBEDDING_SECTION, 'PRECISION', fallback='fp32').strip() or 'fp32'
+
+    @property
+    def get_embedding_output_dimension(self) -> int | None:
+        output_dimension = self.props.get(self.EMBEDDING_SECTION, 'OUTPUT_DIMENSION', fallback='').strip()
+        return int(output_dimension) if output_dimension else None
+
+    @property
+    def get_embedding_cache_enabled(self) -> bool:
+        return self.props.getboolean(self.EMBEDDING_SECTION, 'EMBEDDING_CACHE', fallback=True)
+
+    @property
+    def get_embedding_cache_memory_size(self) -> int:
+        return self.props.getint(self.EMBEDDING_SECTION, 'CACHE_MEMORY_SIZE', fallback=2048)
+
+    @property
+    def get_embedding_cache_disk_size(self) -> int:
+        return self.props.getint(self.EMBEDDING_SECTION, 'CACHE_DISK_SIZE', fallback=50000)
+
+    @property
+    def get_embedding_workers(self) -> int:
+        return self.props.getint(self.EMBEDDING_SECTION, 'EMBEDDING_WORKERS', fallback=1)
+
+    @property
+    def get_embedding_batch_window_ms(self) -> float:
+        return self.props.getfloat(self.EMBEDDING_SECTION, 'BATCH_WINDOW_MS', fallback=5.0)
+
+    @property
+    def get_embedding_max_batch_size(self) -> int:
+        return self.props.getint(self.EMBEDDING_SECTION, 'MAX_BATCH_SIZE', fallback=32)
+
+    @property
+    def get_embedding_cache_path(self):
+        cache_db_name = self.props.get(self.EMBEDDING_SECTION, 'CACHE_DB_NAME', fallback='embedding_cache.db')
+        return os.path.join(self.get_db_dir, cache_db_name)
     
     @property
     def get_db_dir(self):
@@ -138,6 +263,50 @@ class GetEnv:
         vector_store_name = self.get_database_config['VECTOR_STORE_NAME']
         return vector_store_name
     
+    @property
+    def get_vector_backend(self) -> str:
+        return self.props.get(self.DATABASE_SECTION, 'VECTOR_BACKEND', fallback='qdrant').strip().lower()
+
+    @property
+    def get_qdrant_profile(self) -> str:
+        return self.props.get(self.DATABASE_SECTION, 'QDRANT_PROFILE', fallback='default').strip().lower()
+
+    @property
+    def get_qdrant_hnsw_m(self) -> int:
+        return self.props.getint(self.DATABASE_SECTION, 'HNSW_M', fallback=32)
+
+    @property
+    def get_qdrant_hnsw_ef_construct(self) -> int:
+        return self.props.getint(self.DATABASE_SECTION, 'HNSW_EF_CONSTRUCT', fallback=200)
+
+    @property
+    def get_qdrant_search_ef(self) -> int:
+        return self.props.getint(self.DATABASE_SECTION, 'HNSW_EF', fallback=128)
+
+    @property
+    def get_qdrant_quantization_rescore(self) -> bool:
+        return self.props.getboolean(self.DATABASE_SECTION, 'QUANTIZATION_RESCORE', fallback=True)
+
+    @property
+    def get_qdrant_quantization_oversampling(self) -> float:
+        return self.props.getfloat(self.DATABASE_SECTION, 'QUANTIZATION_OVERSAMPLING', fallback=2.0)
+
+    @property
+    def get_qdrant_on_disk_vectors(self) -> bool:
+        return self.props.getboolean(self.DATABASE_SECTION, 'ON_DISK_VECTORS', fallback=True)
+
+    @property
+    def get_in_memory_index(self) -> bool:
+        return self.props.getboolean(self.DATABASE_SECTION, 'IN_MEMORY_INDEX', fallback=False)
+
+    @property
+    def get_reconcile_on_startup(self) -> bool:
+        return self.props.getboolean(self.DATABASE_SECTION, 'RECONCILE_ON_STARTUP', fallback=True)
+
+    @property
+    def get_reconcile_interval(self) -> float:
+        return self.props.getfloat(self.DATABASE_SECTION, 'RECONCILE_INTERVAL', fallback=300)
+
     @property
     def get_vector_store_path(self):
         vector_store_name = self.get_vector_store_name
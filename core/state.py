@@ -19,7 +19,13 @@ class State(TypedDict):
     solution : Optional[str]
     verbose : Optional[bool]
     router_decision : str
+    router_source : NotRequired[Literal["llm", "embedding"]]
+    search_query : NotRequired[str]
+    # set by the speculative router when the fused chain will deliver `search_query`
+    skip_query_rewrite : NotRequired[bool]
     session_id : str
+    chat_history : NotRequired[list]
+    timings : NotRequired[dict[str, float]]
 
     # model
     llm_provider : Literal["openai", "anthropic", "google"]
@@ -28,6 +34,7 @@ class State(TypedDict):
     # playbook retrieve
     retrieved_bullets : list[PlaybookEntry]
     used_bullet_ids : list[str]
+    retrieval_path : NotRequired[str]
 
     # learning state
     trajectory : list[str]
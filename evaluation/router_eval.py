@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import asyncio
+import csv
+
+from config.getenv import GetEnv
+from utils import Logger
+from module.db_management import get_vector_store_instance
+from module.semantic_router import SemanticRouter
+from node.nodes import router_chain
+
+env = GetEnv()
+logger = Logger(__name__)
+
+# used when no query file is given (one query per line)
+DEFAULT_QUERIES = [
+    "Hello!",
+    "What time zone is Seoul in?",
+    "Who painted the Mona Lisa?",
+    "Translate 'good morning' to Japanese.",
+    "What is 12 * 12?",
+    "Thank you so much",
+    "What does HTTP stand for?",
+    "Is a tomato a fruit?",
+    "파이썬에서 현재 날짜와 시간을 구하는 가장 기본적인 코드를 알려줘.",
+    "파이썬 리스트에서 중복을 제거하면서 순서를 유지하는 방법은?",
+    "How can I make my SQL query with three joins faster?",
+    "Write a Python function that parses a CSV file and returns the average of a column.",
+    "Design a caching layer for a REST API with Redis.",
+    "My asyncio code deadlocks when I call run_until_complete inside a coroutine. Why?",
+    "Plan a week-long study schedule for learning linear algebra.",
+    "Write a cover letter for a backend engineer position.",
+    "Explain the difference between a process and a thread.",
+    "What is the boiling point of water?",
+    "Refactor this function to avoid the nested loops.",
+    "Which of the two bands was formed first, given the context below?",
+]
+
+async def main(query_file : str = None, provider : str = "openai", model : str = None):
+    if query_file:
+        with open(query_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = DEFAULT_QUERIES
+
+    embedding_model = get_vector_store_instance().get_embedding_model
+    # no online learning here : the evaluation must not change the stored examples
+    semantic_router = SemanticRouter(
+        confidence_margin=env.get_router_confidence_margin,
+        max_examples=env.get_router_max_examples
+    ).load(embedding_model)
+
+    csv_path = os.path.join(env.get_log_dir, 'router_eval.csv')
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["query", "llm_route", "local_route", "margin", "llm_ms", "local_ms"])
+
+    decided = agreed = 0
+    saved_ms = 0.0
+    total_llm_ms = 0.0
+
+    for query in queries:
+        start = time.perf_counter()
+        result = await router_chain.ainvoke(
+            {"query" : query},
+            config={"configurable" : {"llm_provider" : provider, "llm_model" : model}}
+        )
+        llm_ms = (time.perf_counter() - start) * 1000
+        llm_route = result.get("route", "complex")
+
+        start = time.perf_counter()
+        local_route, margin = semantic_router.classify(await embedding_model.aembed_query(query))
+        local_ms = (time.perf_counter() - start) * 1000
+
+        total_llm_ms += llm_ms
+        if local_route is not None:
+            decided += 1
+            agreed += int(local_route == llm_route)
+            saved_ms += llm_ms - local_ms
+
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([query, llm_route, local_route or "", f"{margin:.4f}", f"{llm_ms:.1f}", f"{local_ms:.1f}"])
+
+    coverage = decided / len(queries)
+    agreement = agreed / decided if decided else 0.0
+    logger.info(f"queries : {len(queries)} | decided locally : {decided} ({coverage:.1%}) | agreement with LLM : {agreement:.1%}")
+    logger.info(f"LLM routing total : {total_llm_ms:.0f}ms | saved : {saved_ms:.0f}ms ({saved_ms / len(queries):.0f}ms per query)")
+    logger.info(f"results saved at {csv_path}")
+
+if __name__ == "__main__":
+    # usage : python -m evaluation.router_eval [query_file] [provider] [model]
+    asyncio.run(main(*sys.argv[1:]))
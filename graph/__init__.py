@@ -1,3 +1,3 @@
 from .full_graph import create_full_graph
-from .serving_graph import create_serving_graph
+from .serving_graph import create_serving_graph, create_speculative_serving_graph
 from .learning_graph import create_learning_graph
\ No newline at end of file
@@ -24,6 +24,7 @@ async def solution_stream(graph : "CompiledStateGraph", input_data, capture_cont
     # 로그 추적 대상 노드
     NODE_LOG_MAP = {
         "router": "Router: Analyzing query...",
+        "speculative_router": "Router: Analyzing query while searching Playbook...",
         "retriever": "Retriever: Searching Playbook...",
         "simple_generator": "Simple Generator: Generating response...",
         "generator": "Generator: Thinking with Playbook...",
@@ -49,11 +50,15 @@ async def solution_stream(graph : "CompiledStateGraph", input_data, capture_cont
                 # Router
                 if "router_decision" in output:
                     capture_container["router_decision"] = output["router_decision"]
+                if "timings" in output:
+                    capture_container["timings"] = output["timings"]
                 # Retriever
                 if "retrieved_bullets" in output:
                     capture_container["retrieved_bullets"] = output["retrieved_bullets"]
                     if "playbook" in output:
                         capture_container["playbook"] = output["playbook"]
+                    if "retrieval_path" in output:
+                        capture_container["retrieval_path"] = output["retrieval_path"]
                 # Generator
                 if "used_bullet_ids" in output:
                     capture_container["used_bullet_ids"] = output["used_bullet_ids"]
@@ -5,7 +5,7 @@ import shutil
 
 from config.getenv import GetEnv
 from core.state import State
-from node.nodes import generator_node, retriever_playbook_node, router_node, simple_generator_node
+from node.nodes import generator_node, retriever_playbook_node, router_node, simple_generator_node, speculative_router_node
 
 def decide_route(state : State):
     if state.get("router_decision") == 'simple':
@@ -39,4 +39,31 @@ def create_serving_graph():
     builder.add_edge("retriever", "generator")
     builder.add_edge("generator", END)
 
-    return builder.compile()
\ No newline at end of file
+    return builder.compile()
+
+def create_speculative_serving_graph():
+    """
+    Serving graph where playbook retrieval and the history fetch run concurrently with the router.
+    """
+    builder = StateGraph(State)
+
+    # Nodes
+    builder.add_node("speculative_router", speculative_router_node)
+    builder.add_node("simple_generator", simple_generator_node)
+    builder.add_node("generator", generator_node)
+
+    # Edges
+    builder.add_edge(START, 'speculative_router')
+    # same decision as the regular graph; retrieval already ran inside the speculative router
+    builder.add_conditional_edges(
+        "speculative_router",
+        decide_route,
+        {
+            "simple_generator" : "simple_generator",
+            "retriever" : "generator"
+        }
+    )
+    builder.add_edge("simple_generator", END)
+    builder.add_edge("generator", END)
+
+    return builder.compile()
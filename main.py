@@ -11,11 +11,14 @@ import torch
 
 from utils import Logger
 from core import State, ChatRequest
-from graph import create_serving_graph, create_learning_graph, create_full_graph
+from graph import create_serving_graph, create_speculative_serving_graph, create_learning_graph, create_full_graph
 from graph.graph_utils import solution_stream, initialize_langsmith_tracking
 from config.getenv import GetEnv
-from module.memory import RedisMemoryManager
-from module.db_management import get_db_instance, get_vector_store_instance, reset_all_stores
+from module.memory import get_memory_manager, close_memory_manager
+from module.db_management import get_vector_store_instance, reset_all_stores, close_async_db
+from module.semantic_router import get_semantic_router
+from module.reconciler import get_playbook_write_lock, run_reconcile, run_periodic_reconcile
+from node.nodes import summarize_history
 
 env = GetEnv()
 logger = Logger(__name__)
@@ -24,8 +27,38 @@ serving_graph = None
 learning_graph = None
 full_graph = None
 memory_manager = None
+reconcile_task = None
+# the loop only keeps weak references to tasks; hold background work until it is done
+background_tasks : set[asyncio.Task] = set()
 backend_port = int(os.getenv("BACKEND_PORT"))
 
+def _background_done(task : asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_coro().__name__} failed : {task.exception()!r}")
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+def start_reconcile_task():
+    global reconcile_task
+    if env.get_reconcile_interval > 0:
+        reconcile_task = asyncio.create_task(run_periodic_reconcile(env.get_reconcile_interval))
+
+async def stop_reconcile_task():
+    global reconcile_task
+    if reconcile_task is None:
+        return
+    reconcile_task.cancel()
+    try:
+        await reconcile_task
+    except asyncio.CancelledError:
+        pass
+    reconcile_task = None
+
 @asynccontextmanager
 async def lifespan(app : FastAPI):
     global serving_graph, learning_graph, full_graph, memory_manager
@@ -33,14 +66,29 @@ async def lifespan(app : FastAPI):
 
     # graph
     initialize_langsmith_tracking()
-    serving_graph = create_serving_graph()
+    if env.get_speculative_retrieval:
+        serving_graph = create_speculative_serving_graph()
+    else:
+        serving_graph = create_serving_graph()
     learning_graph = create_learning_graph()
     full_graph = create_full_graph()
     # memory
-    memory_manager = RedisMemoryManager()
+    memory_manager = get_memory_manager()
+    # playbook vectors
+    get_vector_store_instance().load_index()
+    # repair vector store drift left by failed learning cycles
+    if env.get_reconcile_on_startup:
+        await run_reconcile()
+    start_reconcile_task()
+    if env.get_router_mode == "embedding":
+        get_semantic_router(get_vector_store_instance().get_embedding_model)
 
     yield
 
+    await stop_reconcile_task()
+    await close_async_db()
+    await close_memory_manager()
+
 app = FastAPI(title="ACE Framework API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
@@ -54,6 +102,18 @@ app.add_middleware(
 async def run_background_learning(state : State):
     await learning_graph.ainvoke(state)
 
+async def run_background_memory(session_id : str, query : str, solution : str, llm_provider : str, llm_model : str):
+    async def summarize(summary, messages):
+        return await summarize_history(summary, messages, llm_provider=llm_provider, llm_model=llm_model)
+    try:
+        await memory_manager.index_turn(session_id, query, solution)
+    except Exception as e:
+        logger.error(f"History indexing failed for session {session_id} : {e!r}")
+    try:
+        await memory_manager.compact_session(session_id, summarize)
+    except Exception as e:
+        logger.error(f"History compaction failed for session {session_id} : {e!r}")
+
 @app.get("/chat/history/{session_id}")
 async def get_chat_history(session_id : str):
     history = await memory_manager.get_history(session_id)
@@ -100,7 +160,7 @@ async def chat_stream(request : ChatRequest):
         "retrieval_topk": env.get_playbook_config['RETRIEVAL_TOP_K'],
     }
 
-    # memory : question
+    # memory : question (also prefetches the session into the shared history cache for the nodes)
     await memory_manager.save_user_message(sid, request.query)
 
     async def event_generator():
@@ -124,6 +184,8 @@ async def chat_stream(request : ChatRequest):
         # memory : answer
         result_state['session_id'] = sid
         await memory_manager.save_ai_message(sid, full_solution)
+        # index the turn for recall and fold old turns into the session summary, off the request path
+        run_in_background(run_background_memory(sid, request.query, full_solution, request.llm_provider, request.llm_model))
 
         if request.execution_mode == 'standard':
             route = result_state.get("router_decision", "complex")
@@ -131,7 +193,7 @@ async def chat_stream(request : ChatRequest):
                 # serving과 learning은 분리되어있어서 solution_stream으로 learning graph의 로그를 보여줄 수 없음
                 # log_msg = {"type" : "log", "content" : "Background Learning..."}
                 # yield f"data : {json.dumps(log_msg, ensure_ascii=False)}"
-                asyncio.create_task(run_background_learning(result_state))
+                run_in_background(run_background_learning(result_state))
             else:
                 # log_msg = {"type" : "log", "content" : "Full Cycle Completed"}
                 # yield f"data: {json.dumps(log_msg, ensure_ascii=False)}"
@@ -147,14 +209,24 @@ async def get_playbook_stats():
     try:
         vs = get_vector_store_instance()
         count = vs.get_doc_count()
-        return {"status" : "success", "count" : count}
+        cache_stats = getattr(vs.get_embedding_model, "stats", None)
+        service_metrics = getattr(vs.get_embedding_model, "metrics", None)
+        return {"status" : "success", "count" : count, "embedding_cache" : cache_stats, "embedding_service" : service_metrics}
     
     except Exception as e:
         return {"status" : "error", "count" : 0, "message" : str(e)}
     
 @app.delete("/playbook/reset")
 async def reset_playbook():
-    reset_all_stores(target='both')
+    # no reconcile or learning cycle may recreate points or rows while the stores are removed
+    await stop_reconcile_task()
+    try:
+        async with get_playbook_write_lock():
+            # the async engine keeps pooled connections to the file that is about to be removed
+            await close_async_db()
+            reset_all_stores(target='both')
+    finally:
+        start_reconcile_task()
     return {"status" : "success", "message" : "Playbook reset complete"}
 
 if __name__ == "__main__":
@@ -1,28 +1,40 @@
 import os
-from typing import Optional, Literal
+from typing import Optional, Literal, NamedTuple
 import shutil
+import glob
 import gc
 
 from utils import Logger
 from config.getenv import GetEnv
-from module.embed import EmbeddingPreprocessor
+from module.embed import EmbeddingPreprocessor, MatryoshkaEmbeddings
+from module.vector_index import PlaybookVectorIndex
+from module.sqlite_utils import set_sqlite_pragmas
+from module.vector_backend import VectorBackend, VectorRecord, QdrantBackend, QdrantProfile, SQLiteVectorBackend, CONTENT_KEY, METADATA_KEY, payload_value
 from core.state import PlaybookEntry
 
 from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_core.documents import Document
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient, models
 
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, DateTime, insert, select, update, delete
-from sqlalchemy.engine import Engine
+from sqlalchemy import create_engine, event, bindparam, func, MetaData, Table, Column, Index, String, Integer, DateTime, LargeBinary, insert, select, update, delete
+from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 
 env = GetEnv()
 logger = Logger(__name__)
 
 _db_instance = None
+_async_db_instance = None
 _vector_store_instance = None
 
+class DeltaResult(NamedTuple):
+    pruned_ids : list[str]
+    # rows of the added, updated and counter-incremented entries as committed (pruned ones excluded)
+    entries : list[PlaybookEntry]
+
 def ensure_datetime(v):
     if isinstance(v, datetime):
         return v
@@ -31,10 +43,10 @@ def ensure_datetime(v):
 
 class VectorStore:
     """
-    Manages a Qdrant vector store for document embeddings.
+    Manages the playbook vector store for document embeddings.
 
-    This class handles the initialization of the embedding model and the Qdrant client,
-    providing methods to add documents to the store and retrieve the store instance.
+    This class handles the initialization of the embedding model and the storage backend,
+    providing methods to add documents to the store and search it.
 
     Args:
         embedding_dir_or_repo_name (Optional[str]): 
@@ -49,6 +61,19 @@ class VectorStore:
         **kwargs: 
             Additional keyword arguments that are passed directly to the HuggingFaceEmbeddings
             model constructor, allowing for custom model configuration.
+
+    The embedding model is wrapped with the `[EMBEDDING]` cache, so retrieval, deduplication
+    and `to_disk` upserts reuse vectors of texts that were already encoded, and served from
+    an `EmbeddingService` so async callers can encode off the event loop.
+
+    Storage is delegated to the `VECTOR_BACKEND` of `[DATABASE]` : a Qdrant collection (`qdrant`)
+    or BLOBs in the playbook SQLite table searched through a memory-mapped matrix (`sqlite`).
+    See `module.vector_backend`.
+
+    If `IN_MEMORY_INDEX` is enabled in `[DATABASE]`, every write is mirrored into a
+    `PlaybookVectorIndex`, and `search` answers from it instead of querying Qdrant.
+    The `sqlite` backend already searches in memory and never uses it. The index only mirrors
+    writes of this process, so it is meant for single-process deployments.
     """
     huggingface_token = env.get_huggingface_token
     def __init__(self,
@@ -56,17 +81,23 @@ class VectorStore:
                  db_name : Optional[str] = None,
                  **kwargs
                  ):
-        self.embedding_model = self._init_embedding_model(embedding_dir_or_repo_name, **kwargs)
+        self.embedding_model = EmbeddingPreprocessor.embedding_service(
+            EmbeddingPreprocessor.cached_embedding_model(
+                EmbeddingPreprocessor.truncated_embedding_model(
+                    self._init_embedding_model(embedding_dir_or_repo_name, **kwargs)
+                )
+            )
+        )
         self.vector_store_dir = env.get_vector_store_dir
         self.db_path, self.db_name = self._get_db_info(db_name)
 
-        qdrant_host = os.getenv("QDRANT_HOST")
-        if qdrant_host:
-            # docker
-            self.client = QdrantClient(url=f"http://{qdrant_host}:6333")
+        if env.get_vector_backend == "sqlite":
+            self.backend : VectorBackend = SQLiteVectorBackend(PlayBookDB(), self.db_name)
         else:
-            # local
-            self.client = QdrantClient(path=self.db_path)
+            self.backend : VectorBackend = QdrantBackend(self.db_path, self.db_name, profile=QdrantProfile.from_env(env))
+
+        self.index = PlaybookVectorIndex() if env.get_in_memory_index and self.backend.name == "qdrant" else None
+        self._index_loaded = False
     
     def _init_embedding_model(self, embedding_dir_or_repo_name: Optional[str], **kwargs) -> HuggingFaceEmbeddings:
         if embedding_dir_or_repo_name is None:
@@ -80,9 +111,23 @@ class VectorStore:
         else:
             raise ValueError("Invalid initialization parameters for VectorStore.")
     @property
-    def get_embedding_model(self) -> HuggingFaceEmbeddings:
+    def get_embedding_model(self) -> Embeddings:
         return self.embedding_model
     
+    def get_embedding_size(self) -> int:
+        """
+        Size of the vectors written to the collection (`OUTPUT_DIMENSION` if truncation is enabled).
+        """
+        output_dimension = getattr(self.embedding_model, "output_dimension", None)
+        if output_dimension:
+            return output_dimension
+
+        try:
+            return self.embedding_model._client.get_sentence_embedding_dimension()
+        except AttributeError:
+            logger.warning("Could not find get_sentence_embedding_dimension(). Inferring size from dummy text.")
+            return len(self.embedding_model.embed_query("test"))
+
     def _get_db_info(self, db_name : Optional[str] = None) -> str:
         if db_name is None:
             db_name = env.get_vector_store_name
@@ -94,142 +139,182 @@ class VectorStore:
         self,
         data: list[Document],
         verbose: bool = True,
+        embeddings: Optional[list[list[float]]] = None,
     ):
         """
-        Append documents to an existing local Qdrant vector store.
-        If the store does not exist, create a new one.
-        """
-        try:
-            self.client.get_collection(self.db_name)
-            if verbose:
-                logger.debug(f"Appending documents to existing Qdrant collection: {self.db_name}")
+        Append documents to the vector store. The storage is created on the first write.
 
-        except Exception:
-            if verbose:
-                logger.debug(f"Creating new Qdrant collection: {self.db_name} at {self.db_path}")
-            
-            try:
-                embedding_size = self.embedding_model._client.get_sentence_embedding_dimension()
-            except AttributeError:
-                try:
-                    embedding_size = self.embedding_model._client.get_sentence_embedding_dimension()
-                except AttributeError:
-                    logger.warning("Could not find get_sentence_embedding_dimension(). Inferring size from dummy text.")
-                    embedding_size = len(self.embedding_model.embed_query("test"))
-
-            self.client.create_collection(
-                collection_name=self.db_name,
-                vectors_config=models.VectorParams(
-                    size=embedding_size,
-                    distance=models.Distance.COSINE,
-                )
+        Pass `embeddings` when the vectors of `data` were already computed (e.g. with `aembed_documents`).
+        """
+        embedding_size = self.get_embedding_size()
+        stored_size = self.backend.dimension()
+        if stored_size is not None and stored_size != embedding_size:
+            raise ValueError(
+                f"Vector store '{self.db_name}' holds {stored_size}-dim vectors "
+                f"but the embedding model produces {embedding_size}. Run `python -m module.db_management migrate-dim`."
             )
-            if verbose:
-                 logger.info(f"Collection '{self.db_name}' created at {self.db_path}")
-
-        vector_store = QdrantVectorStore(
-            client=self.client,
-            collection_name=self.db_name,
-            embedding=self.embedding_model,
-        )
 
-        vector_store.add_documents(data)
+        # embed once and write the vectors directly, so the same vectors can be mirrored into the index
+        if embeddings is None:
+            vectors = self.embedding_model.embed_documents([doc.page_content for doc in data])
+        else:
+            vectors = embeddings
+        entry_ids = [doc.metadata['entry_id'] for doc in data]
+        payloads = [
+            {
+                CONTENT_KEY : doc.page_content,
+                METADATA_KEY : doc.metadata,
+            } for doc in data
+        ]
+
+        self.backend.upsert(entry_ids, vectors, payloads, dim=embedding_size)
+
+        if self._index_loaded:
+            index_payloads = [
+                {**payload, METADATA_KEY : {k : payload_value(v) for k, v in payload[METADATA_KEY].items()}}
+                for payload in payloads
+            ]
+            self.index.upsert(entry_ids, vectors, index_payloads)
 
         if verbose:
-            logger.info(f"Collection '{self.db_name}' successfully updated with {len(data)} new documents.")
+            logger.info(f"Vector store '{self.db_name}' ({self.backend.name}) successfully updated with {len(data)} new documents.")
     
-    def from_disk(self) -> QdrantVectorStore:
+    def load_index(self) -> PlaybookVectorIndex | None:
+        """
+        (Re)build the in-memory index from every stored point, vectors included.
+        Called once at startup; afterwards the index is kept in sync by the write methods.
+        """
+        if self.index is None:
+            return None
 
-        if not os.path.exists(self.db_path):
-            raise FileNotFoundError(f"The path {self.db_path} doen't exist")
+        self.index.clear()
+        entry_ids, vectors, payloads = [], [], []
+        for record in self.backend.scroll(with_vectors=True):
+            entry_ids.append(record.entry_id)
+            vectors.append(record.vector)
+            payloads.append(record.payload)
+        self.index.upsert(entry_ids, vectors, payloads)
 
-        collection = QdrantVectorStore(
-            client=self.client,
-            collection_name=self.db_name,
-            embedding=self.embedding_model
-        )
+        self._index_loaded = True
+        logger.info(f"In-memory playbook index loaded with {len(self.index)} entries")
+        return self.index
+
+    def _get_index(self) -> PlaybookVectorIndex | None:
+        if self.index is not None and not self._index_loaded:
+            self.load_index()
+        return self.index
+
+    def search(self, embedding : list[float], k : int, score_threshold : Optional[float] = None) -> list[Document]:
+        """
+        Top-k similarity search by vector. Uses the in-memory index when it is enabled,
+        otherwise the backend.
+        """
+        index = self._get_index()
+        if index is not None:
+            return [doc for doc, _ in index.search(embedding, k=k, score_threshold=score_threshold)]
+
+        return [doc for doc, _ in self.backend.search(embedding, k=k, score_threshold=score_threshold)]
 
-        return collection
-    
     def get_doc_count(self) -> int:
-        try:
-            count_result = self.client.count(collection_name=self.db_name, exact=True)
-            return count_result.count
-        
-        except (ValueError) as e:
-            logger.warning(f"Could not count docs in {self.db_name} (collection may not exist) : {e}")
-            return 0
+        index = self._get_index()
+        if index is not None:
+            return len(index)
+        return self.backend.count()
         
     def delete_by_entry_ids(self, entry_ids : list[str]):
         if not entry_ids:
             return
         
-        self.client.delete(
-            collection_name=self.db_name,
-            points_selector=models.Filter(
-                should=[
-                    models.FieldCondition(
-                        key='metadata.entry_id',
-                        match=models.MatchValue(value=entry_id)
-                    ) for entry_id in entry_ids
-                ]
-            ),
-            wait=True
-        )
+        self.backend.delete(entry_ids)
+        if self._index_loaded:
+            self.index.delete(entry_ids)
         logger.info(f"Delete {len(entry_ids)} entries from vector store")
 
-    def get_entry_by_id(self, entry_id : str) -> dict | None:
-        records, _ = self.client.scroll(
-            collection_name=self.db_name,
-            scroll_filter=models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="metadata.entry_id",
-                        match=models.MatchValue(value=entry_id)
-                    )
-                ]
-            ),
-            limit=1,
-            with_payload=True,
-            with_vectors=False
-        )
+    def update_payloads(self, entries : list[PlaybookEntry]):
+        """
+        Overwrite `helpful_count`, `harmful_count` and `updated_at` of existing points in place.
 
-        if not records:
-            return None
-        
-        point = records[0]
-        return point.payload
+        The stored vectors and `page_content` are left untouched, so counter-only changes
+        don't pay for re-embedding or point replacement. All entries are sent in one batch request.
+        Pass the rows returned by `apply_delta`, so the absolute counts written here are the committed ones.
+        Entries without a point are skipped and left to the reconciler.
+        """
+        if not entries:
+            return
+
+        updates = {
+            entry['entry_id'] : {
+                "helpful_count" : entry['helpful_count'],
+                "harmful_count" : entry['harmful_count'],
+                "updated_at" : payload_value(entry['updated_at']),
+            } for entry in entries
+        }
+        self.backend.update_metadata(updates)
+        if self._index_loaded:
+            for entry_id, fields in updates.items():
+                self.index.update_metadata(entry_id, fields)
+        logger.info(f"Updated payload of {len(entries)} entries in vector store")
+
+    def get_entry_by_id(self, entry_id : str) -> dict | None:
+        for record in self.backend.scroll(entry_ids=[entry_id]):
+            return record.payload
+        return None
     
+    def get_entries_by_ids(self, entry_ids : list[str]) -> dict[str, dict]:
+        """
+        Payloads of the points of `entry_ids`, keyed by entry_id. Missing entries are left out.
+        """
+        if not entry_ids:
+            return {}
+        return {record.entry_id : record.payload for record in self.backend.scroll(entry_ids=list(entry_ids))}
+
     def get_all_entries(self) -> list[dict]:
-        all_records = []
-        next_page_offset = None
-
-        while True:
-            records, next_page_offset = self.client.scroll(
-                collection_name=self.db_name,
-                scroll_filter=None,
-                limit=100,
-                with_payload=True,
-                with_vectors=False,
-                offset=next_page_offset
-            )
-        
-            if not records:
-                break
+        return [record.payload for record in self.backend.scroll()]
+
+    def migrate_dimension(self, batch_size : int = 256) -> int:
+        """
+        Rewrite every stored vector at the current `get_embedding_size()`.
 
-            all_records.extend([r.payload for r in records])
+        Vectors that are at least as long as the target are truncated and re-normalized in place
+        (valid for Matryoshka models); shorter ones are re-embedded from `page_content`.
+        Returns the number of migrated points.
+        """
+        target_size = self.get_embedding_size()
+        stored_size = self.backend.dimension()
+        if stored_size is None:
+            logger.info(f"Vector store '{self.db_name}' is empty. Nothing to migrate.")
+            return 0
 
-            if next_page_offset is None:
-                break
-                
-        return all_records
+        if stored_size == target_size:
+            logger.info(f"Vector store '{self.db_name}' already stores {target_size}-dim vectors.")
+            return 0
 
+        def reencode(records : list[VectorRecord]) -> list[list[float]]:
+            if stored_size >= target_size:
+                return MatryoshkaEmbeddings.truncate([r.vector for r in records], target_size)
+            return self.embedding_model.embed_documents([r.payload[CONTENT_KEY] for r in records])
 
-        
-class PlayBookDB:
+        migrated = self.backend.migrate(target_size, reencode, batch_size=batch_size)
+        if self.index is not None:
+            self.index = PlaybookVectorIndex()
+            self._index_loaded = False
+
+        logger.info(f"Migrated {migrated} vectors of '{self.db_name}' from {stored_size} to {target_size} dimensions")
+        return migrated
+
+    def close(self):
+        self.backend.close()
+        if hasattr(self.embedding_model, "close"):
+            self.embedding_model.close()
+
+class PlayBookQueries:
+    """
+    Schema and queries of the `playbook` table, written against a synchronous `Connection`.
+    `PlayBookDB` runs them on a regular engine, `AsyncPlayBookDB` runs the same functions on an
+    aiosqlite connection through `AsyncConnection.run_sync`, so both expose the same methods.
+    """
     def __init__(self):
         self.db_path = env.get_db_path
-        self.engine : Engine = create_engine(f"sqlite:///{self.db_path}", echo=False, future=True)
         self.metadata = MetaData()
 
         self.playbook = Table(
@@ -243,51 +328,358 @@ class PlayBookDB:
             Column("created_at", DateTime, nullable=False),
             Column("updated_at", DateTime, nullable=False),
             Column("last_used_at", DateTime, nullable=True),
+            # normalized float32 embedding, only used by the `sqlite` vector backend
+            Column("vector", LargeBinary, nullable=True),
+        )
+        self.entry_columns = [column for column in self.playbook.c if column.name != "vector"]
+        # prune queries : poison detection and capacity eviction order
+        Index("ix_playbook_poison", self.playbook.c.harmful_count - self.playbook.c.helpful_count)
+        Index("ix_playbook_eviction", self.playbook.c.helpful_count, self.playbook.c.last_used_at)
+
+        # outbox of vector store operations, written in the same transaction as the playbook mutation.
+        # rows are consumed (and deleted) by `module.reconciler.PlaybookReconciler`
+        self.changes = Table(
+            "playbook_changes",
+            self.metadata,
+            Column("seq", Integer, primary_key=True, autoincrement=True),
+            Column("entry_id", String, nullable=False),
+            Column("op", String, nullable=False), # upsert | patch | delete
+            Column("created_at", DateTime, nullable=False),
+            sqlite_autoincrement=True,
         )
 
-        self.metadata.create_all(self.engine)
-    
-    def add_entry(self, entry: PlaybookEntry):
-        stmt = insert(self.playbook).values(
-            entry_id = entry['entry_id'],
-            category = entry['category'],
-            content = entry['content'],
-            helpful_count = entry['helpful_count'],
-            harmful_count = entry['harmful_count'],
-            created_at = ensure_datetime(entry['created_at']),
-            updated_at = ensure_datetime(entry['updated_at']),
-            last_used_at = ensure_datetime(entry.get('last_used_at'))
-        ).prefix_with("OR REPLACE")
+    def _create_schema(self, conn : Connection):
+        self.metadata.create_all(conn)
+        # databases created before the `vector` column
+        columns = {row.name for row in conn.exec_driver_sql("PRAGMA table_info(playbook)")}
+        if "vector" not in columns:
+            conn.exec_driver_sql("ALTER TABLE playbook ADD COLUMN vector BLOB")
+        # create_all skips the indexes of a table that already exists
+        for index in self.playbook.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+    def _log_changes(self, conn : Connection, op : Literal["upsert", "patch", "delete"], entry_ids):
+        entry_ids = list(entry_ids)
+        if not entry_ids:
+            return
+        now = datetime.now()
+        conn.execute(insert(self.changes), [{"entry_id" : entry_id, "op" : op, "created_at" : now} for entry_id in entry_ids])
+
+    def _upsert_entries(self):
+        # not `INSERT OR REPLACE` : that deletes the row, and with it the `vector` BLOB of the sqlite backend
+        stmt = sqlite_insert(self.playbook)
+        return stmt.on_conflict_do_update(
+            index_elements=[self.playbook.c.entry_id],
+            set_={column.name : stmt.excluded[column.name] for column in self.entry_columns if column.name != "entry_id"}
+        )
+
+    def _add_entry(self, conn : Connection, entry : PlaybookEntry):
+        conn.execute(self._upsert_entries(), {
+            "entry_id" : entry['entry_id'],
+            "category" : entry['category'],
+            "content" : entry['content'],
+            "helpful_count" : entry['helpful_count'],
+            "harmful_count" : entry['harmful_count'],
+            "created_at" : ensure_datetime(entry['created_at']),
+            "updated_at" : ensure_datetime(entry['updated_at']),
+            "last_used_at" : ensure_datetime(entry.get('last_used_at')),
+        })
+        self._log_changes(conn, "upsert", [entry['entry_id']])
+
+    def _get_entry(self, conn : Connection, entry_id : str) -> PlaybookEntry | None:
+        stmt = select(*self.entry_columns).where(self.playbook.c.entry_id == entry_id)
+        result = conn.execute(stmt).mappings().first()
+        return dict(result) if result else None
+
+    def _get_all_entries(self, conn : Connection) -> list[PlaybookEntry]:
+        results = conn.execute(select(*self.entry_columns)).mappings().all()
+        return [dict(r) for r in results]
+
+    def _delete_entry(self, conn : Connection, entry_id : str):
+        conn.execute(delete(self.playbook).where(self.playbook.c.entry_id == entry_id))
+        self._log_changes(conn, "delete", [entry_id])
+
+    def _apply_delta(
+        self,
+        conn : Connection,
+        adds : list[PlaybookEntry] = (),
+        updates : list[PlaybookEntry] = (),
+        counter_increments : list[dict] = (),
+        deletes : list[str] = (),
+        max_size : Optional[int] = None
+    ) -> DeltaResult:
+        now = datetime.now()
+        if adds:
+            conn.execute(self._upsert_entries(), [
+                {
+                    "entry_id" : entry['entry_id'],
+                    "category" : entry['category'],
+                    "content" : entry['content'],
+                    "helpful_count" : entry['helpful_count'],
+                    "harmful_count" : entry['harmful_count'],
+                    "created_at" : ensure_datetime(entry['created_at']),
+                    "updated_at" : ensure_datetime(entry['updated_at']),
+                    "last_used_at" : ensure_datetime(entry.get('last_used_at')),
+                } for entry in adds
+            ])
+
+        if updates:
+            stmt = (
+                update(self.playbook)
+                .where(self.playbook.c.entry_id == bindparam("b_entry_id"))
+                .values(
+                    category = bindparam("b_category"),
+                    content = bindparam("b_content"),
+                    updated_at = bindparam("b_updated_at"),
+                )
+            )
+            conn.execute(stmt, [
+                {
+                    "b_entry_id" : entry['entry_id'],
+                    "b_category" : entry['category'],
+                    "b_content" : entry['content'],
+                    "b_updated_at" : ensure_datetime(entry['updated_at']),
+                } for entry in updates
+            ])
+
+        if counter_increments:
+            stmt = (
+                update(self.playbook)
+                .where(self.playbook.c.entry_id == bindparam("b_entry_id"))
+                .values(
+                    helpful_count = self.playbook.c.helpful_count + bindparam("b_helpful"),
+                    harmful_count = self.playbook.c.harmful_count + bindparam("b_harmful"),
+                    last_used_at = func.coalesce(bindparam("b_last_used_at"), self.playbook.c.last_used_at),
+                    updated_at = bindparam("b_updated_at"),
+                )
+            )
+            conn.execute(stmt, [
+                {
+                    "b_entry_id" : inc['entry_id'],
+                    "b_helpful" : inc.get('helpful', 0),
+                    "b_harmful" : inc.get('harmful', 0),
+                    "b_last_used_at" : ensure_datetime(inc.get('last_used_at')),
+                    "b_updated_at" : now,
+                } for inc in counter_increments
+            ])
+
+        if deletes:
+            conn.execute(delete(self.playbook).where(self.playbook.c.entry_id.in_(list(deletes))))
+
+        ids_to_prune = []
+        if max_size is not None:
+            ids_to_prune = self._ids_to_prune(conn, max_size)
+            if ids_to_prune:
+                conn.execute(delete(self.playbook).where(self.playbook.c.entry_id.in_(ids_to_prune)))
+
+        self._log_changes(conn, "upsert", [entry['entry_id'] for entry in [*adds, *updates]])
+        self._log_changes(conn, "patch", [inc['entry_id'] for inc in counter_increments])
+        self._log_changes(conn, "delete", [*deletes, *ids_to_prune])
+
+        # read back in the same transaction : the counts include increments of concurrent cycles
+        touched = {entry['entry_id'] for entry in [*adds, *updates]} | {inc['entry_id'] for inc in counter_increments}
+        entries = self._get_entries(conn, list(touched)) if touched else []
+        return DeltaResult(ids_to_prune, entries)
+
+    def _ids_to_prune(self, conn : Connection, max_size : int) -> list[str]:
+        poisoned = self.playbook.c.harmful_count - self.playbook.c.helpful_count > 0
+        ids_to_prune = list(conn.execute(select(self.playbook.c.entry_id).where(poisoned)).scalars())
+
+        clean_count = conn.execute(select(func.count()).select_from(self.playbook)).scalar_one() - len(ids_to_prune)
+        excess_count = clean_count - max_size
+        if excess_count > 0:
+            # NULL last_used_at sorts first, i.e. never used entries are evicted first
+            stmt = (
+                select(self.playbook.c.entry_id)
+                .where(~poisoned)
+                .order_by(self.playbook.c.helpful_count, self.playbook.c.last_used_at)
+                .limit(excess_count)
+            )
+            ids_to_prune.extend(conn.execute(stmt).scalars())
+
+        return ids_to_prune
+
+    def _update_last_used(self, conn : Connection, entry_id : str, timestamp : datetime):
+        stmt = (
+            update(self.playbook)
+            .where(self.playbook.c.entry_id == entry_id)
+            .values(last_used_at = timestamp, updated_at = datetime.now())
+        )
+        conn.execute(stmt)
+        self._log_changes(conn, "patch", [entry_id])
+
+    def _get_entries(self, conn : Connection, entry_ids : list[str]) -> list[PlaybookEntry]:
+        results = conn.execute(select(*self.entry_columns).where(self.playbook.c.entry_id.in_(entry_ids))).mappings().all()
+        return [dict(r) for r in results]
+
+    def _get_entry_ids(self, conn : Connection) -> list[str]:
+        return list(conn.execute(select(self.playbook.c.entry_id)).scalars())
+
+    def _pending_changes(self, conn : Connection, limit : int, created_before : Optional[datetime] = None) -> list[dict]:
+        stmt = select(self.changes).order_by(self.changes.c.seq).limit(limit)
+        if created_before is not None:
+            stmt = stmt.where(self.changes.c.created_at <= created_before)
+        return [dict(r) for r in conn.execute(stmt).mappings().all()]
+
+    def _ack_changes(self, conn : Connection, seqs : list[int]):
+        conn.execute(delete(self.changes).where(self.changes.c.seq.in_(seqs)))
+
+    def _enqueue_all(self, conn : Connection) -> int:
+        entry_ids = list(conn.execute(select(self.playbook.c.entry_id)).scalars())
+        self._log_changes(conn, "upsert", entry_ids)
+        return len(entry_ids)
+
+class PlayBookDB(PlayBookQueries):
+    """
+    Synchronous playbook store, for scripts that don't run on an event loop (evaluation, CLI, benchmarks).
+    The serving and learning graphs use `AsyncPlayBookDB`.
+    """
+    def __init__(self):
+        super().__init__()
+        self.engine : Engine = create_engine(f"sqlite:///{self.db_path}", echo=False, future=True)
+        event.listen(self.engine, "connect", set_sqlite_pragmas)
 
         with self.engine.begin() as conn:
-            conn.execute(stmt)
+            self._create_schema(conn)
     
+    def add_entry(self, entry: PlaybookEntry):
+        with self.engine.begin() as conn:
+            self._add_entry(conn, entry)
 
     def get_entry(self, entry_id : str) -> PlaybookEntry | None:
-        stmt = select(self.playbook).where(self.playbook.c.entry_id == entry_id)
         with self.engine.connect() as conn:
-            result = conn.execute(stmt).mappings().first()
-            return dict(result) if result else None
+            return self._get_entry(conn, entry_id)
         
     def get_all_entries(self) -> list[PlaybookEntry]:
-        stmt = select(self.playbook)
         with self.engine.connect() as conn:
-            results = conn.execute(stmt).mappings().all()
-            return [dict(r) for r in results]
+            return self._get_all_entries(conn)
     
     def delete_entry(self, entry_id : str):
-        stmt = delete(self.playbook).where(self.playbook.c.entry_id == entry_id)
         with self.engine.begin() as conn:
-            conn.execute(stmt)
-    
+            self._delete_entry(conn, entry_id)
+
+    def apply_delta(
+        self,
+        adds : list[PlaybookEntry] = (),
+        updates : list[PlaybookEntry] = (),
+        counter_increments : list[dict] = (),
+        deletes : list[str] = (),
+        max_size : Optional[int] = None
+    ) -> DeltaResult:
+        """
+        Apply one learning cycle in a single transaction, with one bulk (executemany) statement per kind.
+
+        Args:
+            adds (list[PlaybookEntry]): New entries. An existing id is overwritten, except for its stored vector.
+            updates (list[PlaybookEntry]): Entries whose `category`, `content` and `updated_at` changed.
+                Counters are left alone; use `counter_increments` for those.
+            counter_increments (list[dict]): `{"entry_id", "helpful", "harmful", "last_used_at"}` deltas,
+                added to the stored counts so concurrent cycles don't overwrite each other. `updated_at` is bumped.
+            deletes (list[str]): Entry ids to remove.
+            max_size (int, optional): When given, the playbook is pruned to this size after the delta
+                is applied, in the same transaction. See `get_ids_to_prune`.
+
+        Returns:
+            DeltaResult: The entry ids removed by pruning, and the committed rows of every added, updated
+                or incremented entry that survived it. Mirror those rows to the vector store rather than
+                locally computed counts, which miss the increments of concurrent cycles.
+        """
+        with self.engine.begin() as conn:
+            return self._apply_delta(conn, adds, updates, counter_increments, deletes, max_size)
+
+    def get_ids_to_prune(self, max_size : int) -> list[str]:
+        """
+        Same criteria as `node_utils.prune_playbook`, evaluated with indexed queries so only the ids to evict are read:
+        1. Quality: entries where harmful_count > helpful_count
+        2. Capacity: the `size - max_size` clean entries with the lowest (helpful_count, last_used_at)
+        """
+        with self.engine.connect() as conn:
+            return self._ids_to_prune(conn, max_size)
+
     def update_last_used(self, entry_id : str, timestamp : datetime):
-        stmt = (
-            update(self.playbook)
-            .where(self.playbook.c.entry_id == entry_id)
-            .values(last_used_at = timestamp, updated_at = datetime.now())
-        )
         with self.engine.begin() as conn:
-            conn.exec_driver_sql(stmt)
+            self._update_last_used(conn, entry_id, timestamp)
+
+    def get_entries(self, entry_ids : list[str]) -> list[PlaybookEntry]:
+        with self.engine.connect() as conn:
+            return self._get_entries(conn, entry_ids)
+
+    def get_entry_ids(self) -> list[str]:
+        with self.engine.connect() as conn:
+            return self._get_entry_ids(conn)
+
+    def pending_changes(self, limit : int = 256, created_before : Optional[datetime] = None) -> list[dict]:
+        """
+        Oldest unreconciled rows of the change log, `{"seq", "entry_id", "op", "created_at"}`.
+        """
+        with self.engine.connect() as conn:
+            return self._pending_changes(conn, limit, created_before)
+
+    def ack_changes(self, seqs : list[int]):
+        with self.engine.begin() as conn:
+            self._ack_changes(conn, seqs)
+
+    def enqueue_all(self) -> int:
+        """
+        Log an `upsert` change for every entry, so the next reconcile compares the whole playbook.
+        """
+        with self.engine.begin() as conn:
+            return self._enqueue_all(conn)
+
+class AsyncPlayBookDB(PlayBookQueries):
+    """
+    `PlayBookDB` on SQLAlchemy's asyncio extension (aiosqlite), so the LangGraph nodes and the
+    FastAPI endpoints await the database instead of blocking the event loop.
+    Same methods as `PlayBookDB`, as coroutines. The schema is created on first use.
+    """
+    def __init__(self):
+        super().__init__()
+        self.engine : AsyncEngine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", echo=False)
+        event.listen(self.engine.sync_engine, "connect", set_sqlite_pragmas)
+        self._schema_ready = False
+
+    async def _run(self, fn, *args, write : bool = False):
+        if not self._schema_ready:
+            async with self.engine.begin() as conn:
+                await conn.run_sync(self._create_schema)
+            self._schema_ready = True
+
+        if write:
+            async with self.engine.begin() as conn:
+                return await conn.run_sync(fn, *args)
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(fn, *args)
+
+    async def add_entry(self, entry : PlaybookEntry):
+        await self._run(self._add_entry, entry, write=True)
+
+    async def get_entry(self, entry_id : str) -> PlaybookEntry | None:
+        return await self._run(self._get_entry, entry_id)
+
+    async def get_all_entries(self) -> list[PlaybookEntry]:
+        return await self._run(self._get_all_entries)
+
+    async def delete_entry(self, entry_id : str):
+        await self._run(self._delete_entry, entry_id, write=True)
+
+    async def apply_delta(
+        self,
+        adds : list[PlaybookEntry] = (),
+        updates : list[PlaybookEntry] = (),
+        counter_increments : list[dict] = (),
+        deletes : list[str] = (),
+        max_size : Optional[int] = None
+    ) -> DeltaResult:
+        """
+        See `PlayBookDB.apply_delta`.
+        """
+        return await self._run(self._apply_delta, adds, updates, counter_increments, deletes, max_size, write=True)
+
+    async def get_ids_to_prune(self, max_size : int) -> list[str]:
+        return await self._run(self._ids_to_prune, max_size)
+
+    async def update_last_used(self, entry_id : str, timestamp : datetime):
+        await self._run(self._update_last_used, entry_id, timestamp, write=True)
 
 def get_db_instance() -> PlayBookDB:
     global _db_instance
@@ -295,6 +687,12 @@ def get_db_instance() -> PlayBookDB:
         _db_instance = PlayBookDB()
     return _db_instance
 
+def get_async_db_instance() -> AsyncPlayBookDB:
+    global _async_db_instance
+    if _async_db_instance is None:
+        _async_db_instance = AsyncPlayBookDB()
+    return _async_db_instance
+
 def get_vector_store_instance() -> VectorStore:
     global _vector_store_instance
     if _vector_store_instance is None:
@@ -345,30 +743,95 @@ def close_db():
         _db_instance.engine.dispose()
         _db_instance = None
 
+async def close_async_db():
+    global _async_db_instance
+    if _async_db_instance is not None:
+        await _async_db_instance.engine.dispose()
+        _async_db_instance = None
+
 def close_vector_store():
     global _vector_store_instance
     if _vector_store_instance is not None:
-        _vector_store_instance.client.close()
+        _vector_store_instance.close()
     _vector_store_instance = None
 
 def reset_all_stores(target : Literal['db', 'vs', 'both'] = 'both'):
+    # with the `sqlite` backend the vectors live in the playbook DB, so resetting the DB resets them too
+    sqlite_vectors = env.get_vector_backend == "sqlite"
     if target in ("db", "both"):
         close_db()
-    if target in ("vs", "both"):
+    if target in ("vs", "both") or sqlite_vectors:
         close_vector_store()
     
     gc.collect()
 
     if target in ("db", "both"):
         db_path = env.get_db_path
-        if os.path.exists(db_path):
-            os.remove(db_path)
+        # WAL mode keeps -wal / -shm files next to the database
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
     
+    # `sqlite` backend matrix snapshots : a fresh DB restarts at version 0, so a leftover
+    # `<name>.v0.npy` would otherwise be mapped as the current matrix
+    if target in ("vs", "both") or sqlite_vectors:
+        for path in glob.glob(os.path.join(glob.escape(env.get_db_dir), f"{env.get_vector_store_name}.v*.npy")):
+            os.remove(path)
+
     if target in ("vs", "both"):
         qdrant_path = os.path.join(env.get_vector_store_dir, env.get_vector_store_name)
         if os.path.exists(qdrant_path):
             shutil.rmtree(qdrant_path)
+
+        # `sqlite` backend : the BLOBs when the playbook itself is kept
+        if target == "vs" and os.path.exists(env.get_db_path):
+            db = PlayBookDB()
+            with db.engine.begin() as conn:
+                conn.execute(update(db.playbook).values(vector=None))
+            db.engine.dispose()
     
 
 if __name__ == "__main__":
-    reset_all_stores()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Playbook store maintenance")
+    subparsers = parser.add_subparsers(dest="command")
+    reset_parser = subparsers.add_parser("reset", help="delete the SQLite DB and/or the vector store (default)")
+    reset_parser.add_argument("--target", choices=["db", "vs", "both"], default="both")
+    subparsers.add_parser("migrate-dim", help="rewrite stored vectors at the configured OUTPUT_DIMENSION")
+    subparsers.add_parser("apply-profile", help="update the Qdrant collection to the configured QDRANT_PROFILE")
+    reconcile_parser = subparsers.add_parser("reconcile", help="replay pending playbook changes into the vector store")
+    reconcile_parser.add_argument("--full", action="store_true", help="compare every entry, not only the pending changes")
+    export_parser = subparsers.add_parser("export", help="write the playbook and its vectors to a snapshot file")
+    export_parser.add_argument("path")
+    import_parser = subparsers.add_parser("import", help="load a snapshot file without re-embedding")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--replace", action="store_true", help="reset both stores before importing")
+    args = parser.parse_args()
+
+    if args.command == "migrate-dim":
+        get_vector_store_instance().migrate_dimension()
+        close_vector_store()
+    elif args.command == "apply-profile":
+        backend = get_vector_store_instance().backend
+        if not isinstance(backend, QdrantBackend):
+            raise SystemExit(f"apply-profile needs the qdrant backend, not '{backend.name}'")
+        backend.apply_profile()
+        close_vector_store()
+    elif args.command == "reconcile":
+        from module.reconciler import get_reconciler
+        if args.full:
+            get_db_instance().enqueue_all()
+        print(get_reconciler().reconcile())
+        close_db()
+        close_vector_store()
+    elif args.command in ("export", "import"):
+        from module.snapshot import export_playbook, import_playbook
+        if args.command == "export":
+            export_playbook(args.path)
+        else:
+            import_playbook(args.path, replace=args.replace)
+        close_db()
+        close_vector_store()
+    else:
+        reset_all_stores(getattr(args, "target", "both"))
@@ -1,15 +1,29 @@
 import torch
 import os
-from utils import highlight_print
-from typing import Optional
+import numpy as np
+from utils import highlight_print, Logger
+from typing import Optional, Literal
 
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 
 from config.getenv import GetEnv
+from module.embed_cache import CachedEmbeddings, EmbeddingDiskStore
+from module.embed_service import EmbeddingService
 
 env = GetEnv()
+logger = Logger(__name__)
 access_key = env.get_huggingface_token
 
+SUPPORTED_PRECISIONS = ("fp32", "int8", "bf16")
+# models trained with a Matryoshka loss, whose leading dimensions stay meaningful when truncated
+MATRYOSHKA_MODELS = (
+    "google/embeddinggemma-300m",
+    "nomic-ai/nomic-embed-text-v1.5",
+    "mixedbread-ai/mxbai-embed-large-v1",
+    "Snowflake/snowflake-arctic-embed-m-v1.5",
+)
+
 def get_torch_device(verbose : bool = False, **kwargs):
     """
     It will be useful for all functions that use the `pytorch` framework
@@ -28,15 +42,73 @@ def get_cpu_device(verbose : bool = False, **kwargs):
         highlight_print(f"device status : {device}", **kwargs)
     return device
 
+def cpu_supports_bf16() -> bool:
+    """
+    True when the CPU has native bf16 kernels (AVX512-BF16 / AMX); otherwise bf16 is emulated and slower than fp32.
+    """
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+class MatryoshkaEmbeddings(Embeddings):
+    """
+    Truncate vectors of a Matryoshka-trained model (e.g. `embeddinggemma-300m`) to their first
+    `output_dimension` components and re-normalize them. Other attributes are forwarded to the wrapped model.
+
+    `output_dimension` must be smaller than the model's own dimension. Models outside `MATRYOSHKA_MODELS`
+    are accepted with a warning, since truncating a model not trained for it degrades retrieval.
+    """
+    def __init__(self, embedding_model : Embeddings, output_dimension : int):
+        model_name = getattr(embedding_model, "model_name", None)
+        client = getattr(embedding_model, "_client", None)
+        full_dimension = client.get_sentence_embedding_dimension() if client is not None else None
+
+        if output_dimension <= 0:
+            raise ValueError(f"OUTPUT_DIMENSION must be a positive integer, got {output_dimension}")
+        if full_dimension is not None and output_dimension >= full_dimension:
+            raise ValueError(
+                f"OUTPUT_DIMENSION {output_dimension} must be smaller than the native dimension {full_dimension} "
+                f"of '{model_name}'. Leave it blank to use the full dimension."
+            )
+        if model_name not in MATRYOSHKA_MODELS:
+            logger.warning(
+                f"'{model_name}' is not known to be Matryoshka-trained; truncating it to {output_dimension} dimensions "
+                f"may degrade retrieval quality. Check the drift with test/embedding_precision_bench.py"
+            )
+
+        self.embedding_model = embedding_model
+        self.output_dimension = output_dimension
+
+    def __getattr__(self, name : str):
+        if name == "embedding_model":
+            raise AttributeError(name)
+        return getattr(self.embedding_model, name)
+
+    @staticmethod
+    def truncate(vectors, output_dimension : int) -> list[list[float]]:
+        matrix = np.asarray(vectors, dtype=np.float32)[:, :output_dimension]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+    def embed_documents(self, texts : list[str]) -> list[list[float]]:
+        return self.truncate(self.embedding_model.embed_documents(texts), self.output_dimension)
+
+    def embed_query(self, text : str) -> list[float]:
+        return self.truncate([self.embedding_model.embed_query(text)], self.output_dimension)[0]
+
 class EmbeddingPreprocessor:   
     @staticmethod
-    def default_embedding_model(download_path : Optional[os.PathLike] = None, use_gpu : bool = False ) -> HuggingFaceEmbeddings:
+    def default_embedding_model(download_path : Optional[os.PathLike] = None, use_gpu : bool = False, precision : Optional[str] = None) -> HuggingFaceEmbeddings:
         """
         Embedding model to be used for the vector store.
 
         There are many embedding models available for free in Huggingface, and this function uses the following model.
 
         Model name : `google/embeddinggemma-300m`
+
+        `precision` defaults to `[EMBEDDING] PRECISION`, see `apply_precision`.
         """
         if use_gpu:
             device = get_torch_device()
@@ -55,10 +127,10 @@ class EmbeddingPreprocessor:
             model_name = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
         
         embedding_model_name = HuggingFaceEmbeddings(model_name = model_name, cache_folder = download_path, encode_kwargs={"normalize_embeddings" : True}, model_kwargs=model_kwargs)
-        return embedding_model_name
+        return EmbeddingPreprocessor.apply_precision(embedding_model_name, precision)
     
     @staticmethod
-    def embedding_model(huggingface_model_name : str, download_path : Optional[os.PathLike] = None, use_gpu : bool = False) -> HuggingFaceEmbeddings:
+    def embedding_model(huggingface_model_name : str, download_path : Optional[os.PathLike] = None, use_gpu : bool = False, precision : Optional[str] = None) -> HuggingFaceEmbeddings:
         model_name = huggingface_model_name
         if use_gpu:
             device = get_torch_device()
@@ -70,7 +142,120 @@ class EmbeddingPreprocessor:
             "token" : access_key
         }
         embedding_model_name = HuggingFaceEmbeddings(model_name = model_name, cache_folder = download_path, encode_kwargs={"normalize_embeddings" : True}, model_kwargs=model_kwargs)
-        return embedding_model_name
+        return EmbeddingPreprocessor.apply_precision(embedding_model_name, precision)
+
+    @staticmethod
+    def apply_precision(embedding_model : HuggingFaceEmbeddings, precision : Optional[Literal["fp32", "int8", "bf16"]] = None) -> HuggingFaceEmbeddings:
+        """
+        Reduce the precision of the underlying SentenceTransformer in place.
+
+        - `int8` : dynamic int8 quantization of every `nn.Linear` (CPU only).
+        - `bf16` : cast the weights to bfloat16. On CPU this is only applied when native bf16 kernels exist.
+        - `fp32` : leave the model untouched.
+
+        Unsupported combinations fall back to fp32 with a warning, so the returned model always works.
+        """
+        if precision is None:
+            precision = env.get_embedding_precision
+        precision = precision.lower().strip()
+
+        if precision not in SUPPORTED_PRECISIONS:
+            raise ValueError(f"Invalid embedding precision '{precision}'. Supported precisions: {', '.join(SUPPORTED_PRECISIONS)}")
+
+        if precision == "fp32":
+            return embedding_model
+
+        model = embedding_model._client
+        on_cpu = model.device.type == "cpu"
+
+        if precision == "int8":
+            if not on_cpu:
+                logger.warning("int8 dynamic quantization is CPU only. Keeping fp32 embedding model.")
+                return embedding_model
+            torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+        elif precision == "bf16":
+            if on_cpu and not cpu_supports_bf16():
+                logger.warning("CPU has no native bf16 support. Keeping fp32 embedding model.")
+                return embedding_model
+            model.to(torch.bfloat16)
+
+        logger.info(f"Embedding model '{embedding_model.model_name}' running in {precision}")
+        return embedding_model
+
+    @staticmethod
+    def get_precision(embedding_model : Embeddings) -> str:
+        """
+        Inspect the precision the model actually runs in (after any fallback in `apply_precision`).
+        """
+        model = getattr(embedding_model, "_client", None)
+        if model is None:
+            return "fp32"
+
+        if any(isinstance(module, torch.ao.nn.quantized.dynamic.Linear) for module in model.modules()):
+            return "int8"
+
+        parameter = next(model.parameters(), None)
+        if parameter is not None and parameter.dtype == torch.bfloat16:
+            return "bf16"
+        return "fp32"
+
+    @staticmethod
+    def truncated_embedding_model(embedding_model : Embeddings, output_dimension : Optional[int] = None) -> Embeddings:
+        """
+        Apply `[EMBEDDING] OUTPUT_DIMENSION` (Matryoshka truncation).
+
+        Returns the model unchanged when no dimension is configured. Raises `ValueError` when it isn't
+        smaller than the model's own (see `MatryoshkaEmbeddings`).
+        """
+        if output_dimension is None:
+            output_dimension = env.get_embedding_output_dimension
+        if not output_dimension:
+            return embedding_model
+
+        return MatryoshkaEmbeddings(embedding_model, output_dimension)
+
+    @staticmethod
+    def cached_embedding_model(embedding_model : Embeddings) -> Embeddings:
+        """
+        Wrap an embedding model with the `[EMBEDDING]` cache (in-process LRU + SQLite store).
+
+        Returns the model unchanged when `EMBEDDING_CACHE` is disabled.
+        """
+        if not env.get_embedding_cache_enabled:
+            return embedding_model
+
+        disk_store = None
+        if env.get_embedding_cache_disk_size > 0:
+            disk_store = EmbeddingDiskStore(env.get_embedding_cache_path, max_size=env.get_embedding_cache_disk_size)
+
+        # reduced precision / truncated vectors must not be served for full fp32 lookups (and vice versa)
+        namespace = getattr(embedding_model, "model_name", None)
+        precision = EmbeddingPreprocessor.get_precision(embedding_model)
+        output_dimension = getattr(embedding_model, "output_dimension", None)
+        if namespace and precision != "fp32":
+            namespace = f"{namespace}:{precision}"
+        if namespace and output_dimension:
+            namespace = f"{namespace}:d{output_dimension}"
+
+        return CachedEmbeddings(
+            embedding_model,
+            namespace=namespace,
+            memory_size=env.get_embedding_cache_memory_size,
+            disk_store=disk_store
+        )
+
+    @staticmethod
+    def embedding_service(embedding_model : Embeddings) -> EmbeddingService:
+        """
+        Serve an embedding model from the `[EMBEDDING]` worker pool, with micro-batched `aembed_query`.
+        """
+        return EmbeddingService(
+            embedding_model,
+            max_workers=env.get_embedding_workers,
+            batch_window_ms=env.get_embedding_batch_window_ms,
+            max_batch_size=env.get_embedding_max_batch_size
+        )
 
 if __name__ == "__main__":
     embedding = EmbeddingPreprocessor.default_embedding_model()
\ No newline at end of file
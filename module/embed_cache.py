@@ -0,0 +1,241 @@
+import os
+import re
+import hashlib
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import create_engine, event, MetaData, Table, Column, String, Float, LargeBinary, insert, select, delete, update, func
+from sqlalchemy.engine import Engine, Connection
+
+from module.sqlite_utils import set_sqlite_pragmas
+from utils import Logger
+
+logger = Logger(__name__)
+
+_whitespace = re.compile(r"\s+")
+
+def normalize_text(text : str) -> str:
+    """
+    Collapse whitespace so that trivially different spellings of the same text share a cache key.
+    """
+    return _whitespace.sub(" ", text).strip()
+
+def _pack(vector : list[float]) -> bytes:
+    return array('f', vector).tobytes()
+
+def _unpack(blob : bytes) -> list[float]:
+    values = array('f')
+    values.frombytes(blob)
+    return values.tolist()
+
+class EmbeddingDiskStore:
+    """
+    SQLite table of float32 vectors keyed by `namespace:sha256(normalized text)`.
+
+    Rows carry a `last_access` timestamp, and the oldest rows are evicted once the table
+    grows beyond `max_size`. Reads don't write : hit keys are buffered and their `last_access`
+    is updated in one statement every `touch_interval` seconds, once `touch_batch` keys are
+    pending, or before the next insert (so eviction never sees them as older than they are).
+    """
+    def __init__(self, db_path : os.PathLike, max_size : int, touch_interval : float = 60.0, touch_batch : int = 512):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.touch_interval = touch_interval
+        self.touch_batch = touch_batch
+        self.engine : Engine = create_engine(f"sqlite:///{self.db_path}", echo=False, future=True)
+        # shared by the embedding worker threads
+        event.listen(self.engine, "connect", set_sqlite_pragmas)
+        self.metadata = MetaData()
+
+        self._touched : set[str] = set()
+        self._touch_lock = threading.Lock()
+        self._last_touch = time.monotonic()
+
+        self.cache = Table(
+            "embedding_cache",
+            self.metadata,
+            Column("cache_key", String, primary_key=True),
+            Column("namespace", String, nullable=False),
+            Column("vector", LargeBinary, nullable=False),
+            Column("last_access", Float, nullable=False, index=True),
+        )
+
+        self.metadata.create_all(self.engine)
+
+    def get_many(self, keys : list[str]) -> dict[str, list[float]]:
+        if not keys:
+            return {}
+
+        stmt = select(self.cache.c.cache_key, self.cache.c.vector).where(self.cache.c.cache_key.in_(keys))
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+
+        if rows:
+            with self._touch_lock:
+                self._touched.update(row.cache_key for row in rows)
+                due = len(self._touched) >= self.touch_batch or time.monotonic() - self._last_touch >= self.touch_interval
+            if due:
+                with self.engine.begin() as conn:
+                    self._flush_touches(conn)
+
+        return {row.cache_key : _unpack(row.vector) for row in rows}
+
+    def _flush_touches(self, conn : Connection):
+        with self._touch_lock:
+            touched, self._touched = self._touched, set()
+            self._last_touch = time.monotonic()
+        if touched:
+            conn.execute(update(self.cache).where(self.cache.c.cache_key.in_(list(touched))).values(last_access = time.time()))
+
+    def put_many(self, items : dict[str, tuple[str, list[float]]]):
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            {"cache_key" : key, "namespace" : namespace, "vector" : _pack(vector), "last_access" : now}
+            for key, (namespace, vector) in items.items()
+        ]
+        stmt = insert(self.cache).prefix_with("OR REPLACE")
+
+        with self.engine.begin() as conn:
+            self._flush_touches(conn)
+            conn.execute(stmt, rows)
+
+            count = conn.execute(select(func.count()).select_from(self.cache)).scalar_one()
+            excess = count - self.max_size
+            if excess > 0:
+                oldest = select(self.cache.c.cache_key).order_by(self.cache.c.last_access.asc()).limit(excess)
+                conn.execute(delete(self.cache).where(self.cache.c.cache_key.in_(oldest)))
+                logger.debug(f"Evicted {excess} vectors from the embedding cache")
+
+    def close(self):
+        with self.engine.begin() as conn:
+            self._flush_touches(conn)
+        self.engine.dispose()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Two-tier cache in front of an `Embeddings` model.
+
+    Lookups go through an in-process LRU first and then through `EmbeddingDiskStore`;
+    only the remaining texts are sent to the wrapped model, in a single batch.
+    Attributes that are not defined here (e.g. `_client`, `model_name`) are forwarded to the wrapped model.
+
+    Args:
+        embedding_model (Embeddings): The model to wrap, usually a `HuggingFaceEmbeddings`.
+        namespace (Optional[str]): Cache namespace. Defaults to the model's `model_name`.
+        memory_size (int): Maximum number of vectors kept in the in-process LRU.
+        disk_store (Optional[EmbeddingDiskStore]): Persistent second tier. If None, only the LRU is used.
+    """
+    def __init__(self,
+                 embedding_model : Embeddings,
+                 namespace : Optional[str] = None,
+                 memory_size : int = 2048,
+                 disk_store : Optional[EmbeddingDiskStore] = None
+                 ):
+        self.embedding_model = embedding_model
+        self.namespace = namespace or getattr(embedding_model, "model_name", type(embedding_model).__name__)
+        # queries only share keys with documents when both are encoded the same way
+        if getattr(embedding_model, "query_encode_kwargs", None):
+            self.query_namespace = f"{self.namespace}:query"
+        else:
+            self.query_namespace = self.namespace
+
+        self.memory_size = memory_size
+        self.disk_store = disk_store
+
+        self._lru : OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name : str):
+        # only called when normal lookup fails
+        if name == "embedding_model":
+            raise AttributeError(name)
+        return getattr(self.embedding_model, name)
+
+    @staticmethod
+    def make_key(namespace : str, text : str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def _remember(self, key : str, vector : list[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, namespace : str, texts : list[str], encode) -> list[list[float]]:
+        keys = [self.make_key(namespace, text) for text in texts]
+        found : dict[str, list[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                    self.hits += 1
+
+        pending = list(dict.fromkeys(key for key in keys if key not in found))
+
+        if pending and self.disk_store is not None:
+            from_disk = self.disk_store.get_many(pending)
+            with self._lock:
+                for key, vector in from_disk.items():
+                    self._remember(key, vector)
+                self.disk_hits += len(from_disk)
+            found.update(from_disk)
+            pending = [key for key in pending if key not in from_disk]
+
+        if pending:
+            text_by_key = {}
+            for key, text in zip(keys, texts):
+                text_by_key.setdefault(key, text)
+            vectors = encode([text_by_key[key] for key in pending])
+            computed = dict(zip(pending, vectors))
+
+            with self._lock:
+                for key, vector in computed.items():
+                    self._remember(key, vector)
+                self.misses += len(pending)
+
+            if self.disk_store is not None:
+                self.disk_store.put_many({key : (namespace, vector) for key, vector in computed.items()})
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts : list[str]) -> list[list[float]]:
+        return self._lookup(self.namespace, texts, self.embedding_model.embed_documents)
+
+    def embed_query(self, text : str) -> list[float]:
+        return self._lookup(self.query_namespace, [text], lambda pending : [self.embedding_model.embed_query(t) for t in pending])[0]
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "namespace" : self.namespace,
+                "memory_entries" : len(self._lru),
+                "hits" : self.hits,
+                "disk_hits" : self.disk_hits,
+                "misses" : self.misses,
+                "hit_rate" : (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear_memory(self):
+        with self._lock:
+            self._lru.clear()
+
+    def close(self):
+        if self.disk_store is not None:
+            self.disk_store.close()
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+from utils import Logger
+
+logger = Logger(__name__)
+
+class EmbeddingService(Embeddings):
+    """
+    Runs an embedding model off the event loop and micro-batches concurrent queries.
+
+    `aembed_query` calls that arrive within `batch_window_ms` of each other (or until
+    `max_batch_size` is reached) are encoded together in one call on a bounded thread pool,
+    so concurrent requests share a single forward pass and never block the event loop.
+    The synchronous methods call the wrapped model directly, and attributes that are not
+    defined here are forwarded to it. Pending queries are kept per event loop, so the
+    process-wide instance stays usable across successive `asyncio.run` calls.
+
+    Args:
+        embedding_model (Embeddings): The model to serve, usually the cached `HuggingFaceEmbeddings`.
+        max_workers (int): Size of the encoding thread pool.
+        batch_window_ms (float): How long the first query of a batch waits for others to join.
+        max_batch_size (int): A batch is dispatched immediately once it reaches this size.
+    """
+    def __init__(self,
+                 embedding_model : Embeddings,
+                 max_workers : int = 1,
+                 batch_window_ms : float = 5.0,
+                 max_batch_size : int = 32
+                 ):
+        self.embedding_model = embedding_model
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+
+        # loop -> waiting queries and the timer that flushes them; entries go away with their loop
+        self._pending : "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, list[tuple[str, asyncio.Future]]]" = weakref.WeakKeyDictionary()
+        self._flush_handles : "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.TimerHandle]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.largest_batch = 0
+        self.last_batch_size = 0
+
+    def __getattr__(self, name : str):
+        if name == "embedding_model":
+            raise AttributeError(name)
+        return getattr(self.embedding_model, name)
+
+    def embed_documents(self, texts : list[str]) -> list[list[float]]:
+        return self.embedding_model.embed_documents(texts)
+
+    def embed_query(self, text : str) -> list[float]:
+        return self.embedding_model.embed_query(text)
+
+    def _embed_query_batch(self, texts : list[str]) -> list[list[float]]:
+        # queries can only be folded into `embed_documents` when both are encoded the same way
+        if getattr(self.embedding_model, "query_encode_kwargs", None):
+            return [self.embedding_model.embed_query(text) for text in texts]
+        return self.embedding_model.embed_documents(texts)
+
+    async def aembed_documents(self, texts : list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.embedding_model.embed_documents, texts)
+
+    async def aembed_query(self, text : str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            pending = self._pending.setdefault(loop, [])
+        pending.append((text, future))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif loop not in self._flush_handles:
+            self._flush_handles[loop] = loop.call_later(self.batch_window, self._flush, loop)
+
+        return await future
+
+    def _flush(self, loop : asyncio.AbstractEventLoop):
+        handle = self._flush_handles.pop(loop, None)
+        if handle is not None:
+            handle.cancel()
+
+        with self._lock:
+            batch = self._pending.pop(loop, [])
+        if not batch:
+            return
+
+        with self._lock:
+            self.in_flight += len(batch)
+            self.batches += 1
+            self.batched_queries += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.last_batch_size = len(batch)
+
+        work = loop.run_in_executor(self.executor, self._embed_query_batch, [text for text, _ in batch])
+        work.add_done_callback(lambda done : self._resolve(batch, done))
+
+    def _resolve(self, batch : list[tuple[str, asyncio.Future]], done : asyncio.Future):
+        with self._lock:
+            self.in_flight -= len(batch)
+
+        if done.cancelled() or done.exception() is not None:
+            error = asyncio.CancelledError() if done.cancelled() else done.exception()
+            logger.error(f"Embedding batch of {len(batch)} queries failed : {error!r}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), vector in zip(batch, done.result()):
+            if not future.done():
+                future.set_result(vector)
+
+    @property
+    def metrics(self) -> dict:
+        with self._lock:
+            waiting = sum(len(pending) for pending in self._pending.values())
+            return {
+                "queue_depth" : waiting + self.in_flight,
+                "waiting" : waiting,
+                "in_flight" : self.in_flight,
+                "batches" : self.batches,
+                "batched_queries" : self.batched_queries,
+                "avg_batch_size" : self.batched_queries / self.batches if self.batches else 0.0,
+                "largest_batch" : self.largest_batch,
+                "last_batch_size" : self.last_batch_size,
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if hasattr(self.embedding_model, "close"):
+            self.embedding_model.close()
@@ -1,79 +1,837 @@
 import os
 import json
+import time
+import base64
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Optional, Awaitable, Callable
+import numpy as np
 import redis.asyncio as redis
+from sqlalchemy import event, MetaData, Table, Column, Index, String, Integer, Float, Text, insert, select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from config.getenv import GetEnv
+from module.tokenizer import token_calculator
+from module.db_management import get_vector_store_instance
+from module.sqlite_utils import set_sqlite_pragmas
+from utils import Logger
 
 env = GetEnv()
+logger = Logger(__name__)
 memory_limit = env.get_memory_config['MAX_MEMORY_SIZE']
+history_token_budget = env.get_history_token_budget
 
-class RedisMemoryManager:
-    def __init__(self):
-        # 도커 환경변수부터 확인
-        env_host = os.getenv("REDIS_HOST")
-        env_port = os.getenv("REDIS_PORT")
-        self.redis_host = env_host if env_host else env.get_redis_host
-        self.redis_port = int(env_port) if env_port else int(env.get_redis_port)
+_memory_manager_instance = None
+
+SUMMARY_PREFIX = "[Summary of the earlier conversation]\n"
+
+def to_langchain_message(message : dict) -> Optional[BaseMessage]:
+    if message['type'] == 'user':
+        return HumanMessage(content=message['content'])
+    elif message['type'] == 'assistant':
+        return AIMessage(content=message['content'])
+    return None
+
+def parse_history(messages : list[dict]) -> list[tuple[BaseMessage, int]]:
+    """
+    Stored messages (oldest first) -> (message, token count) pairs.
+    """
+    items = []
+    for message in messages:
+        langchain_message = to_langchain_message(message)
+        if langchain_message is None:
+            continue
+        # messages written before token counts were stored are counted once here
+        tokens = message.get('tokens')
+        if tokens is None:
+            tokens = token_calculator(message['content'])
+        items.append((langchain_message, tokens))
+    return items
+
+def parse_summary(summary : Optional[dict]) -> Optional[tuple[BaseMessage, int]]:
+    if not summary:
+        return None
+    # a user turn rather than a system message : some providers only accept the system prompt first
+    return HumanMessage(content=SUMMARY_PREFIX + summary['content']), summary['tokens']
+
+def fit_token_budget(items : list[tuple[BaseMessage, int]], token_budget : int) -> tuple[list[BaseMessage], int]:
+    """
+    Newest-first fill : keep the most recent messages whose token counts sum to at most `token_budget`.
+    Returns the kept messages and the tokens they use.
+    """
+    kept = 0
+    total = 0
+    for _, tokens in reversed(items):
+        if total + tokens > token_budget:
+            break
+        total += tokens
+        kept += 1
+    return [message for message, _ in items[len(items) - kept:]], total
+
+def encode_vector(vector : list[float]) -> str:
+    # the client decodes responses, so vectors are stored as base64 float32
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    if norm > 0:
+        array = array / norm
+    return base64.b64encode(array.tobytes()).decode("ascii")
+
+def decode_vector(value : str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=np.float32)
+
+class CachedSession:
+    __slots__ = ("messages", "summary", "expires_at")
+
+    def __init__(self, messages : deque, summary : Optional[tuple[BaseMessage, int]], expires_at : float):
+        self.messages = messages
+        self.summary = summary
+        self.expires_at = expires_at
+
+class SessionHistoryCache:
+    """
+    In-process LRU of the most recent LangChain messages (with their token counts) and the rolling summary
+    per session, in front of the `redis` and `sqlite` memory backends.
+
+    It is written through on every append, so it stays correct as long as this process is the only
+    writer of its sessions (a single backend worker); nothing invalidates it across processes, which is
+    why it is disabled by default. A session holding fewer than `max_messages`
+    messages is cached in full, so any window can be served from it.
+
+    Args:
+        max_sessions (int): Maximum number of sessions kept. 0 disables the cache.
+        max_messages (int): Most recent messages kept per session.
+        ttl (int): Seconds after the last append before a cached session is dropped (matches the Redis key TTL). 0 keeps it.
+    """
+    def __init__(self, max_sessions : int, max_messages : int, ttl : int = 0):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl = ttl
+
+        self._sessions : OrderedDict[str, CachedSession] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_sessions > 0 and self.max_messages > 0
 
+    def _lookup(self, session_id : str) -> Optional[CachedSession]:
+        cached = self._sessions.get(session_id)
+        if cached is None:
+            return None
+        if cached.expires_at and time.monotonic() > cached.expires_at:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return cached
+
+    def __contains__(self, session_id : str) -> bool:
+        return self._lookup(session_id) is not None
+
+    def get(self, session_id : str, limit : int) -> Optional[tuple[list[tuple[BaseMessage, int]], Optional[tuple[BaseMessage, int]]]]:
+        """
+        (last `limit` messages, summary) of the session, or None when the cache can not answer for that window.
+        """
+        cached = self._lookup(session_id)
+        if cached is None or (limit > len(cached.messages) and len(cached.messages) >= self.max_messages):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return (list(cached.messages)[-limit:] if limit > 0 else []), cached.summary
+
+    def is_short(self, session_id : str) -> bool:
+        """
+        True when the session is cached in full and does not fill the window yet.
+        """
+        cached = self._lookup(session_id)
+        return cached is not None and len(cached.messages) < self.max_messages
+
+    def put(self, session_id : str, messages : list[tuple[BaseMessage, int]], summary : Optional[tuple[BaseMessage, int]] = None):
+        """
+        Replace the cached window of a session, oldest message first.
+        """
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        self._sessions[session_id] = CachedSession(deque(messages, maxlen=self.max_messages), summary, expires_at)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def append(self, session_id : str, message : tuple[BaseMessage, int]):
+        cached = self._lookup(session_id)
+        if cached is None:
+            return
+        cached.messages.append(message)
+        if self.ttl:
+            cached.expires_at = time.monotonic() + self.ttl
+
+    def set_summary(self, session_id : str, summary : tuple[BaseMessage, int]):
+        cached = self._lookup(session_id)
+        if cached is not None:
+            cached.summary = summary
+
+    def invalidate(self, session_id : str):
+        self._sessions.pop(session_id, None)
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "sessions" : len(self._sessions),
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "hit_rate" : self.hits / lookups if lookups else 0.0,
+        }
+
+# never more than storage keeps, or trimmed messages would still be served from the cache
+session_cache = SessionHistoryCache(
+    max_sessions=env.get_session_cache_size,
+    max_messages=min(int(memory_limit), env.get_history_retention),
+    ttl=env.get_session_ttl
+)
+
+# sessions with a compaction in progress
+_compacting : set[str] = set()
+
+
+class MemoryManager(ABC):
+    """
+    Session chat memory used by main.py and the generator nodes.
+
+    The history window, token budget, rolling summary, recall index and `session_cache` are handled here;
+    backends only implement the storage primitives (`_append`, `_read`, ...). Messages are stored as
+    dicts `{"type", "content", "tokens", "ts"}` and passed between the two layers oldest first.
+
+    Backends (`[MEMORY] MEMORY_BACKEND`, see `get_memory_manager`):
+        redis     - `RedisMemoryManager`, shared by every backend process.
+        inprocess - `InProcessMemoryManager`, dicts and deques in this process, lost on restart.
+        sqlite    - `SQLiteMemoryManager`, a SQLite file in SQLITE_DB_DIR, for single-node deployments.
+    """
+    name = "base"
+    # backends that already keep everything in-process skip `session_cache`
+    use_cache = True
+
+    def __init__(self):
         self.max_memory_size = env.get_memory_config['MAX_MEMORY_SIZE']
+        # 세션당 보관하는 최대 메시지 수, 세션 TTL(초, 0이면 만료 없음)
+        self.history_retention = env.get_history_retention
+        self.session_ttl = env.get_session_ttl
+        # 최근 윈도우 밖으로 밀려난 메시지가 이 개수 이상이면 요약에 합침 (0이면 요약 안 함)
+        self.summary_trigger = env.get_summary_trigger
+        # 현재 질의와 관련된 이전 턴을 임베딩 검색으로 추가 (0이면 사용 안 함)
+        self.recall_top_k = env.get_recall_top_k
+        self.recall_threshold = env.get_recall_threshold
 
-        self.r = redis.Redis(
-            host=self.redis_host,
-            port=self.redis_port,
-            decode_responses=True
-        )
+    @property
+    def cache_enabled(self) -> bool:
+        return self.use_cache and session_cache.enabled
+
+    @property
+    def max_turns(self) -> int:
+        # recall index size, one turn per user + assistant message pair
+        return max(self.history_retention // 2, 1)
+
+    # storage primitives
+    @abstractmethod
+    async def _append(self, session_id : str, message : dict, window : int = 0) -> Optional[tuple[list[dict], Optional[dict]]]:
+        """
+        Append `message`, keep the last `history_retention` messages, refresh the session TTL and register the session.
+        With `window` > 0, also return the last `window` messages and the summary as they are after the append.
+        """
+
+    @abstractmethod
+    async def _read(self, session_id : str, count : int) -> tuple[list[dict], Optional[dict]]:
+        """
+        Last `count` messages of the session and its summary.
+        """
+
+    @abstractmethod
+    async def _session_ids(self) -> list[str]:
+        ...
+
+    @abstractmethod
+    async def _trim(self, session_id : str):
+        ...
+
+    @abstractmethod
+    async def _clear(self, session_id : str):
+        ...
+
+    @abstractmethod
+    async def _write_summary(self, session_id : str, summary : dict) -> bool:
+        """
+        Store the rolling summary. Returns False (and stores nothing) when the session no longer exists.
+        """
+
+    @abstractmethod
+    async def _add_turn(self, session_id : str, turn : dict):
+        """
+        Add a turn to the recall index, keeping the newest `max_turns`.
+        """
+
+    @abstractmethod
+    async def _turns(self, session_id : str) -> list[dict]:
+        ...
+
+    async def close(self):
+        pass
+
+    async def append_message(self, session_id : str, message : dict):
+        """
+        Append a message and keep `session_cache` written through.
+        A session missing from the cache is prefetched into it by the same backend call.
+        """
+        message.setdefault("tokens", token_calculator(message['content']))
+        message.setdefault("ts", time.time())
+        prefetch = self.cache_enabled and session_id not in session_cache
+        result = await self._append(session_id, message, window=session_cache.max_messages if prefetch else 0)
+
+        if prefetch:
+            messages, summary = result
+            session_cache.put(session_id, parse_history(messages), parse_summary(summary))
+        elif self.cache_enabled:
+            session_cache.append(session_id, (to_langchain_message(message), message['tokens']))
 
     async def save_user_message(self, session_id : str, user_question : str):
         message = {
             "type" : "user",
             "content" : user_question
         }
-
-        await self.r.lpush(f"session:{session_id}:history", json.dumps(message))
-        await self.r.sadd("all_sessions", session_id)
-    
-    async def get_all_session_ids(self):
-        session_ids = await self.r.smembers("all_sessions")
-        return list(session_ids)
+        await self.append_message(session_id, message)
 
     async def save_ai_message(self, session_id : str, llm_response : str):
         message = {
             "type" : "assistant",
             "content" : llm_response
         }
-        await self.r.lpush(f"session:{session_id}:history", json.dumps(message))
-    
+        await self.append_message(session_id, message)
+
+    async def get_all_session_ids(self):
+        return await self._session_ids()
+
     async def get_history(self, session_id : str):
-        key = f"session:{session_id}:history"
-        messages = await self.r.lrange(key, 0, -1)
-        return [json.loads(msg) for msg in reversed(messages)]
-    
+        messages, _ = await self._read(session_id, self.history_retention)
+        return messages
+
     async def trim_history(self, session_id : str):
-        key = f"session:{session_id}:history"
-        max_messages = self.max_memory_size
-        await self.r.ltrim(key, 0, max_messages - 1)
-    
+        await self._trim(session_id)
+
     async def clear_session(self, session_id : str):
-        key = f"session:{session_id}:history"
-        await self.r.delete(key)
-        await self.r.srem("all_sessions", session_id)
+        session_cache.invalidate(session_id)
+        await self._clear(session_id)
+
+    async def compact_session(self, session_id : str, summarize : Callable[[str, list[dict]], Awaitable[str]]) -> bool:
+        """
+        Fold the turns that left the recent window (the last MAX_MEMORY_SIZE messages) into the session's
+        rolling summary, once at least `summary_trigger` of them are not summarized yet.
+        Meant to run as a background task after a turn; returns True when the summary was updated.
+
+        Args:
+            session_id (str): The session to compact.
+            summarize (Callable): `await summarize(previous_summary, messages)` returns the new summary text.
+        """
+        if not self.summary_trigger or session_id in _compacting:
+            return False
+        if self.cache_enabled and session_cache.is_short(session_id):
+            return False
+
+        _compacting.add(session_id)
+        try:
+            messages, summary = await self._read(session_id, self.history_retention)
+
+            # messages written before timestamps were stored count as already folded once a summary exists
+            until = summary['until'] if summary else -1.0
+            keep = int(memory_limit)
+            pending = [m for m in messages[:max(len(messages) - keep, 0)] if m.get('ts', 0.0) > until]
+            if len(pending) < self.summary_trigger:
+                return False
+
+            content = await summarize(summary['content'] if summary else "", pending)
+            new_summary = {
+                "content" : content,
+                "tokens" : token_calculator(SUMMARY_PREFIX + content),
+                "until" : pending[-1].get('ts', 0.0),
+            }
 
-    async def get_langchain_message(self, session_id : str, limit : int = None):
+            # the session may have been cleared while the summary was generated
+            if not await self._write_summary(session_id, new_summary):
+                return False
+            session_cache.set_summary(session_id, parse_summary(new_summary))
+            logger.debug(f"Compacted {len(pending)} messages of session {session_id} into its summary")
+            return True
+        finally:
+            _compacting.discard(session_id)
+
+    async def index_turn(self, session_id : str, user_question : str, llm_response : str) -> bool:
+        """
+        Embed a finished turn into the session's recall index.
+        Meant to run as a background task; the index keeps at most HISTORY_RETENTION / 2 turns.
+        """
+        if not self.recall_top_k:
+            return False
+
+        embedding_model = get_vector_store_instance().get_embedding_model
+        vector = (await embedding_model.aembed_documents([f"User: {user_question}\nAssistant: {llm_response}"]))[0]
+        turn = {
+            "ts" : time.time(),
+            "user" : user_question,
+            "assistant" : llm_response,
+            "tokens" : token_calculator(user_question) + token_calculator(llm_response),
+            "vector" : encode_vector(vector),
+        }
+        await self._add_turn(session_id, turn)
+        return True
+
+    async def recall_turns(self, session_id : str, query : str, skip_recent : int = 0) -> list[dict]:
+        """
+        Up to `recall_top_k` indexed turns most similar to `query` (cosine >= RECALL_THRESHOLD), oldest first.
+        The `skip_recent` newest turns are left out, as they are already in the recent window.
+        """
+        embedding_model = get_vector_store_instance().get_embedding_model
+        turns, query_vector = await asyncio.gather(
+            self._turns(session_id),
+            embedding_model.aembed_query(query)
+        )
+
+        turns = sorted(turns, key=lambda t : t['ts'])
+        if skip_recent:
+            turns = turns[:max(len(turns) - skip_recent, 0)]
+        if not turns:
+            return []
+
+        matrix = np.stack([decode_vector(t['vector']) for t in turns])
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        scores = matrix @ (query_vector / (np.linalg.norm(query_vector) or 1.0))
+
+        top = [i for i in np.argsort(-scores)[:self.recall_top_k] if scores[i] >= self.recall_threshold]
+        return [dict(turns[i], score=float(scores[i])) for i in sorted(top)]
+
+    async def get_langchain_message(self, session_id : str, limit : int = None, token_budget : int = None, query : str = None):
+        """
+        Rolling summary (if any), earlier turns recalled for `query` (if recall is enabled) and the most recent
+        history of the session : at most `limit` messages (MAX_MEMORY_SIZE) and, when a token budget is set
+        (HISTORY_TOKEN_BUDGET, 0 disables), at most `token_budget` tokens, spent on the summary first,
+        then on recent messages filled newest-first, then on recalled turns.
+        """
         if limit is None:
             limit = int(memory_limit)
+        if token_budget is None:
+            token_budget = history_token_budget
+
+        limit = int(limit)
 
+        cached = session_cache.get(session_id, limit) if self.cache_enabled else None
+        if cached is not None:
+            items, summary = cached
+        else:
+            window = max(limit, session_cache.max_messages) if self.cache_enabled else limit
+            messages, raw_summary = await self._read(session_id, window)
+            items, summary = parse_history(messages), parse_summary(raw_summary)
+            if self.cache_enabled:
+                session_cache.put(session_id, items, summary)
+            items = items[-limit:] if limit > 0 else []
+
+        recalled = []
+        if query and self.recall_top_k:
+            recalled = await self.recall_turns(session_id, query, skip_recent=(limit + 1) // 2)
+
+        head = []
+        if token_budget:
+            remaining = token_budget
+            if summary is not None and summary[1] <= remaining:
+                head = [summary[0]]
+                remaining -= summary[1]
+            recent, used = fit_token_budget(items, remaining)
+            remaining -= used
+            kept = []
+            for turn in sorted(recalled, key=lambda t : -t['score']):
+                if turn['tokens'] <= remaining:
+                    kept.append(turn)
+                    remaining -= turn['tokens']
+            recalled = sorted(kept, key=lambda t : t['ts'])
+        else:
+            if summary is not None:
+                head = [summary[0]]
+            recent = [message for message, _ in items]
+
+        for turn in recalled:
+            head += [HumanMessage(content=turn['user']), AIMessage(content=turn['assistant'])]
+        return head + recent
+
+class RedisMemoryManager(MemoryManager):
+    """
+    Sessions in Redis : `session:{id}:history` (list, newest first), `session:{id}:summary`,
+    `session:{id}:recall` (hash, one field per turn) and the `all_sessions` set.
+    Every append is one MULTI/EXEC round trip.
+    """
+    name = "redis"
+
+    def __init__(self):
+        super().__init__()
+        # 도커 환경변수부터 확인
+        env_host = os.getenv("REDIS_HOST")
+        env_port = os.getenv("REDIS_PORT")
+        self.redis_host = env_host if env_host else env.get_redis_host
+        self.redis_port = int(env_port) if env_port else int(env.get_redis_port)
+
+        self.r = redis.Redis(
+            host=self.redis_host,
+            port=self.redis_port,
+            decode_responses=True
+        )
+
+    async def _append(self, session_id : str, message : dict, window : int = 0) -> Optional[tuple[list[dict], Optional[dict]]]:
+        # push + trim + TTL refresh + session index update (+ prefetch), in one round trip
         key = f"session:{session_id}:history"
-        raw = await self.r.lrange(key, 0, limit -1)
+        summary_key = f"session:{session_id}:summary"
+        async with self.r.pipeline(transaction=True) as pipe:
+            pipe.lpush(key, json.dumps(message))
+            pipe.ltrim(key, 0, self.history_retention - 1)
+            if self.session_ttl:
+                pipe.expire(key, self.session_ttl)
+                pipe.expire(summary_key, self.session_ttl)
+                pipe.expire(f"session:{session_id}:recall", self.session_ttl)
+            pipe.sadd("all_sessions", session_id)
+            if window:
+                pipe.lrange(key, 0, window - 1)
+                pipe.get(summary_key)
+            results = await pipe.execute()
 
-        parsed = [json.loads(m) for m in reversed(raw)]
+        if not window:
+            return None
+        raw, raw_summary = results[-2:]
+        return [json.loads(m) for m in reversed(raw)], json.loads(raw_summary) if raw_summary else None
 
-        messages = []
-        for m in parsed:
-            if m['type'] == 'user':
-                messages.append(HumanMessage(content=m['content']))
-            elif m['type'] == 'assistant':
-                messages.append(AIMessage(content=m['content']))
-        return messages
-    
-    
\ No newline at end of file
+    async def _read(self, session_id : str, count : int) -> tuple[list[dict], Optional[dict]]:
+        if count <= 0:
+            return [], None
+        async with self.r.pipeline(transaction=False) as pipe:
+            pipe.lrange(f"session:{session_id}:history", 0, count - 1)
+            pipe.get(f"session:{session_id}:summary")
+            raw, raw_summary = await pipe.execute()
+        return [json.loads(m) for m in reversed(raw)], json.loads(raw_summary) if raw_summary else None
+
+    async def _session_ids(self) -> list[str]:
+        session_ids = list(await self.r.smembers("all_sessions"))
+        if not self.session_ttl or not session_ids:
+            return session_ids
+
+        # 만료된 세션은 인덱스에서도 제거
+        async with self.r.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.exists(f"session:{session_id}:history")
+            alive = await pipe.execute()
+
+        expired = [session_id for session_id, exists in zip(session_ids, alive) if not exists]
+        if expired:
+            await self.r.srem("all_sessions", *expired)
+        return [session_id for session_id, exists in zip(session_ids, alive) if exists]
+
+    async def _trim(self, session_id : str):
+        await self.r.ltrim(f"session:{session_id}:history", 0, self.history_retention - 1)
+
+    async def _clear(self, session_id : str):
+        async with self.r.pipeline(transaction=True) as pipe:
+            pipe.delete(f"session:{session_id}:history", f"session:{session_id}:summary", f"session:{session_id}:recall")
+            pipe.srem("all_sessions", session_id)
+            await pipe.execute()
+
+    async def _write_summary(self, session_id : str, summary : dict) -> bool:
+        if not await self.r.exists(f"session:{session_id}:history"):
+            return False
+        await self.r.set(f"session:{session_id}:summary", json.dumps(summary), ex=self.session_ttl or None)
+        return True
+
+    async def _add_turn(self, session_id : str, turn : dict):
+        key = f"session:{session_id}:recall"
+        async with self.r.pipeline(transaction=True) as pipe:
+            pipe.hset(key, repr(turn['ts']), json.dumps(turn))
+            if self.session_ttl:
+                pipe.expire(key, self.session_ttl)
+            pipe.hlen(key)
+            results = await pipe.execute()
+
+        if results[-1] > self.max_turns:
+            fields = sorted(await self.r.hkeys(key), key=float)
+            await self.r.hdel(key, *fields[:len(fields) - self.max_turns])
+
+    async def _turns(self, session_id : str) -> list[dict]:
+        return [json.loads(t) for t in await self.r.hvals(f"session:{session_id}:recall")]
+
+    async def close(self):
+        await self.r.aclose()
+
+class InProcessSession:
+    __slots__ = ("messages", "summary", "turns", "expires_at")
+
+    def __init__(self, max_messages : int, max_turns : int):
+        self.messages : deque[dict] = deque(maxlen=max_messages)
+        self.summary : Optional[dict] = None
+        self.turns : deque[dict] = deque(maxlen=max_turns)
+        self.expires_at = 0.0
+
+class InProcessMemoryManager(MemoryManager):
+    """
+    Sessions in this process (dict of deques), with no network hop per turn.
+    History is lost on restart and is not shared between backend processes, so it suits
+    single-node deployments, development and load tests without external services.
+    """
+    name = "inprocess"
+    use_cache = False
+
+    def __init__(self):
+        super().__init__()
+        self._sessions : dict[str, InProcessSession] = {}
+
+    def _get(self, session_id : str, create : bool = False) -> Optional[InProcessSession]:
+        session = self._sessions.get(session_id)
+        if session is not None and session.expires_at and time.monotonic() > session.expires_at:
+            del self._sessions[session_id]
+            session = None
+        if session is None and create:
+            session = self._sessions[session_id] = InProcessSession(self.history_retention, self.max_turns)
+        return session
+
+    async def _append(self, session_id : str, message : dict, window : int = 0) -> Optional[tuple[list[dict], Optional[dict]]]:
+        session = self._get(session_id, create=True)
+        session.messages.append(message)
+        if self.session_ttl:
+            session.expires_at = time.monotonic() + self.session_ttl
+        if not window:
+            return None
+        return list(session.messages)[-window:], session.summary
+
+    async def _read(self, session_id : str, count : int) -> tuple[list[dict], Optional[dict]]:
+        session = self._get(session_id)
+        if session is None or count <= 0:
+            return [], None
+        return list(session.messages)[-count:], session.summary
+
+    async def _session_ids(self) -> list[str]:
+        return [session_id for session_id in list(self._sessions) if self._get(session_id) is not None]
+
+    async def _trim(self, session_id : str):
+        # the deque is bounded by `history_retention`
+        pass
+
+    async def _clear(self, session_id : str):
+        self._sessions.pop(session_id, None)
+
+    async def _write_summary(self, session_id : str, summary : dict) -> bool:
+        session = self._get(session_id)
+        if session is None:
+            return False
+        session.summary = summary
+        return True
+
+    async def _add_turn(self, session_id : str, turn : dict):
+        session = self._get(session_id)
+        if session is not None:
+            session.turns.append(turn)
+
+    async def _turns(self, session_id : str) -> list[dict]:
+        session = self._get(session_id)
+        return list(session.turns) if session is not None else []
+
+class SQLiteMemoryManager(MemoryManager):
+    """
+    Sessions in a SQLite file (MEMORY_DB_NAME in SQLITE_DB_DIR) through aiosqlite, one transaction per append.
+    Survives restarts without a Redis server; meant for a single node (one writer process).
+    Expired sessions are skipped on read and deleted on the next write or session listing.
+
+    Args:
+        db_path (Optional[str]): Database file. Defaults to the configured MEMORY_DB_NAME.
+    """
+    name = "sqlite"
+
+    def __init__(self, db_path : Optional[str] = None):
+        super().__init__()
+        self.db_path = db_path or env.get_memory_db_path
+        self.metadata = MetaData()
+
+        self.sessions = Table(
+            "chat_sessions",
+            self.metadata,
+            Column("session_id", String, primary_key=True),
+            Column("updated_at", Float, nullable=False),
+        )
+        self.messages = Table(
+            "chat_messages",
+            self.metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("session_id", String, nullable=False),
+            Column("message", Text, nullable=False), # json
+            Index("ix_chat_messages_session", "session_id", "id"),
+        )
+        self.summaries = Table(
+            "chat_summaries",
+            self.metadata,
+            Column("session_id", String, primary_key=True),
+            Column("summary", Text, nullable=False), # json
+        )
+        self.recall = Table(
+            "chat_recall",
+            self.metadata,
+            Column("session_id", String, primary_key=True),
+            Column("ts", Float, primary_key=True),
+            Column("turn", Text, nullable=False), # json
+        )
+
+        self.engine : AsyncEngine = create_async_engine(f"sqlite+aiosqlite:///{self.db_path}", echo=False)
+        event.listen(self.engine.sync_engine, "connect", set_sqlite_pragmas)
+        self._schema_ready = False
+
+    async def _run(self, fn, *args, write : bool = False):
+        if not self._schema_ready:
+            async with self.engine.begin() as conn:
+                await conn.run_sync(self.metadata.create_all)
+            self._schema_ready = True
+
+        if write:
+            async with self.engine.begin() as conn:
+                return await conn.run_sync(fn, *args)
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(fn, *args)
+
+    def _expired_before(self) -> float:
+        return time.time() - self.session_ttl if self.session_ttl else float("-inf")
+
+    def _is_alive(self, conn : Connection, session_id : str) -> bool:
+        updated_at = conn.execute(select(self.sessions.c.updated_at).where(self.sessions.c.session_id == session_id)).scalar()
+        return updated_at is not None and updated_at >= self._expired_before()
+
+    def _delete_sessions(self, conn : Connection, session_ids : list[str]):
+        for table in (self.messages, self.summaries, self.recall, self.sessions):
+            conn.execute(delete(table).where(table.c.session_id.in_(session_ids)))
+
+    def _trim_messages(self, conn : Connection, session_id : str):
+        cutoff = (
+            select(self.messages.c.id)
+            .where(self.messages.c.session_id == session_id)
+            .order_by(self.messages.c.id.desc())
+            .offset(self.history_retention)
+            .limit(1)
+            .scalar_subquery()
+        )
+        conn.execute(delete(self.messages).where(self.messages.c.session_id == session_id, self.messages.c.id <= cutoff))
+
+    def _append_sync(self, conn : Connection, session_id : str, message : dict, window : int) -> Optional[tuple[list[dict], Optional[dict]]]:
+        exists = conn.execute(select(self.sessions.c.session_id).where(self.sessions.c.session_id == session_id)).first() is not None
+        if exists and not self._is_alive(conn, session_id):
+            self._delete_sessions(conn, [session_id])
+
+        conn.execute(insert(self.messages).values(session_id=session_id, message=json.dumps(message)))
+        self._trim_messages(conn, session_id)
+        now = time.time()
+        conn.execute(
+            sqlite_insert(self.sessions)
+            .values(session_id=session_id, updated_at=now)
+            .on_conflict_do_update(index_elements=["session_id"], set_={"updated_at" : now})
+        )
+        if not window:
+            return None
+        return self._read_sync(conn, session_id, window)
+
+    def _read_sync(self, conn : Connection, session_id : str, count : int) -> tuple[list[dict], Optional[dict]]:
+        if count <= 0 or not self._is_alive(conn, session_id):
+            return [], None
+        rows = conn.execute(
+            select(self.messages.c.message)
+            .where(self.messages.c.session_id == session_id)
+            .order_by(self.messages.c.id.desc())
+            .limit(count)
+        ).scalars().all()
+        summary = conn.execute(select(self.summaries.c.summary).where(self.summaries.c.session_id == session_id)).scalar()
+        return [json.loads(m) for m in reversed(rows)], json.loads(summary) if summary else None
+
+    def _session_ids_sync(self, conn : Connection) -> list[str]:
+        if self.session_ttl:
+            expired = conn.execute(select(self.sessions.c.session_id).where(self.sessions.c.updated_at < self._expired_before())).scalars().all()
+            if expired:
+                self._delete_sessions(conn, list(expired))
+        return list(conn.execute(select(self.sessions.c.session_id).order_by(self.sessions.c.updated_at.desc())).scalars().all())
+
+    def _write_summary_sync(self, conn : Connection, session_id : str, summary : dict) -> bool:
+        if not self._is_alive(conn, session_id):
+            return False
+        value = json.dumps(summary)
+        conn.execute(
+            sqlite_insert(self.summaries)
+            .values(session_id=session_id, summary=value)
+            .on_conflict_do_update(index_elements=["session_id"], set_={"summary" : value})
+        )
+        return True
+
+    def _add_turn_sync(self, conn : Connection, session_id : str, turn : dict):
+        if not self._is_alive(conn, session_id):
+            return
+        conn.execute(sqlite_insert(self.recall).values(session_id=session_id, ts=turn['ts'], turn=json.dumps(turn)).on_conflict_do_nothing())
+        cutoff = (
+            select(self.recall.c.ts)
+            .where(self.recall.c.session_id == session_id)
+            .order_by(self.recall.c.ts.desc())
+            .offset(self.max_turns)
+            .limit(1)
+            .scalar_subquery()
+        )
+        conn.execute(delete(self.recall).where(self.recall.c.session_id == session_id, self.recall.c.ts <= cutoff))
+
+    def _turns_sync(self, conn : Connection, session_id : str) -> list[dict]:
+        if not self._is_alive(conn, session_id):
+            return []
+        rows = conn.execute(select(self.recall.c.turn).where(self.recall.c.session_id == session_id)).scalars().all()
+        return [json.loads(t) for t in rows]
+
+    async def _append(self, session_id : str, message : dict, window : int = 0) -> Optional[tuple[list[dict], Optional[dict]]]:
+        return await self._run(self._append_sync, session_id, message, window, write=True)
+
+    async def _read(self, session_id : str, count : int) -> tuple[list[dict], Optional[dict]]:
+        return await self._run(self._read_sync, session_id, count)
+
+    async def _session_ids(self) -> list[str]:
+        return await self._run(self._session_ids_sync, write=True)
+
+    async def _trim(self, session_id : str):
+        await self._run(self._trim_messages, session_id, write=True)
+
+    async def _clear(self, session_id : str):
+        await self._run(self._delete_sessions, [session_id], write=True)
+
+    async def _write_summary(self, session_id : str, summary : dict) -> bool:
+        return await self._run(self._write_summary_sync, session_id, summary, write=True)
+
+    async def _add_turn(self, session_id : str, turn : dict):
+        await self._run(self._add_turn_sync, session_id, turn, write=True)
+
+    async def _turns(self, session_id : str) -> list[dict]:
+        return await self._run(self._turns_sync, session_id)
+
+    async def close(self):
+        await self.engine.dispose()
+
+MEMORY_BACKENDS = {
+    "redis" : RedisMemoryManager,
+    "inprocess" : InProcessMemoryManager,
+    "sqlite" : SQLiteMemoryManager,
+}
+
+def get_memory_manager() -> MemoryManager:
+    global _memory_manager_instance
+    if _memory_manager_instance is None:
+        backend = env.get_memory_backend
+        if backend not in MEMORY_BACKENDS:
+            raise ValueError(f"Invalid MEMORY_BACKEND '{backend}'. Supported backends: {', '.join(MEMORY_BACKENDS)}")
+        _memory_manager_instance = MEMORY_BACKENDS[backend]()
+    return _memory_manager_instance
+
+async def close_memory_manager():
+    global _memory_manager_instance
+    if _memory_manager_instance is not None:
+        await _memory_manager_instance.close()
+        _memory_manager_instance = None
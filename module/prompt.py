@@ -461,6 +461,52 @@ or
 
     return prompt
 
+def routing_rewrite_prompt():
+    system_template = """
+You are a generic query router and search query optimizer. In a single response you must
+(1) classify the user's query and (2) write the search query used to retrieve "Strategies", "Pitfalls" or "Best Practices" from the Playbook.
+
+### 1. Route
+
+**SIMPLE (Direct Response)**
+- Queries that can be answered directly by general knowledge, simple logic, or chitchat without needing external strategies or complex reasoning.
+- Examples: "Hi, how are you?", "What is 1 + 1?", "Translate 'Hello' to Korean.", "Who is the president of USA?"
+
+**COMPLEX (ACE Framework)**
+- Queries that involve problem-solving, coding, planning, logical reasoning, or specific "how-to" methods where a strategic playbook would be beneficial.
+- Examples: "How do I sort a list in Python efficiently?", "Write a blog post about AI.", "My React code is throwing an error...", "Plan a 3-day trip to Seoul."
+
+### 2. Search Query (only for COMPLEX)
+- For code or technical input, extract the **algorithmic intent** or **technical goal**.
+- For general input, extract the **problem-solving pattern** or **core objective**.
+- Strip away specific entities (names, variable names, specific numbers) unless they are crucial keywords.
+- Format it as a generic **"How-to"** or **"Strategy to..."** phrase.
+- **MUST be written in ENGLISH.**
+- For SIMPLE queries, use an empty string.
+
+**Examples:**
+Input: def get_unique_sorted(lst): return sorted(list(set(lst)))
+Output: {{"route": "complex", "search_query": "Strategy to remove duplicates and sort a list in Python"}}
+
+Input: Recommend a 3-day trip to Jeju Island
+Output: {{"route": "complex", "search_query": "Strategy for planning a multi-day travel itinerary"}}
+
+Input: Hi, how are you?
+Output: {{"route": "simple", "search_query": ""}}
+
+### Critical Instruction:
+Respond ONLY with a JSON object with exactly the keys "route" ("simple" or "complex") and "search_query".
+"""
+    human_template = "{query}"
+
+    messages = [
+    SystemMessagePromptTemplate.from_template(system_template),
+    HumanMessagePromptTemplate.from_template(human_template)
+    ]
+    prompt = ChatPromptTemplate(messages=messages)
+
+    return prompt
+
 def simple_prompt():
     system_template = """
 You are a helpful AI assistant designed to provide clear, concise, and accurate responses to straightforward queries.
@@ -488,4 +534,33 @@ You are a helpful AI assistant designed to provide clear, concise, and accurate
     ]
     prompt = ChatPromptTemplate(messages=messages)
 
-    return prompt
\ No newline at end of file
+    return prompt
+
+def history_summary_prompt():
+    system_template = """
+You maintain a rolling summary of a conversation between a user and an AI assistant.
+The summary replaces the older turns in later prompts, so it must keep everything the assistant may need to continue the conversation.
+
+### Instructions:
+- Merge the new turns into the existing summary (which may be empty) and return the updated summary only
+- Keep facts, user preferences, decisions, open questions, code identifiers and numbers; drop greetings and filler
+- Refer to the participants as "the user" and "the assistant"
+- Be concise : at most 200 words, in plain sentences without headings
+- Write the summary in the language the user writes in
+"""
+
+    human_template = """
+### Existing summary:
+{summary}
+
+### New turns:
+{conversation}
+"""
+
+    messages = [
+    SystemMessagePromptTemplate.from_template(system_template),
+    HumanMessagePromptTemplate.from_template(human_template)
+    ]
+    prompt = ChatPromptTemplate(messages=messages)
+
+    return prompt
@@ -0,0 +1,145 @@
+import asyncio
+import weakref
+from datetime import datetime, timedelta
+
+from langchain_core.documents import Document
+
+from module.db_management import PlayBookDB, VectorStore, get_db_instance, get_vector_store_instance
+from utils import Logger
+
+logger = Logger(__name__)
+
+# changes younger than this may still be in flight in `update_playbook_node`
+IN_FLIGHT_GRACE_S = 60
+
+# one lock per event loop : `asyncio.Lock` binds to the loop it first waits on
+_write_locks : "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+def get_playbook_write_lock() -> asyncio.Lock:
+    """
+    Serializes playbook writes (`update_playbook_node`) and reconcile runs.
+
+    Reconcile runs in a worker thread and touches the same vector store and index as the learning cycle,
+    so both sides take this lock around their store operations.
+    """
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+    return lock
+
+async def run_reconcile(min_age_s : float = 0.0) -> dict:
+    """
+    Run `PlaybookReconciler.reconcile` off the event loop while holding the playbook write lock.
+    """
+    async with get_playbook_write_lock():
+        work = asyncio.ensure_future(asyncio.to_thread(get_reconciler().reconcile, min_age_s))
+        try:
+            return await asyncio.shield(work)
+        except asyncio.CancelledError:
+            # the thread can't be interrupted : keep the lock until it is done so cancelling never overlaps a write
+            await asyncio.wait([work])
+            raise
+
+class PlaybookReconciler:
+    """
+    Repairs drift between SQLite (source of truth) and the vector store from the `playbook_changes` change log.
+
+    Every playbook mutation logs the touched entry ids in the same transaction. `reconcile` consumes the
+    log in `seq` order and compares only those entries: points are deleted when the row is gone,
+    re-embedded when missing or when the content/category differ (the upsert overwrites the point, whose
+    id is derived from the entry_id), and payload-patched when only the counters differ. Processed rows are deleted, so the remaining rows are everything after the watermark
+    and a run with nothing pending costs one indexed query.
+
+    Args:
+        db (PlayBookDB): Sync playbook store.
+        vector_store (VectorStore): The vector store to repair.
+        batch_size (int): Change log rows compared per round trip.
+    """
+    def __init__(self, db : PlayBookDB, vector_store : VectorStore, batch_size : int = 256):
+        self.db = db
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+
+    def reconcile(self, min_age_s : float = 0.0) -> dict:
+        """
+        Replay pending changes older than `min_age_s` seconds. Returns what was repaired.
+        """
+        created_before = datetime.now() - timedelta(seconds=min_age_s) if min_age_s else None
+        result = {"checked" : 0, "deleted" : 0, "reembedded" : 0, "patched" : 0}
+
+        while True:
+            changes = self.db.pending_changes(limit=self.batch_size, created_before=created_before)
+            if not changes:
+                break
+
+            for key, value in self._reconcile_batch({change['entry_id'] for change in changes}).items():
+                result[key] += value
+            self.db.ack_changes([change['seq'] for change in changes])
+
+            if len(changes) < self.batch_size:
+                break
+
+        if result["deleted"] or result["reembedded"] or result["patched"]:
+            logger.info(f"Playbook reconciled : {result}")
+        return result
+
+    def _reconcile_batch(self, entry_ids : set[str]) -> dict:
+        rows = {row['entry_id'] : row for row in self.db.get_entries(list(entry_ids))}
+        points = self.vector_store.get_entries_by_ids(list(entry_ids))
+
+        orphans = [entry_id for entry_id in points if entry_id not in rows]
+        to_embed, to_patch = [], []
+        for entry_id, row in rows.items():
+            point = points.get(entry_id)
+            if point is None:
+                to_embed.append(row)
+                continue
+
+            metadata = point.get('metadata', {})
+            if point.get('page_content') != row['content'] or metadata.get('category') != row['category']:
+                to_embed.append(row)
+            elif metadata.get('helpful_count') != row['helpful_count'] or metadata.get('harmful_count') != row['harmful_count']:
+                to_patch.append(row)
+
+        if orphans:
+            self.vector_store.delete_by_entry_ids(orphans)
+        if to_patch:
+            self.vector_store.update_payloads(to_patch)
+        if to_embed:
+            docs = [
+                Document(
+                    page_content=row['content'],
+                    metadata={
+                        "entry_id" : row['entry_id'],
+                        "category" : row['category'],
+                        "helpful_count" : row['helpful_count'],
+                        "harmful_count" : row['harmful_count'],
+                        "created_at" : row['created_at'],
+                        "updated_at" : row['updated_at']
+                    }
+                ) for row in to_embed
+            ]
+            self.vector_store.to_disk(docs, verbose=False)
+
+        return {
+            "checked" : len(entry_ids),
+            "deleted" : len(orphans),
+            "reembedded" : len(to_embed),
+            "patched" : len(to_patch),
+        }
+
+def get_reconciler() -> PlaybookReconciler:
+    # not cached : `reset_all_stores` replaces the store singletons
+    return PlaybookReconciler(get_db_instance(), get_vector_store_instance())
+
+async def run_periodic_reconcile(interval_s : float):
+    """
+    Background task : reconcile every `interval_s` seconds, skipping changes that may still be in flight.
+    """
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await run_reconcile(IN_FLIGHT_GRACE_S)
+        except Exception as e:
+            logger.error(f"Playbook reconcile failed : {e!r}")
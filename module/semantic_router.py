@@ -0,0 +1,175 @@
+import threading
+from datetime import datetime
+from typing import Optional, Literal
+
+import numpy as np
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, LargeBinary, DateTime, insert, select
+from sqlalchemy.engine import Engine
+
+from config.getenv import GetEnv
+from utils import Logger
+
+env = GetEnv()
+logger = Logger(__name__)
+
+_router_instance = None
+
+ROUTES = ("simple", "complex")
+
+# seed prototypes, taken from the examples of `routing_prompt`
+SEED_EXAMPLES = {
+    "simple" : [
+        "Hi, how are you?",
+        "What is 1 + 1?",
+        "Why are eagle beaks yellow?",
+        "Translate 'Hello' to Korean.",
+        "Who is the president of USA?",
+        "Thanks, that was helpful!",
+        "What is the capital of France?",
+        "Who wrote Hamlet?",
+    ],
+    "complex" : [
+        "How do I sort a list in Python efficiently?",
+        "Write a blog post about AI.",
+        "Solve this logic puzzle step by step.",
+        "My React code is throwing an error, can you debug it?",
+        "Plan a 3-day trip to Seoul.",
+        "Write a function that removes duplicates from a list while keeping the order.",
+        "Compare these two approaches and recommend one for a production service.",
+        "Answer the question based on the context below.",
+    ],
+}
+
+class SemanticRouter:
+    """
+    Local "simple" / "complex" router built on the sentence embedding model.
+
+    Each route is represented by the centroid of its labeled example embeddings. A query is
+    routed locally when the cosine gap between the two centroids is at least `confidence_margin`;
+    inside that band `classify` returns None and the caller falls back to the LLM router.
+    Decisions of the LLM router can be fed back with `add_example`, which persists the example
+    to SQLite and updates the centroid incrementally.
+
+    Args:
+        confidence_margin (float): Minimum cosine gap between the two centroids to decide locally.
+        max_examples (int): Number of most recent stored examples per route loaded at startup.
+    """
+    def __init__(self, confidence_margin : float = 0.05, max_examples : int = 2000):
+        self.confidence_margin = confidence_margin
+        self.max_examples = max_examples
+        self.db_path = env.get_router_db_path
+        self.engine : Engine = create_engine(f"sqlite:///{self.db_path}", echo=False, future=True)
+        self.metadata = MetaData()
+
+        self.examples = Table(
+            "router_examples",
+            self.metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("query", String, nullable=False),
+            Column("route", String, nullable=False),
+            Column("source", String, nullable=False),
+            Column("vector", LargeBinary, nullable=False),
+            Column("created_at", DateTime, nullable=False),
+        )
+        self.metadata.create_all(self.engine)
+
+        self._sums : dict[str, np.ndarray] = {}
+        self._counts : dict[str, int] = {route : 0 for route in ROUTES}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _accumulate(self, route : str, vector : np.ndarray):
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        if route not in self._sums:
+            self._sums[route] = np.zeros_like(vector)
+        self._sums[route] += vector
+        self._counts[route] += 1
+
+    def load(self, embedding_model) -> "SemanticRouter":
+        """
+        Load stored examples (seeding the table on first use) and build the centroids.
+        """
+        with self._lock:
+            if self._loaded:
+                return self
+
+            with self.engine.connect() as conn:
+                has_examples = conn.execute(select(self.examples.c.id).limit(1)).first() is not None
+
+            if not has_examples:
+                for route, queries in SEED_EXAMPLES.items():
+                    vectors = embedding_model.embed_documents(queries)
+                    self._store([(query, route, "seed", vector) for query, vector in zip(queries, vectors)])
+
+            for route in ROUTES:
+                stmt = (
+                    select(self.examples.c.vector)
+                    .where(self.examples.c.route == route)
+                    .order_by(self.examples.c.id.desc())
+                    .limit(self.max_examples)
+                )
+                with self.engine.connect() as conn:
+                    for row in conn.execute(stmt):
+                        self._accumulate(route, np.frombuffer(row.vector, dtype=np.float32))
+
+            self._loaded = True
+            logger.info(f"Semantic router loaded with {self._counts} examples")
+            return self
+
+    def _store(self, rows : list[tuple[str, str, str, list[float]]]):
+        now = datetime.now()
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.examples), [
+                {
+                    "query" : query,
+                    "route" : route,
+                    "source" : source,
+                    "vector" : np.asarray(vector, dtype=np.float32).tobytes(),
+                    "created_at" : now,
+                } for query, route, source, vector in rows
+            ])
+
+    def scores(self, embedding) -> dict[str, float]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._lock:
+            result = {}
+            for route in ROUTES:
+                if not self._counts[route]:
+                    continue
+                centroid = self._sums[route] / self._counts[route]
+                result[route] = float(vector @ centroid / (np.linalg.norm(centroid) or 1.0))
+            return result
+
+    def classify(self, embedding) -> tuple[Optional[Literal["simple", "complex"]], float]:
+        """
+        Returns `(route, margin)`. `route` is None when the margin is inside the ambiguous band.
+        """
+        scores = self.scores(embedding)
+        if len(scores) < len(ROUTES):
+            return None, 0.0
+
+        margin = scores["complex"] - scores["simple"]
+        if abs(margin) < self.confidence_margin:
+            return None, margin
+        return ("complex" if margin > 0 else "simple"), margin
+
+    def add_example(self, query : str, route : str, embedding, source : str = "llm"):
+        """
+        Persist a labeled example and fold it into the centroid. Blocks on SQLite, so async callers
+        run it with `asyncio.to_thread`.
+        """
+        if route not in ROUTES:
+            return
+        self._store([(query, route, source, embedding)])
+        with self._lock:
+            self._accumulate(route, np.asarray(embedding, dtype=np.float32))
+
+def get_semantic_router(embedding_model) -> SemanticRouter:
+    global _router_instance
+    if _router_instance is None:
+        _router_instance = SemanticRouter(
+            confidence_margin=env.get_router_confidence_margin,
+            max_examples=env.get_router_max_examples
+        )
+    return _router_instance.load(embedding_model)
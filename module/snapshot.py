@@ -0,0 +1,163 @@
+import json
+from datetime import datetime
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+
+from module.db_management import PlayBookDB, VectorStore, get_db_instance, get_vector_store_instance, reset_all_stores
+from utils import Logger
+
+logger = Logger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_METADATA_KEY = b"playbook_snapshot"
+
+ENTRY_FIELDS = [
+    pa.field("entry_id", pa.string(), nullable=False),
+    pa.field("category", pa.string(), nullable=False),
+    pa.field("content", pa.string(), nullable=False),
+    pa.field("helpful_count", pa.int32()),
+    pa.field("harmful_count", pa.int32()),
+    pa.field("created_at", pa.timestamp("us"), nullable=False),
+    pa.field("updated_at", pa.timestamp("us"), nullable=False),
+    pa.field("last_used_at", pa.timestamp("us")),
+]
+
+def snapshot_schema(dim : int, header : dict) -> pa.Schema:
+    # vectors are null for entries that were not in the vector store at export time
+    vector_field = pa.field("vector", pa.list_(pa.float32(), dim))
+    return pa.schema([*ENTRY_FIELDS, vector_field], metadata={SNAPSHOT_METADATA_KEY : json.dumps(header).encode()})
+
+def _pages(db : PlayBookDB, vector_store : VectorStore, page_size : int) -> Iterator[list[tuple[dict, list[float] | None]]]:
+    exported = set()
+    page = []
+    # vectors come from the store, metadata from PlayBookDB (source of truth for the counters)
+    for record in vector_store.backend.scroll(with_vectors=True, batch_size=page_size):
+        page.append(record)
+        if len(page) >= page_size:
+            yield _join(db, page, exported)
+            page = []
+    if page:
+        yield _join(db, page, exported)
+
+    missing = [entry_id for entry_id in db.get_entry_ids() if entry_id not in exported]
+    for start in range(0, len(missing), page_size):
+        yield [(entry, None) for entry in db.get_entries(missing[start:start + page_size])]
+
+def _join(db : PlayBookDB, records : list, exported : set) -> list[tuple[dict, list[float] | None]]:
+    rows = {row['entry_id'] : row for row in db.get_entries([record.entry_id for record in records])}
+    page = []
+    for record in records:
+        row = rows.get(record.entry_id)
+        if row is None or record.entry_id in exported: # orphaned point, or duplicate point of the same entry
+            continue
+        exported.add(record.entry_id)
+        page.append((row, record.vector))
+    return page
+
+def export_playbook(path : str, page_size : int = 1024) -> int:
+    """
+    Write the playbook (PlayBookDB rows + stored vectors) to a single Parquet file, one row group per page.
+    Returns the number of exported entries.
+    """
+    db = get_db_instance()
+    vector_store = get_vector_store_instance()
+    dim = vector_store.backend.dimension() or vector_store.get_embedding_size()
+    header = {
+        "format" : SNAPSHOT_FORMAT,
+        "embedding_model" : getattr(vector_store.get_embedding_model, "model_name", None),
+        "dimension" : dim,
+        "exported_at" : datetime.now().isoformat(),
+    }
+    schema = snapshot_schema(dim, header)
+
+    exported = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for page in _pages(db, vector_store, page_size):
+            if not page:
+                continue
+            columns = {field.name : [row.get(field.name) for row, _ in page] for field in ENTRY_FIELDS}
+            columns["vector"] = [vector for _, vector in page]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            exported += len(page)
+
+    logger.info(f"Exported {exported} playbook entries ({dim}-dim vectors) to {path}")
+    return exported
+
+def read_snapshot_header(path : str) -> dict:
+    metadata = pq.read_schema(path).metadata or {}
+    if SNAPSHOT_METADATA_KEY not in metadata:
+        raise ValueError(f"{path} is not a playbook snapshot")
+    return json.loads(metadata[SNAPSHOT_METADATA_KEY])
+
+def validate_snapshot_header(header : dict, vector_store : VectorStore):
+    """
+    Raise ValueError when the snapshot can not be loaded into `vector_store` as it is.
+    """
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {header.get('format')}")
+
+    target_size = vector_store.get_embedding_size()
+    if header.get("dimension") != target_size:
+        raise ValueError(
+            f"Snapshot holds {header.get('dimension')}-dim vectors but the embedding model produces {target_size}. "
+            f"Set OUTPUT_DIMENSION or the embedding model to match the exporting node."
+        )
+
+    model_name = getattr(vector_store.get_embedding_model, "model_name", None)
+    if header.get("embedding_model") and model_name and header["embedding_model"] != model_name:
+        raise ValueError(
+            f"Snapshot was embedded with '{header['embedding_model']}', this node uses '{model_name}'. "
+            f"Vectors of different models are not comparable; re-export with the same embedding model."
+        )
+
+def import_playbook(path : str, replace : bool = False) -> int:
+    """
+    Load a snapshot written by `export_playbook`. Vectors are bulk-upserted as they are, without re-embedding;
+    entries exported without a vector are embedded later by the reconciler.
+
+    Args:
+        path (str): Snapshot file.
+        replace (bool): Reset both stores first. Otherwise entries are merged, replacing those with the same entry_id.
+    """
+    # validate everything before `replace` wipes the live playbook
+    header = read_snapshot_header(path)
+    validate_snapshot_header(header, get_vector_store_instance())
+
+    if replace:
+        reset_all_stores(target="both")
+
+    db = get_db_instance()
+    vector_store = get_vector_store_instance()
+
+    imported = 0
+    parquet_file = pq.ParquetFile(path)
+    for group in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(group)
+        vectors = table.column("vector").to_pylist()
+        entries = table.drop_columns(["vector"]).to_pylist()
+
+        db.apply_delta(adds=entries)
+
+        with_vectors = [(entry, vector) for entry, vector in zip(entries, vectors) if vector is not None]
+        if with_vectors:
+            docs = [
+                Document(
+                    page_content=entry['content'],
+                    metadata={
+                        "entry_id" : entry['entry_id'],
+                        "category" : entry['category'],
+                        "helpful_count" : entry['helpful_count'],
+                        "harmful_count" : entry['harmful_count'],
+                        "created_at" : entry['created_at'],
+                        "updated_at" : entry['updated_at']
+                    }
+                ) for entry, _ in with_vectors
+            ]
+            vector_store.to_disk(docs, verbose=False, embeddings=[vector for _, vector in with_vectors])
+        imported += len(entries)
+
+    logger.info(f"Imported {imported} playbook entries from {path}")
+    return imported
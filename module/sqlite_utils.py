@@ -0,0 +1,12 @@
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run while a learning cycle writes, and `synchronous=NORMAL` fsyncs only at
+    checkpoints instead of on every commit (still durable against application crashes).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")
+    cursor.close()
@@ -0,0 +1,11 @@
+import tiktoken
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def get_token_encoding(name : str = "o200k_base") -> tiktoken.Encoding:
+    return tiktoken.get_encoding(name)
+
+def token_calculator(text : str) -> int:
+    encoding = get_token_encoding()
+    tokens = encoding.encode(text, disallowed_special=())
+    return len(tokens)
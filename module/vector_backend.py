@@ -0,0 +1,662 @@
+import os
+import re
+import glob
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Iterator, NamedTuple, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient, models
+from sqlalchemy import MetaData, Table, Column, Integer, bindparam, select, update, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from module.vector_index import normalize_rows
+from utils import Logger
+
+logger = Logger(__name__)
+
+CONTENT_KEY = QdrantVectorStore.CONTENT_KEY
+METADATA_KEY = QdrantVectorStore.METADATA_KEY
+# a snapshot can be removed between the version read and the load; retry with the version read again
+SNAPSHOT_LOAD_ATTEMPTS = 3
+
+def payload_value(v):
+    # Qdrant stores datetimes as ISO strings; mirror that for the other backends and the in-memory index
+    return v.isoformat() if isinstance(v, datetime) else v
+
+class VectorRecord(NamedTuple):
+    entry_id : str
+    vector : Optional[list[float]]
+    payload : dict # {"page_content", "metadata"}
+
+class VectorBackend(ABC):
+    """
+    Storage behind `VectorStore`. Points are keyed by playbook `entry_id` and carry a
+    Qdrant-style payload (`page_content` + `metadata`), whatever the backend.
+    """
+    name : str
+
+    @abstractmethod
+    def dimension(self) -> Optional[int]:
+        """
+        Size of the stored vectors, None while nothing is stored.
+        """
+
+    @abstractmethod
+    def upsert(self, entry_ids : list[str], vectors : list[list[float]], payloads : list[dict], dim : int):
+        """
+        Insert or replace the vectors of `entry_ids`. `dim` is used to create the storage on first write.
+        """
+
+    @abstractmethod
+    def delete(self, entry_ids : list[str]):
+        ...
+
+    @abstractmethod
+    def update_metadata(self, updates : dict[str, dict]):
+        """
+        Merge `{entry_id : {field : value}}` into the stored metadata without touching the vectors.
+        Entries without a point are skipped; the reconciler re-embeds them from the change log.
+        """
+
+    @abstractmethod
+    def search(self, embedding : list[float], k : int, score_threshold : Optional[float] = None) -> list[tuple[Document, float]]:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def scroll(self, with_vectors : bool = False, entry_ids : Optional[list[str]] = None, batch_size : int = 100) -> Iterator[VectorRecord]:
+        """
+        Iterate over the stored points, or only over those of `entry_ids`.
+        """
+
+    @abstractmethod
+    def migrate(self, target_size : int, reencode : Callable[[list[VectorRecord]], list[list[float]]], batch_size : int = 256) -> int:
+        """
+        Replace every stored vector with `reencode(records)`, switching the storage to `target_size`.
+        Returns the number of migrated points.
+        """
+
+    def close(self):
+        pass
+
+class QdrantProfile(NamedTuple):
+    """
+    Collection and search settings of a Qdrant collection. The `default` profile leaves everything
+    to Qdrant; `large` (see `from_env`) is meant for playbooks in the 100k range on a Qdrant server:
+    int8 scalar quantization kept in RAM with rescoring on the original vectors, original vectors
+    on disk, and explicit HNSW `m` / `ef_construct` / search `ef`.
+    Local mode searches exhaustively and ignores all of these.
+    """
+    name : str = "default"
+    hnsw_m : Optional[int] = None
+    hnsw_ef_construct : Optional[int] = None
+    search_ef : Optional[int] = None
+    quantization : bool = False
+    rescore : bool = True
+    oversampling : Optional[float] = None
+    on_disk : Optional[bool] = None
+
+    @classmethod
+    def from_env(cls, env) -> "QdrantProfile":
+        if env.get_qdrant_profile != "large":
+            return cls()
+        return cls(
+            name="large",
+            hnsw_m=env.get_qdrant_hnsw_m,
+            hnsw_ef_construct=env.get_qdrant_hnsw_ef_construct,
+            search_ef=env.get_qdrant_search_ef,
+            quantization=True,
+            rescore=env.get_qdrant_quantization_rescore,
+            oversampling=env.get_qdrant_quantization_oversampling,
+            on_disk=env.get_qdrant_on_disk_vectors,
+        )
+
+    def hnsw_config(self) -> Optional[models.HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self) -> Optional[models.ScalarQuantization]:
+        if not self.quantization:
+            return None
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        if self.search_ef is None and not self.quantization:
+            return None
+        quantization = models.QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling) if self.quantization else None
+        return models.SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
+
+def point_id(entry_id : str) -> str:
+    """
+    Qdrant point id of a playbook entry : the entry_id itself (a UUID), or a UUID derived from it otherwise.
+    """
+    try:
+        return str(uuid.UUID(entry_id))
+    except ValueError:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, entry_id))
+
+class QdrantBackend(VectorBackend):
+    """
+    Qdrant collection, local mode (`path`) or server (`QDRANT_HOST`).
+
+    The point id of an entry is `point_id(entry_id)`, so upserts overwrite in place and lookups
+    and deletes are direct id operations. Collections written with random point ids are rewritten
+    once, the first time they are opened. `metadata.entry_id` and `metadata.category` get keyword
+    payload indexes for the filtered queries that remain. Collection existence and vector size are
+    cached per process.
+
+    Collections are created with the settings of `profile`; `apply_profile` updates an existing one.
+    """
+    name = "qdrant"
+    INDEXED_FIELDS = ("entry_id", "category")
+
+    def __init__(self, path : str, collection_name : str, profile : QdrantProfile = QdrantProfile()):
+        self.path = path
+        self.collection_name = collection_name
+        self.profile = profile
+
+        qdrant_host = os.getenv("QDRANT_HOST")
+        if qdrant_host:
+            # docker
+            self.client = QdrantClient(url=f"http://{qdrant_host}:6333")
+        else:
+            # local
+            self.client = QdrantClient(path=path)
+
+        self._dimension : Optional[int] = None
+        self._checked = False
+
+    def _collection_dimension(self) -> Optional[int]:
+        """
+        Vector size of the collection, None if it doesn't exist. Checked once, then cached.
+        """
+        if not self._checked:
+            if self.client.collection_exists(self.collection_name):
+                self._dimension = self.client.get_collection(self.collection_name).config.params.vectors.size
+                self._migrate_point_ids()
+            self._checked = True
+        return self._dimension
+
+    def _create_collection(self, name : str, dim : int):
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE, on_disk=self.profile.on_disk),
+            hnsw_config=self.profile.hnsw_config(),
+            quantization_config=self.profile.quantization_config()
+        )
+        self._create_payload_indexes(name)
+
+    def apply_profile(self):
+        """
+        Switch an existing collection to `profile`. Qdrant rebuilds the HNSW graph and the quantized
+        vectors in the background; the collection keeps serving searches meanwhile.
+        """
+        if self._collection_dimension() is None:
+            logger.info(f"Collection '{self.collection_name}' doesn't exist. It will be created with the '{self.profile.name}' profile.")
+            return
+
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            vectors_config={"" : models.VectorParamsDiff(on_disk=bool(self.profile.on_disk))},
+            hnsw_config=self.profile.hnsw_config(),
+            quantization_config=self.profile.quantization_config() or models.Disabled.DISABLED
+        )
+        logger.info(f"Collection '{self.collection_name}' updated to the '{self.profile.name}' profile")
+
+    def _create_payload_indexes(self, name : str):
+        for field in self.INDEXED_FIELDS:
+            self.client.create_payload_index(
+                collection_name=name,
+                field_name=f"{METADATA_KEY}.{field}",
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
+
+    def _migrate_point_ids(self, batch_size : int = 256):
+        records, _ = self.client.scroll(collection_name=self.collection_name, limit=1, with_payload=True)
+        if not records or str(records[0].id) == point_id(records[0].payload[METADATA_KEY]['entry_id']):
+            return
+
+        logger.info(f"Rewriting '{self.collection_name}' with entry_id point ids")
+        self._create_payload_indexes(self.collection_name)
+        batch = []
+        for record in self._scroll_collection(self.collection_name, True, None, batch_size):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self._rewrite_ids(batch)
+                batch = []
+        if batch:
+            self._rewrite_ids(batch)
+
+    def _rewrite_ids(self, records : list):
+        new_ids = [point_id(r.payload[METADATA_KEY]['entry_id']) for r in records]
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[models.PointStruct(id=new_id, vector=r.vector, payload=r.payload) for r, new_id in zip(records, new_ids)],
+            wait=True
+        )
+        stale = [r.id for r, new_id in zip(records, new_ids) if str(r.id) != new_id]
+        if stale:
+            self.client.delete(collection_name=self.collection_name, points_selector=models.PointIdsList(points=stale), wait=True)
+
+    def dimension(self) -> Optional[int]:
+        return self._collection_dimension()
+
+    def upsert(self, entry_ids : list[str], vectors : list[list[float]], payloads : list[dict], dim : int):
+        if self._collection_dimension() is None:
+            self._create_collection(self.collection_name, dim)
+            self._dimension = dim
+            logger.info(f"Collection '{self.collection_name}' created at {self.path}")
+
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                models.PointStruct(id=point_id(entry_id), vector=vector, payload=payload)
+                for entry_id, vector, payload in zip(entry_ids, vectors, payloads)
+            ],
+            wait=True
+        )
+
+    def delete(self, entry_ids : list[str]):
+        if self._collection_dimension() is None:
+            return
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=[point_id(entry_id) for entry_id in entry_ids]),
+            wait=True
+        )
+
+    def update_metadata(self, updates : dict[str, dict]):
+        if not updates or self._collection_dimension() is None:
+            return
+
+        # SetPayload on a missing point fails the whole batch (KeyError locally, 404 on a server), and
+        # points can be pruned by another cycle or the reconciler after the caller read the playbook
+        existing = {
+            str(point.id) for point in self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=[point_id(entry_id) for entry_id in updates],
+                with_payload=False,
+                with_vectors=False
+            )
+        }
+        operations = [
+            models.SetPayloadOperation(
+                set_payload=models.SetPayload(
+                    payload=fields,
+                    points=[point_id(entry_id)],
+                    key=METADATA_KEY
+                )
+            ) for entry_id, fields in updates.items() if point_id(entry_id) in existing
+        ]
+        if len(operations) < len(updates):
+            logger.debug(f"Skipped payload update of {len(updates) - len(operations)} missing points")
+        if not operations:
+            return
+        self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=operations,
+            wait=True
+        )
+
+    def search(self, embedding : list[float], k : int, score_threshold : Optional[float] = None) -> list[tuple[Document, float]]:
+        if self._collection_dimension() is None:
+            return []
+
+        points = self.client.query_points(
+            collection_name=self.collection_name,
+            query=list(embedding),
+            limit=k,
+            score_threshold=score_threshold,
+            search_params=self.profile.search_params(),
+            with_payload=True
+        ).points
+        return [
+            (Document(page_content=point.payload[CONTENT_KEY], metadata=point.payload[METADATA_KEY]), point.score)
+            for point in points
+        ]
+
+    def count(self) -> int:
+        if self._collection_dimension() is None:
+            return 0
+        return self.client.count(collection_name=self.collection_name, exact=True).count
+
+    def _scroll_collection(self, collection_name : str, with_vectors : bool, scroll_filter : Optional[models.Filter], batch_size : int):
+        next_page_offset = None
+
+        while True:
+            records, next_page_offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                with_payload=True,
+                with_vectors=with_vectors,
+                offset=next_page_offset
+            )
+
+            if not records:
+                break
+
+            yield from records
+
+            if next_page_offset is None:
+                break
+
+    def scroll(self, with_vectors : bool = False, entry_ids : Optional[list[str]] = None, batch_size : int = 100) -> Iterator[VectorRecord]:
+        if self._collection_dimension() is None:
+            return
+
+        if entry_ids is None:
+            records = self._scroll_collection(self.collection_name, with_vectors, None, batch_size)
+        else:
+            ids = [point_id(entry_id) for entry_id in entry_ids]
+            records = (
+                record
+                for start in range(0, len(ids), batch_size)
+                for record in self.client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=ids[start:start + batch_size],
+                    with_payload=True,
+                    with_vectors=with_vectors
+                )
+            )
+        for record in records:
+            yield VectorRecord(record.payload[METADATA_KEY]['entry_id'], record.vector, record.payload)
+
+    def migrate(self, target_size : int, reencode : Callable[[list[VectorRecord]], list[list[float]]], batch_size : int = 256) -> int:
+        """
+        The points are copied into a staging collection first, so the original data is never
+        the only copy while the collection is being recreated.
+        """
+        self._collection_dimension()
+        staging_name = f"{self.collection_name}__migrate"
+        if self.client.collection_exists(staging_name):
+            self.client.delete_collection(staging_name)
+        self._create_collection(staging_name, target_size)
+
+        migrated = 0
+        batch = []
+        for record in self._scroll_collection(self.collection_name, True, None, batch_size):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                migrated += self._write_migrated(staging_name, batch, reencode)
+                batch = []
+        if batch:
+            migrated += self._write_migrated(staging_name, batch, reencode)
+
+        self.client.delete_collection(self.collection_name)
+        self._create_collection(self.collection_name, target_size)
+        self._dimension = target_size
+
+        batch = []
+        for record in self._scroll_collection(staging_name, True, None, batch_size):
+            batch.append(models.PointStruct(id=record.id, vector=record.vector, payload=record.payload))
+            if len(batch) >= batch_size:
+                self.client.upsert(collection_name=self.collection_name, points=batch, wait=True)
+                batch = []
+        if batch:
+            self.client.upsert(collection_name=self.collection_name, points=batch, wait=True)
+
+        self.client.delete_collection(staging_name)
+        return migrated
+
+    def _write_migrated(self, collection_name : str, records : list, reencode : Callable[[list[VectorRecord]], list[list[float]]]) -> int:
+        vectors = reencode([VectorRecord(r.payload[METADATA_KEY]['entry_id'], r.vector, r.payload) for r in records])
+        self.client.upsert(
+            collection_name=collection_name,
+            points=[
+                models.PointStruct(id=r.id, vector=vector, payload=r.payload)
+                for r, vector in zip(records, vectors)
+            ],
+            wait=True
+        )
+        return len(records)
+
+    def close(self):
+        self.client.close()
+
+class SQLiteVectorBackend(VectorBackend):
+    """
+    Vectors stored next to the playbook rows, as normalized float32 BLOBs in the `vector` column of
+    the `playbook` table, and searched through a memory-mapped NumPy matrix.
+
+    The matrix is a snapshot of the BLOBs written to `<SQLITE_DB_DIR>/<name>.v<version>.npy`, where
+    `version` is bumped in the same transaction as every vector write. Each search checks the version
+    (one primary-key lookup) and re-maps the matching snapshot, building it if no process has yet,
+    so several serving processes share one page-cached matrix and see each other's writes.
+    Metadata is read from the playbook row of each hit, so counters are never stale.
+    Unlike Qdrant local mode, nothing holds an exclusive lock on the store.
+
+    Deleting a vector clears the BLOB; the row itself belongs to `PlayBookDB`.
+
+    Args:
+        db (PlayBookDB): Provides the engine and the `playbook` table. The backend disposes its engine on `close`.
+        name (str): Prefix of the matrix snapshot files.
+    """
+    name = "sqlite"
+
+    def __init__(self, db, name : str):
+        self.db = db
+        self.engine = db.engine
+        self.playbook = db.playbook
+        self.snapshot_prefix = os.path.join(os.path.dirname(db.db_path), name)
+
+        self.metadata = MetaData()
+        self.state = Table(
+            "playbook_vector_state",
+            self.metadata,
+            Column("id", Integer, primary_key=True),
+            Column("version", Integer, nullable=False),
+        )
+        self.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(sqlite_insert(self.state).values(id=1, version=0).on_conflict_do_nothing())
+
+        self._version = None
+        self._ids : list[str] = []
+        self._matrix : Optional[np.ndarray] = None
+
+    def _bump_version(self, conn):
+        conn.execute(update(self.state).where(self.state.c.id == 1).values(version=self.state.c.version + 1))
+
+    def _read_version(self, conn) -> int:
+        return conn.execute(select(self.state.c.version).where(self.state.c.id == 1)).scalar_one()
+
+    def _snapshot_path(self, version : int) -> str:
+        return f"{self.snapshot_prefix}.v{version}.npy"
+
+    def _refresh(self) -> tuple[list[str], Optional[np.ndarray]]:
+        for attempt in range(SNAPSHOT_LOAD_ATTEMPTS):
+            with self.engine.connect() as conn:
+                version = self._read_version(conn)
+                if version == self._version:
+                    return self._ids, self._matrix
+
+                path = self._snapshot_path(version)
+                ids_path = path.replace(".npy", ".ids.npy")
+                if not os.path.exists(path) or not os.path.exists(ids_path):
+                    # same read transaction as the version, so the snapshot matches it exactly
+                    rows = conn.execute(
+                        select(self.playbook.c.entry_id, self.playbook.c.vector)
+                        .where(self.playbook.c.vector.is_not(None))
+                    ).all()
+                    self._write_snapshot(path, ids_path, rows)
+
+            try:
+                ids = np.load(ids_path).tolist()
+                matrix = np.load(path, mmap_mode="r") if ids else None
+            except FileNotFoundError:
+                # removed by a process that already saw a newer version; the next attempt rebuilds it
+                if attempt == SNAPSHOT_LOAD_ATTEMPTS - 1:
+                    raise
+                logger.debug(f"Vector snapshot v{version} disappeared before it was mapped, rebuilding")
+                continue
+
+            self._ids, self._matrix = ids, matrix
+            self._version = version
+            self._remove_old_snapshots(version)
+            return self._ids, self._matrix
+
+    def _write_snapshot(self, path : str, ids_path : str, rows):
+        ids = np.array([row.entry_id for row in rows], dtype=str)
+        if rows:
+            matrix = np.stack([np.frombuffer(row.vector, dtype=np.float32) for row in rows])
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        # write-then-rename, so other processes never map a half written file
+        for target, array in ((ids_path, ids), (path, matrix)):
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, target)
+
+    def _remove_old_snapshots(self, version : int):
+        # only versions strictly older than ours : a newer snapshot may have just been built by another process
+        pattern = re.compile(re.escape(self.snapshot_prefix) + r"\.v(\d+)(?:\.ids)?\.npy")
+        for path in glob.glob(f"{glob.escape(self.snapshot_prefix)}.v*.npy"):
+            match = pattern.fullmatch(path)
+            if match and int(match.group(1)) < version:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _payload(self, row) -> dict:
+        return {
+            CONTENT_KEY : row.content,
+            METADATA_KEY : {
+                "entry_id" : row.entry_id,
+                "category" : row.category,
+                "helpful_count" : row.helpful_count,
+                "harmful_count" : row.harmful_count,
+                "created_at" : payload_value(row.created_at),
+                "updated_at" : payload_value(row.updated_at),
+            }
+        }
+
+    def dimension(self) -> Optional[int]:
+        with self.engine.connect() as conn:
+            size = conn.execute(
+                select(func.length(self.playbook.c.vector)).where(self.playbook.c.vector.is_not(None)).limit(1)
+            ).scalar()
+        return size // np.dtype(np.float32).itemsize if size else None
+
+    def upsert(self, entry_ids : list[str], vectors : list[list[float]], payloads : list[dict], dim : int):
+        if not entry_ids:
+            return
+        vectors = normalize_rows(vectors)
+
+        rows = []
+        for entry_id, vector, payload in zip(entry_ids, vectors, payloads):
+            metadata = payload[METADATA_KEY]
+            now = datetime.now()
+            rows.append({
+                "entry_id" : entry_id,
+                "category" : metadata.get("category", "uncategorized"),
+                "content" : payload[CONTENT_KEY],
+                "helpful_count" : metadata.get("helpful_count", 0),
+                "harmful_count" : metadata.get("harmful_count", 0),
+                "created_at" : _as_datetime(metadata.get("created_at")) or now,
+                "updated_at" : _as_datetime(metadata.get("updated_at")) or now,
+                "vector" : vector.tobytes(),
+            })
+
+        # the row normally exists already (written by `PlayBookDB.apply_delta`); only the vector is set then
+        stmt = sqlite_insert(self.playbook)
+        stmt = stmt.on_conflict_do_update(index_elements=[self.playbook.c.entry_id], set_={"vector" : stmt.excluded.vector})
+        with self.engine.begin() as conn:
+            conn.execute(stmt, rows)
+            self._bump_version(conn)
+
+    def delete(self, entry_ids : list[str]):
+        with self.engine.begin() as conn:
+            conn.execute(update(self.playbook).where(self.playbook.c.entry_id.in_(list(entry_ids))).values(vector=None))
+            self._bump_version(conn)
+
+    def update_metadata(self, updates : dict[str, dict]):
+        # the payload is the playbook row itself, which `PlayBookDB` already updated
+        pass
+
+    def search(self, embedding : list[float], k : int, score_threshold : Optional[float] = None) -> list[tuple[Document, float]]:
+        ids, matrix = self._refresh()
+        if matrix is None or k <= 0:
+            return []
+
+        query = normalize_rows(embedding)[0]
+        if query.shape[0] != matrix.shape[1]:
+            raise ValueError(f"Query dimension {query.shape[0]} doesn't match stored dimension {matrix.shape[1]}")
+
+        scores = matrix @ query
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+        top = top[np.argsort(-scores[top])]
+        if score_threshold is not None:
+            top = top[scores[top] >= score_threshold]
+        if not len(top):
+            return []
+
+        hits = {ids[i] : float(scores[i]) for i in top}
+        with self.engine.connect() as conn:
+            rows = {row.entry_id : row for row in conn.execute(select(self.playbook).where(self.playbook.c.entry_id.in_(list(hits))))}
+
+        results = []
+        for entry_id, score in hits.items():
+            row = rows.get(entry_id)
+            if row is None: # deleted since the snapshot
+                continue
+            payload = self._payload(row)
+            results.append((Document(page_content=payload[CONTENT_KEY], metadata=payload[METADATA_KEY]), score))
+        return results
+
+    def count(self) -> int:
+        ids, _ = self._refresh()
+        return len(ids)
+
+    def scroll(self, with_vectors : bool = False, entry_ids : Optional[list[str]] = None, batch_size : int = 100) -> Iterator[VectorRecord]:
+        stmt = select(self.playbook).where(self.playbook.c.vector.is_not(None)).order_by(self.playbook.c.entry_id)
+        if entry_ids is not None:
+            stmt = stmt.where(self.playbook.c.entry_id.in_(list(entry_ids)))
+
+        with self.engine.connect() as conn:
+            for row in conn.execute(stmt.execution_options(yield_per=batch_size)):
+                vector = np.frombuffer(row.vector, dtype=np.float32).tolist() if with_vectors else None
+                yield VectorRecord(row.entry_id, vector, self._payload(row))
+
+    def migrate(self, target_size : int, reencode : Callable[[list[VectorRecord]], list[list[float]]], batch_size : int = 256) -> int:
+        """
+        Vectors are rewritten in place, in one transaction.
+        """
+        records = list(self.scroll(with_vectors=True))
+        stmt = (
+            update(self.playbook)
+            .where(self.playbook.c.entry_id == bindparam("b_entry_id"))
+            .values(vector=bindparam("b_vector"))
+        )
+        with self.engine.begin() as conn:
+            for start in range(0, len(records), batch_size):
+                batch = records[start:start + batch_size]
+                vectors = normalize_rows(reencode(batch))
+                conn.execute(stmt, [
+                    {"b_entry_id" : record.entry_id, "b_vector" : vector.tobytes()}
+                    for record, vector in zip(batch, vectors)
+                ])
+            self._bump_version(conn)
+        return len(records)
+
+    def close(self):
+        self.engine.dispose()
+
+def _as_datetime(v) -> Optional[datetime]:
+    if isinstance(v, str):
+        return datetime.fromisoformat(v)
+    return v
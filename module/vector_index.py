@@ -0,0 +1,153 @@
+import threading
+from typing import Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils import Logger
+
+logger = Logger(__name__)
+
+def normalize_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class PlaybookVectorIndex:
+    """
+    In-process replica of the playbook vector collection for exact top-k search.
+
+    Vectors are kept L2-normalized in one contiguous float32 matrix, with parallel lists of
+    entry ids and Qdrant-style payloads (`page_content` + `metadata`), so a search is a single
+    matrix-vector product. Deleting an entry moves the last row into the freed slot, which keeps
+    the matrix dense without reallocating.
+
+    Args:
+        dim (Optional[int]): Vector dimension. If None, it is taken from the first upsert.
+        initial_capacity (int): Number of rows allocated up front. The matrix doubles when full.
+    """
+    def __init__(self, dim : Optional[int] = None, initial_capacity : int = 256):
+        self.dim = dim
+        self._capacity = initial_capacity
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32) if dim else None
+        self._size = 0
+        self._ids : list[str] = []
+        self._payloads : list[dict] = []
+        self._rows : dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, entry_id : str) -> bool:
+        return entry_id in self._rows
+
+    def _reserve(self, extra : int):
+        needed = self._size + extra
+        if self._matrix is not None and needed <= self._capacity:
+            return
+
+        capacity = max(self._capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        if self._matrix is not None and self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        self._capacity = capacity
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._ids = []
+            self._payloads = []
+            self._rows = {}
+
+    def upsert(self, entry_ids : list[str], vectors, payloads : list[dict]):
+        if not entry_ids:
+            return
+
+        vectors = normalize_rows(vectors)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} doesn't match index dimension {self.dim}")
+
+            self._reserve(len(entry_ids))
+            for entry_id, vector, payload in zip(entry_ids, vectors, payloads):
+                row = self._rows.get(entry_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._ids.append(entry_id)
+                    self._payloads.append(payload)
+                    self._rows[entry_id] = row
+                else:
+                    self._payloads[row] = payload
+                self._matrix[row] = vector
+
+    def update_metadata(self, entry_id : str, values : dict):
+        with self._lock:
+            row = self._rows.get(entry_id)
+            if row is None:
+                return
+            payload = dict(self._payloads[row])
+            payload['metadata'] = {**payload.get('metadata', {}), **values}
+            self._payloads[row] = payload
+
+    def delete(self, entry_ids : list[str]):
+        with self._lock:
+            for entry_id in entry_ids:
+                row = self._rows.pop(entry_id, None)
+                if row is None:
+                    continue
+
+                last = self._size - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._matrix[row] = self._matrix[last]
+                    self._ids[row] = moved_id
+                    self._payloads[row] = self._payloads[last]
+                    self._rows[moved_id] = row
+
+                self._ids.pop()
+                self._payloads.pop()
+                self._size -= 1
+
+    def search(self, query_vector, k : int, score_threshold : Optional[float] = None) -> list[tuple[Document, float]]:
+        """
+        Exact cosine top-k. Returns `(Document, score)` pairs sorted by descending score,
+        dropping results below `score_threshold` the same way Qdrant does.
+        """
+        with self._lock:
+            if self._size == 0 or k <= 0:
+                return []
+
+            query = normalize_rows(query_vector)[0]
+            scores = self._matrix[:self._size] @ query
+
+            if score_threshold is not None:
+                candidates = np.flatnonzero(scores >= score_threshold)
+            else:
+                candidates = np.arange(self._size)
+
+            if candidates.size > k:
+                top = np.argpartition(scores[candidates], -k)[-k:]
+                candidates = candidates[top]
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+            results = []
+            for row in order:
+                payload = self._payloads[row]
+                doc = Document(page_content=payload.get('page_content', ''), metadata=dict(payload.get('metadata', {})))
+                results.append((doc, float(scores[row])))
+            return results
+
+    def entries(self) -> list[dict]:
+        with self._lock:
+            return list(self._payloads[:self._size])
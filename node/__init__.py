@@ -1 +1 @@
-from .node_utils import token_calculator
+from module.tokenizer import token_calculator
@@ -1,11 +1,12 @@
-import tiktoken
 import re
 import json
+import asyncio
 from datetime import datetime
 from typing import Any, Optional, Callable
 from langchain_core.callbacks import AsyncCallbackHandler
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
 from langchain_core.runnables import RunnableConfig
 
 from module.db_management import VectorStore
@@ -15,11 +16,6 @@ from module.LLMs import get_llm
 
 env = GetEnv()
 
-def token_calculator(text : str) -> int:
-    encoding = tiktoken.get_encoding("o200k_base")
-    tokens = encoding.encode(text)
-    return len(tokens)
-
 class SolutionOnlyStreamCallback(AsyncCallbackHandler):
     def __init__(self):
         self.buffer = ""
@@ -228,31 +224,90 @@ def prune_playbook(playbook : PlaybookEntry, max_size : int) -> tuple[list[Playb
 
     return kept_entries, list(ids_to_prune)
 
-def is_duplicate_entry(
+async def is_duplicate_entry(
         content : str,
         vector_store : VectorStore,
-        embedding_model : Optional[HuggingFaceEmbeddings] = None,
+        embedding_model : Optional[Embeddings] = None,
         threshold : Optional[float] = None
     ) -> bool:
     if threshold is None:
         threshold = float(env.get_playbook_config['DEDUP_THRESHOLD'])
     
     if embedding_model is None:
-        embedding_model = VectorStore.get_embedding_model
+        embedding_model = vector_store.get_embedding_model
 
-        if vector_store.get_doc_count() == 0:
-            return False
-        
-        retriever = vector_store.from_disk()
-        query_embedding = embedding_model.embed_query(content)
+    if vector_store.get_doc_count() == 0:
+        return False
+    
+    # cached : the same content is embedded again by `to_disk` when it is added
+    query_embedding = await embedding_model.aembed_query(content)
 
-        similar_docs = retriever.similarity_search_by_vector(
-            embedding=query_embedding,
-            k=1,
-            score_threshold=threshold
-        )
+    similar_docs = await asyncio.to_thread(
+        vector_store.search,
+        embedding=query_embedding,
+        k=1,
+        score_threshold=threshold
+    )
+
+    return bool(similar_docs)
+
+MULTILINGUAL_MODEL_MARKERS = ("multilingual", "embeddinggemma", "bge-m3", "labse")
+
+def is_multilingual_embedding_model(embedding_model : Embeddings) -> bool:
+    model_name = str(getattr(embedding_model, "model_name", "")).lower()
+    return any(marker in model_name for marker in MULTILINGUAL_MODEL_MARKERS)
+
+def decide_query_rewrite(
+        query : str,
+        embedding_model : Embeddings,
+        policy : Optional[str] = None
+    ) -> tuple[bool, str]:
+    """
+    Decide whether the retriever needs the LLM query rewrite (`[PLAYBOOK] QUERY_REWRITE`).
+
+    - `always` / `never` : force the rewrite on or off.
+    - `auto` : skip it for short, single-line queries that are already English, or that the
+      multilingual embedding model can match without translation. Long inputs (code, pasted
+      context) still go through the rewrite to extract their intent.
+
+    Returns `(should_rewrite, retrieval_path)` where `retrieval_path` names the reason.
+    """
+    if policy is None:
+        policy = env.get_query_rewrite_policy
+    policy = policy.lower().strip()
+
+    if policy == "never":
+        return False, "raw_query"
+    if policy != "auto":
+        return True, "rewrite"
+
+    max_words = env.get_short_query_max_words
+    is_short = "\n" not in query.strip() and len(query.split()) <= max_words
+    if not is_short:
+        return True, "rewrite"
+
+    if query.isascii():
+        return False, "short_english"
+    if is_multilingual_embedding_model(embedding_model):
+        return False, "multilingual"
+    return True, "rewrite"
+
+def reciprocal_rank_fusion(result_lists : list[list[Document]], k : int = 60) -> list[Document]:
+    """
+    Merge ranked playbook search results with reciprocal rank fusion : score(d) = sum(1 / (k + rank)).
+    Documents are identified by `metadata.entry_id`; ties keep the order of the first list.
+    """
+    scores : dict[str, float] = {}
+    docs : dict[str, Document] = {}
+
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            entry_id = doc.metadata.get("entry_id")
+            scores[entry_id] = scores.get(entry_id, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(entry_id, doc)
 
-        return bool(similar_docs)
+    ranked = sorted(scores, key=lambda entry_id : scores[entry_id], reverse=True)
+    return [docs[entry_id] for entry_id in ranked]
 
 def run_human_eval_test(
         generated_code : str,
@@ -11,19 +11,24 @@ from module.prompt import (curator_prompt,
                            reflector_prompt,
                            query_rewrite_prompt,
                            routing_prompt,
-                           simple_prompt
+                           routing_rewrite_prompt,
+                           simple_prompt,
+                           history_summary_prompt
                            )
 from node.node_utils import (SolutionOnlyStreamCallback,
                              StrictJsonOutputParser,
-                             prune_playbook,
                              is_duplicate_entry,
                              run_human_eval_test,
                              run_hotpot_eval_test,
                              dynamic_llm_router,
+                             decide_query_rewrite,
+                             reciprocal_rank_fusion,
                              )
 from core import State, PlaybookEntry
-from module.db_management import VectorStore, PlayBookDB, get_db_instance, get_vector_store_instance
-from module.memory import RedisMemoryManager
+from module.db_management import VectorStore, AsyncPlayBookDB, get_async_db_instance, get_vector_store_instance
+from module.memory import get_memory_manager
+from module.reconciler import get_playbook_write_lock
+from module.semantic_router import get_semantic_router
 from config.getenv import GetEnv
 from utils import Logger, highlight_print
 
@@ -41,10 +46,9 @@ reflector_chain = reflector_prompt() | llm | json_parser
 curator_chain = curator_prompt() | llm | json_parser
 rewrite_chain = query_rewrite_prompt() | llm | StrOutputParser()
 router_chain = routing_prompt() | llm | json_parser
+router_rewrite_chain = routing_rewrite_prompt() | llm | json_parser
 simple_chain = simple_prompt() | llm | StrOutputParser()
-
-# MEMORY
-memory_manager = RedisMemoryManager()
+summary_chain = history_summary_prompt() | llm | StrOutputParser()
 
 async def generator_node(state : State) -> State:
     logger.debug("GENERATOR")
@@ -57,7 +61,9 @@ async def generator_node(state : State) -> State:
     retrieved_bullets = state.get("retrieved_bullets", [])
 
     session_id = state.get("session_id")
-    history_messages = await memory_manager.get_langchain_message(session_id)
+    history_messages = state.get("chat_history")
+    if history_messages is None:
+        history_messages = await get_memory_manager().get_langchain_message(session_id, query=state.get("query"))
 
     inputs = {
         "query" : state.get("query"),
@@ -206,13 +212,15 @@ async def update_playbook_node(state : State) -> State:
 
     # DB
     vector_store = get_vector_store_instance()
-    db = get_db_instance()
+    db = get_async_db_instance()
     embedding_model = vector_store.get_embedding_model
 
     updated_playbook = state['playbook'].copy()
     max_playbook_size = state.get("max_playbook_size")
 
     entries_to_save = set()
+    # DB에는 절대값이 아닌 증가분으로 반영 (동시에 실행되는 learning cycle끼리 덮어쓰지 않도록)
+    counter_increments = {}
 
     # reflector 노드에서 반환되는 값, 여기에서 helpful과 harmful을 누적
     bullet_tags = state.get("reflection", {}).get("bullet_tags", [])
@@ -226,23 +234,29 @@ async def update_playbook_node(state : State) -> State:
 
             if current_id == target_id:
                 old_helpful = entry['helpful_count']
+                increment = counter_increments.setdefault(entry['entry_id'], {"entry_id" : entry['entry_id'], "helpful" : 0, "harmful" : 0})
 
                 if target_tag == 'helpful':
                     entry['helpful_count'] += 1
+                    increment['helpful'] += 1
                     if state.get("verbose", False):
                         highlight_print(f"✅ Helpful Count UP! [{current_id[:8]}] {old_helpful}->{entry['helpful_count']}", 'green')
                 elif target_tag == 'harmful':
                     entry['harmful_count'] += 1
+                    increment['harmful'] += 1
                     if state.get("verbose", False):
                         highlight_print(f"❌ Harmful Count UP! [{current_id[:8]}]", 'red')
                 
                 entry['last_used_at'] = datetime.now()
+                increment['last_used_at'] = entry['last_used_at']
                 entries_to_save.add(entry['entry_id'])
                 break
     
     # delta operation
     docs_to_add_to_vector_store = []
     ids_to_delete_from_vector_store = []
+    entries_to_add = []
+    entries_to_update = []
 
     # curator 노드의 operations 부분에서 각각 type, category, content로 나눠짐
     for op in state.get("new_insights", []):
@@ -253,7 +267,7 @@ async def update_playbook_node(state : State) -> State:
             content = op['content']
 
             # 중복 제거
-            if is_duplicate_entry(content, vector_store, embedding_model):
+            if await is_duplicate_entry(content, vector_store, embedding_model):
                 logger.debug(f"Duplicate found for content : {content}. Skipping ADD")
                 continue
 
@@ -272,7 +286,7 @@ async def update_playbook_node(state : State) -> State:
 
             # DB 저장용
             docs_to_add_to_vector_store.append(entry)
-            db.add_entry(entry)
+            entries_to_add.append(entry)
             updated_playbook.append(entry)
             
 
@@ -285,59 +299,67 @@ async def update_playbook_node(state : State) -> State:
 
             for entry in updated_playbook:
                 if entry['entry_id'] == entry_id_to_update:
-                    # id가 같지만 오래된(update가 필요한) 플레이북 삭제
+                    # 포인트 id가 entry_id에서 결정되므로 재임베딩 upsert가 기존 벡터를 덮어씀 (삭제 불필요)
+                    # 카운트는 새로 추가되는 벡터의 metadata(DB에 커밋된 값)에 포함되므로 payload 갱신 불필요
                     if entry['entry_id'] in entries_to_save:
                         entries_to_save.remove(entry['entry_id'])
-                    ids_to_delete_from_vector_store.append(entry['entry_id'])
 
                     entry['content'] = new_content
                     entry['updated_at'] = datetime.now()
 
-                    db.add_entry(entry)
+                    entries_to_update.append(entry)
                     docs_to_add_to_vector_store.append(entry)
                     break
-    # 루프가 끝난 후, 카운트만 변경되고(UPDATE 안됨) 아직 저장되지 않은 항목들 일괄 저장
-    if entries_to_save:
+    # reconcile은 별도 스레드에서 같은 vector store를 수정하므로 DB/벡터 반영 구간을 직렬화
+    async with get_playbook_write_lock():
+        # 한 번의 트랜잭션으로 DB 반영, prune도 delta가 반영된 상태를 기준으로 SQL에서 판단
+        delta = await db.apply_delta(
+            adds=entries_to_add,
+            updates=entries_to_update,
+            counter_increments=list(counter_increments.values()),
+            max_size=int(max_playbook_size)
+        )
+        ids_to_prune = delta.pruned_ids
+        # 벡터스토어에는 retrieval 시점의 카운트가 아닌 커밋된 행을 반영 (동시 learning cycle의 증가분 포함)
+        # prune된 항목과 이미 다른 cycle/reconcile에서 삭제된 항목은 여기에 없음
+        committed = {entry['entry_id'] : entry for entry in delta.entries}
         for entry in updated_playbook:
-            if entry['entry_id'] in entries_to_save:
-                db.add_entry(entry)
-                ids_to_delete_from_vector_store.append(entry['entry_id'])
-                docs_to_add_to_vector_store.append(entry)
-
-    # prune
-    all_entries_in_db = db.get_all_entries()
-    max_playbook_size = state.get("max_playbook_size")
-
-    _, ids_to_prune = prune_playbook(all_entries_in_db, int(max_playbook_size))
+            if entry['entry_id'] in committed:
+                entry.update(committed[entry['entry_id']])
 
-    if ids_to_prune:
-        if state.get("verbose", False):
-            logger.debug(f"Pruning {len(ids_to_prune)} entries...")
+        if ids_to_prune:
+            if state.get("verbose", False):
+                logger.debug(f"Pruning {len(ids_to_prune)} entries...")
         
-        ids_to_delete_from_vector_store.extend(ids_to_prune)
+            ids_to_delete_from_vector_store.extend(ids_to_prune)
 
-        for entry_id in ids_to_prune:
-            db.delete_entry(entry_id)
+        if ids_to_delete_from_vector_store:
+            vector_store.delete_by_entry_ids(list(set(ids_to_delete_from_vector_store)))
 
-    if ids_to_delete_from_vector_store:
-        vector_store.delete_by_entry_ids(list(set(ids_to_delete_from_vector_store)))
+        # 카운트만 변경되고(UPDATE 안됨) 항목들
+        # 내용이 그대로이므로 벡터스토어에서는 삭제/재임베딩 없이 payload만 갱신
+        entries_to_patch = [committed[entry_id] for entry_id in entries_to_save if entry_id in committed]
+        if entries_to_patch:
+            vector_store.update_payloads(entries_to_patch)
+        docs_to_add_to_vector_store = [committed[entry['entry_id']] for entry in docs_to_add_to_vector_store if entry['entry_id'] in committed]
     
-    if docs_to_add_to_vector_store:
-        docs = []
-        for entry in docs_to_add_to_vector_store:
-            doc = Document(
-            page_content=entry['content'],
-            metadata = {
-                "entry_id" : entry['entry_id'],
-                "category" : entry['category'],
-                "helpful_count" : entry['helpful_count'],
-                "harmful_count" : entry['harmful_count'],
-                "created_at" : entry['created_at'],
-                "updated_at" : entry['updated_at']
-                    }
-                )
-            docs.append(doc)
-        vector_store.to_disk(docs)
+        if docs_to_add_to_vector_store:
+            docs = []
+            for entry in docs_to_add_to_vector_store:
+                doc = Document(
+                page_content=entry['content'],
+                metadata = {
+                    "entry_id" : entry['entry_id'],
+                    "category" : entry['category'],
+                    "helpful_count" : entry['helpful_count'],
+                    "harmful_count" : entry['harmful_count'],
+                    "created_at" : entry['created_at'],
+                    "updated_at" : entry['updated_at']
+                        }
+                    )
+                docs.append(doc)
+            embeddings = await embedding_model.aembed_documents([doc.page_content for doc in docs])
+            vector_store.to_disk(docs, embeddings=embeddings)
 
     return {"playbook" : updated_playbook}
 
@@ -345,7 +367,6 @@ async def retriever_playbook_node(state : State) -> State:
     logger.debug("PLAYBOOK RETRIEVER")
     # DB
     vector_store = get_vector_store_instance()
-    db = get_db_instance()
     embedding_model = vector_store.get_embedding_model
     
     # model import
@@ -353,36 +374,47 @@ async def retriever_playbook_node(state : State) -> State:
     model = state.get("llm_model")
 
     query = state.get("query")
-    rewritten_query = await rewrite_chain.ainvoke(
-        {"query" : query},
-        config={"configurable" : {"llm_provider" : provider, "llm_model" : model}}
-        )
     top_k = int(state.get("retrieval_topk", env.get_playbook_config['RETRIEVAL_TOP_K']))
     threshold = float(state.get("retrieval_threshold", env.get_playbook_config['RETRIEVAL_THRESHOLD']))
 
-    
-
-    # if state.get("verbose", False):
-    #     highlight_print(rewritten_query, 'blue')
-
-    query_embedding = embedding_model.embed_query(rewritten_query)
-
-    # 맨 처음 실행할때(벡터스토어가 존재하지 않을때) from_disk() 메서드를 실행하면 콜렉션을 못찾음
+    # 맨 처음 실행할때(벡터스토어가 존재하지 않을때) 검색하면 콜렉션을 못찾음
+    # 검색할 항목이 없으면 query rewrite(LLM 호출)도 필요 없음
     vector_store_doc_count = vector_store.get_doc_count()
 
     # 벡터스토어에서 찾은 retrieved 결과를 playbook으로 전달해줘야 curator가 보고 판단함
     if vector_store_doc_count == 0:
+        logger.debug("Retrieval path : empty_store")
         return {
             "retrieved_bullets": [],
-            "playbook" : []
+            "playbook" : [],
+            "retrieval_path" : "empty_store"
             }
-    
-    retriever = vector_store.from_disk()
-    docs = retriever.similarity_search_by_vector(
-        embedding=query_embedding,
-        k=top_k,
-        score_threshold=threshold
-    )
+
+    should_rewrite, retrieval_path = decide_query_rewrite(query, embedding_model)
+    if should_rewrite and state.get("skip_query_rewrite"):
+        # speculative retrieval ahead of the fused router : its search_query replaces the rewrite
+        should_rewrite, retrieval_path = False, "speculative_raw"
+    llm_config = {"configurable" : {"llm_provider" : provider, "llm_model" : model}}
+
+    # the fused router already wrote the search query
+    fused_search_query = state.get("search_query")
+    if fused_search_query:
+        retrieval_path = "fused_rewrite"
+        docs = await search_playbook(fused_search_query, vector_store, embedding_model, top_k, threshold)
+
+    elif should_rewrite and env.get_retrieval_mode == "race":
+        docs, retrieval_path = await race_rewrite_retrieval(query, llm_config, vector_store, embedding_model, top_k, threshold)
+    else:
+        if should_rewrite:
+            search_query = await rewrite_chain.ainvoke({"query" : query}, config=llm_config)
+        else:
+            search_query = query
+
+        # if state.get("verbose", False):
+        #     highlight_print(search_query, 'blue')
+
+        docs = await search_playbook(search_query, vector_store, embedding_model, top_k, threshold)
+    logger.debug(f"Retrieval path : {retrieval_path}")
 
     retrieved = []
     current_time = datetime.now()
@@ -404,10 +436,59 @@ async def retriever_playbook_node(state : State) -> State:
 
     return {
         "retrieved_bullets" : retrieved,
-        "playbook" : retrieved
+        "playbook" : retrieved,
+        "retrieval_path" : retrieval_path
         }
 
 
+async def search_playbook(text : str, vector_store : VectorStore, embedding_model, top_k : int, threshold : float) -> list[Document]:
+    query_embedding = await embedding_model.aembed_query(text)
+    # blocking backend read (the sqlite backend may also rebuild its matrix snapshot), kept off the event loop
+    return await asyncio.to_thread(
+        vector_store.search,
+        embedding=query_embedding,
+        k=top_k,
+        score_threshold=threshold
+    )
+
+async def race_rewrite_retrieval(
+        query : str,
+        llm_config : dict,
+        vector_store : VectorStore,
+        embedding_model,
+        top_k : int,
+        threshold : float
+    ) -> tuple[list[Document], str]:
+    """
+    Search with the raw query while the LLM rewrite runs concurrently.
+
+    If the rewrite misses `[PLAYBOOK] REWRITE_DEADLINE_MS` (measured from the start of retrieval), it is
+    cancelled and the raw-query results are returned. Otherwise the rewritten query is searched too and
+    the two result sets are combined according to `[PLAYBOOK] MERGE_POLICY`.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + env.get_rewrite_deadline_ms / 1000
+
+    rewrite_task = asyncio.create_task(rewrite_chain.ainvoke({"query" : query}, config=llm_config))
+    try:
+        raw_docs = await search_playbook(query, vector_store, embedding_model, top_k, threshold)
+
+        done, _ = await asyncio.wait({rewrite_task}, timeout=max(deadline - loop.time(), 0))
+        if not done or rewrite_task.exception() is not None:
+            if done:
+                logger.warning(f"Query rewrite failed, using raw query results : {rewrite_task.exception()!r}")
+            return raw_docs, "race_raw"
+    finally:
+        if not rewrite_task.done():
+            rewrite_task.cancel()
+
+    rewritten_docs = await search_playbook(rewrite_task.result(), vector_store, embedding_model, top_k, threshold)
+
+    merge_policy = env.get_retrieval_merge_policy
+    if merge_policy == "rewrite":
+        return rewritten_docs, "race_rewrite"
+    return reciprocal_rank_fusion([rewritten_docs, raw_docs])[:top_k], "race_rrf"
+
 async def router_node(state : State) -> State:
     logger.debug("ROUTER")
 
@@ -417,13 +498,101 @@ async def router_node(state : State) -> State:
 
     query = state.get("query")
 
-    result = await router_chain.ainvoke(
+    # local router : decide with the embedding model, LLM only for the ambiguous band
+    semantic_router = None
+    if env.get_router_mode == "embedding":
+        embedding_model = get_vector_store_instance().get_embedding_model
+        semantic_router = get_semantic_router(embedding_model)
+        query_embedding = await embedding_model.aembed_query(query)
+        route, margin = semantic_router.classify(query_embedding)
+        if route is not None:
+            logger.debug(f"Routed locally : {route} (margin {margin:.3f})")
+            return {"router_decision" : route, "router_source" : "embedding"}
+
+    # fused : route + search query in one LLM call, so the retriever doesn't rewrite again
+    fused = env.get_router_chain == "fused"
+    result = await (router_rewrite_chain if fused else router_chain).ainvoke(
         {"query" : query},
         config={"configurable" : {"llm_provider" : provider, "llm_model" : model}}
         )
     route = result.get("route", "complex")
 
-    return {"router_decision" : route}
+    if semantic_router is not None and env.get_router_online_learning:
+        # SQLite write, kept off the event loop like the other DB writes
+        await asyncio.to_thread(semantic_router.add_example, query, route, query_embedding)
+
+    output = {"router_decision" : route, "router_source" : "llm"}
+    if fused and route == "complex":
+        output["search_query"] = str(result.get("search_query") or "").strip()
+    return output
+
+async def speculative_router_node(state : State) -> State:
+    """
+    Route the query while playbook retrieval and the session history fetch run speculatively.
+
+    For "complex" queries the retrieval results are returned together with the route, so the
+    generator can start immediately; for "simple" queries the retrieval is cancelled and discarded.
+    Per-branch timings (and the saved / wasted milliseconds) are returned in `timings`.
+
+    With `ROUTER_CHAIN = fused` the speculative retrieval searches the raw query without its own LLM
+    rewrite; when the router returns a `search_query`, the playbook is searched again with it (one
+    embedding, no LLM call), so a request never pays for two LLM calls.
+    """
+    logger.debug("SPECULATIVE ROUTER")
+    loop = asyncio.get_running_loop()
+    timings = {}
+
+    async def timed(name, coro):
+        start = loop.time()
+        try:
+            return await coro
+        finally:
+            timings[f"{name}_ms"] = (loop.time() - start) * 1000
+
+    fused = env.get_router_chain == "fused"
+    router_task = asyncio.create_task(timed("router", router_node(state)))
+    retrieval_task = asyncio.create_task(timed("retrieval", retriever_playbook_node({**state, "skip_query_rewrite" : fused})))
+    history_task = asyncio.create_task(timed("history", get_memory_manager().get_langchain_message(state.get("session_id"), query=state.get("query"))))
+
+    try:
+        routed = await router_task
+
+        if routed.get("router_decision") == "simple":
+            retrieval_task.cancel()
+            await asyncio.gather(retrieval_task, return_exceptions=True)
+            history_messages = await history_task
+            timings["wasted_ms"] = timings.get("retrieval_ms", 0.0)
+            logger.debug(f"Speculative retrieval discarded : {timings}")
+            return {
+                "router_decision" : routed["router_decision"],
+                "chat_history" : history_messages,
+                "timings" : timings
+            }
+
+        retrieved = await retrieval_task
+        history_messages = await history_task
+    finally:
+        for task in (router_task, retrieval_task, history_task):
+            if not task.done():
+                task.cancel()
+
+    search_query = routed.get("search_query")
+    if fused and search_query and search_query != state.get("query"):
+        # the router's rewrite wins over the raw speculative results
+        retrieved = await timed("fused_retrieval", retriever_playbook_node({**state, "search_query" : search_query}))
+        timings["saved_ms"] = 0.0
+        logger.debug(f"Speculative retrieval replaced by the fused search query : {timings}")
+    else:
+        # retrieval that overlapped with routing no longer sits on the critical path
+        timings["saved_ms"] = min(timings["router_ms"], timings["retrieval_ms"])
+        logger.debug(f"Speculative retrieval used : {timings}")
+
+    return {
+        **routed,
+        **retrieved,
+        "chat_history" : history_messages,
+        "timings" : timings
+    }
 
 async def simple_generator_node(state : State) -> State:
     logger.debug("SIMPLE GENERATOR")
@@ -434,7 +603,9 @@ async def simple_generator_node(state : State) -> State:
 
     query = state.get("query")
     session_id = state.get("session_id")
-    history_messages = await memory_manager.get_langchain_message(session_id)
+    history_messages = state.get("chat_history")
+    if history_messages is None:
+        history_messages = await get_memory_manager().get_langchain_message(session_id, query=state.get("query"))
 
 
     solution = await simple_chain.ainvoke(
@@ -449,7 +620,17 @@ async def simple_generator_node(state : State) -> State:
         "solution" : solution,
     }
 
-
-
-
-    
\ No newline at end of file
+async def summarize_history(summary : str, messages : list[dict], llm_provider : str = None, llm_model : str = None) -> str:
+    """
+    Fold `messages` (stored chat history entries, oldest first) into the rolling `summary` of a session.
+    """
+    conversation = "\n".join(
+        f"{'User' if m['type'] == 'user' else 'Assistant'}: {m['content']}" for m in messages
+    )
+    return await summary_chain.ainvoke(
+        {
+            "summary" : summary or "(empty)",
+            "conversation" : conversation
+        },
+        config={"configurable" : {"llm_provider" : llm_provider, "llm_model" : llm_model, "temperature" : 0.0}}
+    )
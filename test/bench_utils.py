@@ -0,0 +1,68 @@
+"""
+Helpers shared by the benchmark scripts of this directory, run from the repository root
+as `python test/<name>_bench.py`. Correctness checks live in the pytest suite (`test_*.py`).
+"""
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable
+from unittest import mock
+
+import numpy as np
+
+from config.getenv import GetEnv
+from module.db_management import PlayBookDB
+from module.vector_backend import CONTENT_KEY, METADATA_KEY
+from module.vector_index import normalize_rows
+
+DIM = 384 # paraphrase-multilingual-MiniLM-L12-v2
+
+def percentile_ms(samples : list[float], q : float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+def timed(fn : Callable[[], Any]) -> tuple[float, Any]:
+    """
+    Seconds taken by one call of `fn`, and its result.
+    """
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def median_ms(fn : Callable[[], Any], repeats : int) -> tuple[float, Any]:
+    """
+    Median of `repeats` timed calls of `fn` in milliseconds, and the result of the last one.
+    """
+    samples = []
+    for _ in range(repeats):
+        elapsed, result = timed(fn)
+        samples.append(elapsed)
+    return float(np.median(samples) * 1000), result
+
+def playbook_db(path : str) -> PlayBookDB:
+    """
+    A `PlayBookDB` at `path` instead of the configured one.
+    """
+    with mock.patch.object(GetEnv, "get_db_path", new=path):
+        return PlayBookDB()
+
+def random_points(rng : np.random.Generator, size : int, dim : int = DIM) -> tuple[list[str], np.ndarray, list[dict]]:
+    """
+    `size` random unit vectors with fresh entry ids and playbook payloads, ready for `VectorBackend.upsert`.
+    """
+    entry_ids = [str(uuid.uuid4()) for _ in range(size)]
+    vectors = normalize_rows(rng.standard_normal((size, dim)))
+    now = datetime.now().isoformat()
+    payloads = [
+        {
+            CONTENT_KEY : f"entry {i}",
+            METADATA_KEY : {
+                "entry_id" : entry_id,
+                "category" : "strategy",
+                "helpful_count" : 1,
+                "harmful_count" : 0,
+                "created_at" : now,
+                "updated_at" : now,
+            }
+        } for i, entry_id in enumerate(entry_ids)
+    ]
+    return entry_ids, vectors, payloads
@@ -0,0 +1,49 @@
+import uuid
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from config.getenv import GetEnv
+from module import db_management
+from module.db_management import PlayBookDB
+
+@pytest.fixture
+def playbook_dir(tmp_path):
+    """
+    Points the playbook DB, the `sqlite` backend snapshots and the Qdrant store at a temporary directory.
+    """
+    with mock.patch.object(GetEnv, "get_db_path", new=str(tmp_path / "playbook.db")), \
+         mock.patch.object(GetEnv, "get_db_dir", new=str(tmp_path)), \
+         mock.patch.object(GetEnv, "get_vector_store_dir", new=str(tmp_path)):
+        yield tmp_path
+        db_management.close_db()
+
+@pytest.fixture
+def playbook_db(playbook_dir):
+    db = PlayBookDB()
+    yield db
+    db.engine.dispose()
+
+@pytest.fixture
+def make_entry():
+    def make_entry(content : str = "entry", **fields) -> dict:
+        now = datetime.now()
+        entry = {
+            "entry_id" : str(uuid.uuid4()),
+            "category" : "strategy",
+            "content" : content,
+            "helpful_count" : 1,
+            "harmful_count" : 0,
+            "created_at" : now,
+            "updated_at" : now,
+            "last_used_at" : None,
+        }
+        entry.update(fields)
+        return entry
+    return make_entry
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
@@ -0,0 +1,121 @@
+import os
+import multiprocessing as mp
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+from bench_utils import timed
+from config.getenv import GetEnv
+from module.embed import EmbeddingPreprocessor
+from utils import Logger
+
+env = GetEnv()
+logger = Logger(__name__)
+
+PRECISIONS = ["fp32", "int8", "bf16"]
+TOP_K = 8
+SAMPLE_TEXTS = [
+    "Strategy to merge two dictionaries in Python while keeping the latest values.",
+    "Pitfall: datetime.now() returns a naive datetime without timezone information.",
+    "Best practice for removing duplicates from a list while preserving order.",
+    "How to apply the Asia/Seoul timezone to a datetime object explicitly.",
+] * 64
+
+def resident_memory_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / 1024 ** 2
+    except ImportError:
+        import resource
+        # peak RSS, reported in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def load_stored_texts() -> list[str]:
+    # only the texts : stored vectors may be truncated to OUTPUT_DIMENSION, so they can't serve as the fp32 baseline
+    qdrant_host = os.getenv("QDRANT_HOST")
+    client = QdrantClient(url=f"http://{qdrant_host}:6333") if qdrant_host else QdrantClient(path=env.get_vector_store_path)
+    name = env.get_vector_store_name
+
+    texts = []
+    try:
+        if not client.collection_exists(name):
+            return []
+
+        offset = None
+        while True:
+            records, offset = client.scroll(collection_name=name, limit=256, with_payload=True, with_vectors=False, offset=offset)
+            texts.extend(record.payload['page_content'] for record in records)
+            if offset is None:
+                break
+    finally:
+        client.close()
+
+    return texts
+
+def _measure(precision : str, texts : list[str], results):
+    before = resident_memory_mb()
+    # the raw model : `truncated_embedding_model` (OUTPUT_DIMENSION) is deliberately not applied
+    load_time, model = timed(lambda : EmbeddingPreprocessor.default_embedding_model(use_gpu=False, precision=precision))
+
+    model.embed_documents(texts[:8]) # warm-up
+    encode_time, vectors = timed(lambda : model.embed_documents(texts))
+
+    results.put({
+        "precision" : EmbeddingPreprocessor.get_precision(model),
+        "load_s" : load_time,
+        "texts_per_s" : len(texts) / encode_time,
+        "rss_delta_mb" : resident_memory_mb() - before,
+        "vectors" : np.asarray(vectors, dtype=np.float32),
+    })
+
+def measure(precision : str, texts : list[str]) -> dict:
+    # fresh process per precision so the resident memory of one model doesn't leak into the next
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(precision, texts, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def parity(baseline : np.ndarray, reduced : np.ndarray) -> dict:
+    cosine = np.sum(baseline * reduced, axis=1) / (np.linalg.norm(baseline, axis=1) * np.linalg.norm(reduced, axis=1))
+
+    # does a reduced precision query still find the same neighbours among the fp32 vectors ?
+    k = min(TOP_K, len(baseline))
+    expected = np.argsort(-(baseline @ baseline.T), axis=1)[:, :k]
+    actual = np.argsort(-(reduced @ baseline.T), axis=1)[:, :k]
+    overlap = np.mean([len(set(e) & set(a)) / k for e, a in zip(expected, actual)])
+
+    return {
+        "mean_cosine" : float(cosine.mean()),
+        "min_cosine" : float(cosine.min()),
+        "p1_cosine" : float(np.percentile(cosine, 1)),
+        f"top{k}_overlap" : float(overlap),
+    }
+
+def main():
+    texts = load_stored_texts()
+    if texts:
+        logger.info(f"Parity check on {len(texts)} playbook entries of '{env.get_vector_store_name}'")
+    else:
+        logger.warning("No stored playbook entries found. Parity is checked on sample texts.")
+        texts = SAMPLE_TEXTS
+
+    # the fp32 run of the raw model is the baseline every precision is compared with
+    baseline = None
+    for precision in PRECISIONS:
+        result = measure(precision, texts)
+        if precision == "fp32":
+            baseline = result['vectors']
+        line = (
+            f"{precision:>4} (effective {result['precision']}) | load {result['load_s']:.1f}s"
+            f" | {result['texts_per_s']:.1f} texts/s | RSS +{result['rss_delta_mb']:.0f}MB"
+        )
+        drift = parity(baseline, result['vectors'])
+        line += " | " + " ".join(f"{key}={value:.4f}" for key, value in drift.items())
+        logger.info(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import uuid
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from bench_utils import median_ms, playbook_db
+from module.db_management import PlayBookDB
+from node.node_utils import prune_playbook
+from utils import Logger
+
+logger = Logger(__name__)
+
+SIZES = [200, 2_000, 20_000, 50_000]
+OVERFLOW = 5 # entries over MAX_PLAYBOOK_SIZE, as after one learning cycle
+REPEATS = 20
+
+def build_db(path : str, size : int, rng : np.random.Generator) -> PlayBookDB:
+    db = playbook_db(path)
+
+    now = datetime.now()
+    helpful = rng.integers(1, 20, size)
+    harmful = np.zeros(size, dtype=int)
+    # a few poisoned entries, the rest were already pruned by earlier cycles
+    poisoned = rng.choice(size, 3, replace=False)
+    harmful[poisoned] = helpful[poisoned] + 1
+    db.apply_delta(adds=[
+        {
+            "entry_id" : str(uuid.uuid4()),
+            "category" : "strategy",
+            "content" : f"entry {i}",
+            "helpful_count" : int(helpful[i]),
+            "harmful_count" : int(harmful[i]),
+            "created_at" : now,
+            "updated_at" : now,
+            "last_used_at" : None if i % 7 == 0 else now - timedelta(minutes=int(rng.integers(0, 100_000))),
+        } for i in range(size)
+    ])
+    return db
+
+def bench(size : int, rng : np.random.Generator):
+    max_size = size - OVERFLOW
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build_db(os.path.join(tmp, "bench.db"), size, rng)
+
+        # previous path : load every row and filter/sort in Python
+        python_ms, python_ids = median_ms(lambda : prune_playbook(db.get_all_entries(), max_size)[1], REPEATS)
+        sql_ms, sql_ids = median_ms(lambda : db.get_ids_to_prune(max_size), REPEATS)
+        db.engine.dispose()
+
+    logger.info(
+        f"MAX_PLAYBOOK_SIZE={max_size:>6} | evict {len(sql_ids):>5} ids"
+        f" | python {python_ms:8.2f}ms | sql {sql_ms:8.2f}ms | same ids {set(python_ids) == set(sql_ids)}"
+    )
+
+def main():
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        bench(size, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import time
+import uuid
+import tempfile
+
+import numpy as np
+
+from bench_utils import DIM, percentile_ms, timed
+from module.vector_backend import QdrantBackend, QdrantProfile, CONTENT_KEY, METADATA_KEY
+from module.vector_index import normalize_rows
+from utils import Logger
+
+logger = Logger(__name__)
+
+SIZES = [10_000, 100_000]
+NUM_QUERIES = 200
+TOP_K = 8
+CLUSTER_NOISE = 2.4 # norm of the noise added to a unit cluster center
+QUERY_NOISE = 1.2
+PROFILES = [
+    QdrantProfile(),
+    QdrantProfile(name="large", hnsw_m=32, hnsw_ef_construct=200, search_ef=128, quantization=True, rescore=True, oversampling=2.0, on_disk=True),
+    QdrantProfile(name="large-norescore", hnsw_m=32, hnsw_ef_construct=200, search_ef=128, quantization=True, rescore=False, on_disk=True),
+]
+
+def wait_until_indexed(backend : QdrantBackend, timeout_s : float = 600):
+    # HNSW graph and quantized vectors are built by the optimizer after the upsert
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout_s:
+        info = backend.client.get_collection(backend.collection_name)
+        if info.status == "green":
+            return
+        time.sleep(1)
+
+def bench(size : int, profile : QdrantProfile, vectors : np.ndarray, queries : np.ndarray, expected : np.ndarray, path : str):
+    collection_name = f"bench_{profile.name.replace('-', '_')}_{size}"
+    backend = QdrantBackend(path, collection_name, profile=profile)
+
+    entry_ids = [str(uuid.uuid4()) for _ in range(size)]
+    start = time.perf_counter()
+    for offset in range(0, size, 1000):
+        ids = entry_ids[offset:offset + 1000]
+        backend.upsert(
+            ids,
+            vectors[offset:offset + 1000].tolist(),
+            [{CONTENT_KEY : "", METADATA_KEY : {"entry_id" : entry_id}} for entry_id in ids],
+            dim=DIM
+        )
+    wait_until_indexed(backend)
+    build_s = time.perf_counter() - start
+
+    positions = {entry_id : i for i, entry_id in enumerate(entry_ids)}
+    times, recalls = [], []
+    for query, truth in zip(queries, expected):
+        elapsed, results = timed(lambda : backend.search(query, k=TOP_K))
+        times.append(elapsed)
+        found = {positions[doc.metadata['entry_id']] for doc, _ in results}
+        recalls.append(len(found & set(truth)) / TOP_K)
+
+    logger.info(
+        f"size={size:>7} | {profile.name:>15} | build {build_s:7.1f}s | recall@{TOP_K} {np.mean(recalls):.4f}"
+        f" | p50={percentile_ms(times, 50):7.2f}ms p99={percentile_ms(times, 99):7.2f}ms"
+    )
+    backend.client.delete_collection(collection_name)
+    backend.close()
+
+def main():
+    if not os.getenv("QDRANT_HOST"):
+        logger.warning("QDRANT_HOST is not set. Local mode searches exhaustively, so the profiles only differ on a Qdrant server.")
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            # clustered synthetic data, closer to sentence embeddings than isotropic noise
+            centers = normalize_rows(rng.standard_normal((size // 50, DIM)))
+            vectors = normalize_rows(centers[rng.integers(0, len(centers), size)] + CLUSTER_NOISE * rng.standard_normal((size, DIM)) / np.sqrt(DIM))
+            queries = normalize_rows(vectors[rng.integers(0, size, NUM_QUERIES)] + QUERY_NOISE * rng.standard_normal((NUM_QUERIES, DIM)) / np.sqrt(DIM))
+            expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :TOP_K]
+
+            for profile in PROFILES:
+                bench(size, profile, vectors, queries, expected, os.path.join(tmp, "qdrant"))
+
+
+if __name__ == "__main__":
+    main()
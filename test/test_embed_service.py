@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from module.embed_service import EmbeddingService
+
+DIM = 8
+NUM_QUERIES = 16
+TIMEOUT_S = 5.0
+
+class FakeEmbeddingModel(Embeddings):
+    # deterministic vectors, so results can be compared without loading a model
+    def embed_documents(self, texts : list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text : str) -> list[float]:
+        return [float(len(text) + i) for i in range(DIM)]
+
+QUERIES = [f"query {'x' * i}" for i in range(NUM_QUERIES)]
+EXPECTED = [FakeEmbeddingModel().embed_query(query) for query in QUERIES]
+
+@pytest.fixture
+def service():
+    service = EmbeddingService(FakeEmbeddingModel(), batch_window_ms=20.0)
+    yield service
+    service.close()
+
+async def embed_concurrently(service : EmbeddingService) -> list[list[float]]:
+    return await asyncio.wait_for(asyncio.gather(*(service.aembed_query(query) for query in QUERIES)), TIMEOUT_S)
+
+async def abandon_query(service : EmbeddingService):
+    # the loop ends before the batch window elapses, leaving a query and its flush timer behind
+    try:
+        await asyncio.wait_for(service.aembed_query("abandoned"), service.batch_window / 10)
+    except asyncio.TimeoutError:
+        pass
+
+def test_concurrent_queries_are_batched(service):
+    assert asyncio.run(embed_concurrently(service)) == EXPECTED
+    assert service.metrics["largest_batch"] > 1
+
+def test_survives_successive_event_loops(service):
+    # the service is a process-wide singleton in the app, so it must outlive the loop it was first used on
+    assert asyncio.run(embed_concurrently(service)) == EXPECTED
+    assert asyncio.run(embed_concurrently(service)) == EXPECTED
+
+def test_survives_abandoned_batch(service):
+    asyncio.run(abandon_query(service))
+    assert asyncio.run(embed_concurrently(service)) == EXPECTED
+    assert service.metrics["waiting"] <= 1
@@ -0,0 +1,153 @@
+import asyncio
+import uuid
+
+import fakeredis
+import pytest
+from langchain_core.messages import HumanMessage, AIMessage
+
+from module import memory
+from module.memory import MEMORY_BACKENDS, SessionHistoryCache, SQLiteMemoryManager, SUMMARY_PREFIX
+
+HISTORY_RETENTION = 6
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # one token per word, so budgets are easy to reason about (and no tokenizer download)
+    monkeypatch.setattr(memory, "token_calculator", lambda text : len(text.split()))
+
+@pytest.fixture(params=[0, 8], ids=["no cache", "session cache"])
+def session_cache(request, monkeypatch):
+    cache = SessionHistoryCache(max_sessions=request.param, max_messages=4)
+    monkeypatch.setattr(memory, "session_cache", cache)
+    return cache
+
+@pytest.fixture(params=list(MEMORY_BACKENDS))
+def manager(request, tmp_path, session_cache):
+    if request.param == "sqlite":
+        manager = SQLiteMemoryManager(db_path=str(tmp_path / "memory.db"))
+    else:
+        manager = MEMORY_BACKENDS[request.param]()
+    if request.param == "redis":
+        manager.r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    manager.history_retention = HISTORY_RETENTION
+    manager.session_ttl = 0
+    manager.summary_trigger = 2
+    manager.recall_top_k = 0
+    return manager
+
+def run(manager, scenario):
+    # one event loop per test, closing the backend on it
+    async def main():
+        try:
+            return await scenario
+        finally:
+            await manager.close()
+    return asyncio.run(main())
+
+async def chat(manager, session_id : str, turns : int):
+    for i in range(turns):
+        await manager.save_user_message(session_id, f"question {i}")
+        await manager.save_ai_message(session_id, f"answer {i}")
+
+def contents(messages) -> list[str]:
+    return [message['content'] if isinstance(message, dict) else message.content for message in messages]
+
+def test_history_is_kept_oldest_first(manager):
+    session_id = str(uuid.uuid4())
+
+    async def scenario():
+        await chat(manager, session_id, 2)
+        return await manager.get_history(session_id), await manager.get_all_session_ids()
+
+    history, session_ids = run(manager, scenario())
+    assert contents(history) == ["question 0", "answer 0", "question 1", "answer 1"]
+    assert [message['type'] for message in history] == ["user", "assistant", "user", "assistant"]
+    assert session_id in session_ids
+
+def test_history_retention(manager):
+    session_id = str(uuid.uuid4())
+
+    async def scenario():
+        await chat(manager, session_id, 5)
+        await manager.trim_history(session_id)
+        return await manager.get_history(session_id)
+
+    history = run(manager, scenario())
+    assert contents(history) == ["question 2", "answer 2", "question 3", "answer 3", "question 4", "answer 4"]
+
+def test_langchain_messages_window(manager):
+    session_id = str(uuid.uuid4())
+
+    async def scenario():
+        await chat(manager, session_id, 3)
+        # twice : the second read is served by the session cache when it is enabled
+        return [await manager.get_langchain_message(session_id, limit=3, token_budget=0) for _ in range(2)]
+
+    for messages in run(manager, scenario()):
+        assert contents(messages) == ["answer 1", "question 2", "answer 2"]
+        assert [type(message) for message in messages] == [AIMessage, HumanMessage, AIMessage]
+
+def test_token_budget_keeps_newest(manager):
+    session_id = str(uuid.uuid4())
+
+    async def scenario():
+        await chat(manager, session_id, 3)
+        return await manager.get_langchain_message(session_id, limit=6, token_budget=5)
+
+    # two words per message : the newest two fit in 5 tokens
+    assert contents(run(manager, scenario())) == ["question 2", "answer 2"]
+
+def test_summary(manager, monkeypatch):
+    monkeypatch.setattr(memory, "memory_limit", 2)
+    session_id = str(uuid.uuid4())
+    calls = []
+
+    async def summarize(previous : str, messages : list[dict]) -> str:
+        calls.append(contents(messages))
+        return "they said hello"
+
+    async def scenario():
+        missing = await manager._write_summary(str(uuid.uuid4()), {"content" : "x", "tokens" : 1, "until" : 0.0})
+        await chat(manager, session_id, 2)
+        compacted = await manager.compact_session(session_id, summarize)
+        # nothing new left the window
+        compacted_again = await manager.compact_session(session_id, summarize)
+        messages = await manager.get_langchain_message(session_id, limit=2, token_budget=0)
+        return missing, compacted, compacted_again, messages
+
+    missing, compacted, compacted_again, messages = run(manager, scenario())
+    assert not missing
+    assert compacted and not compacted_again
+    assert calls == [["question 0", "answer 0"]]
+    assert contents(messages) == [SUMMARY_PREFIX + "they said hello", "question 1", "answer 1"]
+
+def test_clear_session(manager):
+    session_id = str(uuid.uuid4())
+
+    async def scenario():
+        await chat(manager, session_id, 1)
+        await manager.get_langchain_message(session_id, limit=2, token_budget=0)
+        await manager.clear_session(session_id)
+        return (
+            await manager.get_history(session_id),
+            await manager.get_langchain_message(session_id, limit=2, token_budget=0),
+            await manager.get_all_session_ids(),
+            await manager._write_summary(session_id, {"content" : "x", "tokens" : 1, "until" : 0.0}),
+        )
+
+    history, messages, session_ids, summary_written = run(manager, scenario())
+    assert history == [] and messages == []
+    assert session_id not in session_ids
+    assert not summary_written
+
+def test_recall_index_keeps_newest_turns(manager):
+    session_id = str(uuid.uuid4())
+
+    async def scenario():
+        await chat(manager, session_id, 1)
+        for i in range(manager.max_turns + 2):
+            await manager._add_turn(session_id, {"ts" : float(i), "user" : f"q{i}", "assistant" : f"a{i}", "tokens" : 2, "vector" : ""})
+        return await manager._turns(session_id)
+
+    turns = run(manager, scenario())
+    assert sorted(turn['ts'] for turn in turns) == [float(i) for i in range(2, manager.max_turns + 2)]
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+from langchain_core.documents import Document
+
+from config.getenv import GetEnv
+from node.node_utils import decide_query_rewrite, reciprocal_rank_fusion, prune_playbook
+
+class FakeEmbeddingModel:
+    def __init__(self, model_name : str):
+        self.model_name = model_name
+
+ENGLISH_MODEL = FakeEmbeddingModel("sentence-transformers/all-MiniLM-L6-v2")
+MULTILINGUAL_MODEL = FakeEmbeddingModel("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+
+@pytest.fixture(autouse=True)
+def short_query_max_words():
+    with mock.patch.object(GetEnv, "get_short_query_max_words", new=5):
+        yield
+
+def docs(*entry_ids : str) -> list[Document]:
+    return [Document(page_content=entry_id, metadata={"entry_id" : entry_id}) for entry_id in entry_ids]
+
+@pytest.mark.parametrize("query, model, policy, expected", [
+    ("how do I merge dicts", ENGLISH_MODEL, "auto", (False, "short_english")),
+    ("딕셔너리 병합 방법", MULTILINGUAL_MODEL, "auto", (False, "multilingual")),
+    ("딕셔너리 병합 방법", ENGLISH_MODEL, "auto", (True, "rewrite")),
+    ("why does this code raise a KeyError here", ENGLISH_MODEL, "auto", (True, "rewrite")),
+    ("fix this\nprint(x)", ENGLISH_MODEL, "auto", (True, "rewrite")),
+    ("how do I merge dicts", ENGLISH_MODEL, "always", (True, "rewrite")),
+    ("why does this code raise a KeyError here", ENGLISH_MODEL, " Never ", (False, "raw_query")),
+])
+def test_decide_query_rewrite(query, model, policy, expected):
+    assert decide_query_rewrite(query, model, policy=policy) == expected
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([docs("a", "b", "c"), docs("c", "b", "d")])
+    # 1/63 + 1/61 for c beats 2/62 for b
+    assert [doc.metadata['entry_id'] for doc in fused] == ["c", "b", "a", "d"]
+
+def test_reciprocal_rank_fusion_ties_keep_first_order():
+    fused = reciprocal_rank_fusion([docs("a", "b"), docs("b", "a")])
+    assert [doc.metadata['entry_id'] for doc in fused] == ["a", "b"]
+
+def test_reciprocal_rank_fusion_keeps_first_document():
+    first = docs("a")
+    fused = reciprocal_rank_fusion([first, [Document(page_content="other", metadata={"entry_id" : "a"})]])
+    assert fused == first
+
+def test_reciprocal_rank_fusion_empty():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
+
+def test_prune_playbook_matches_sql(playbook_db, make_entry):
+    now = datetime.now()
+    # no ties in (helpful_count, last_used_at), so both sides evict the same entries
+    entries = [
+        make_entry(helpful_count=i % 4, harmful_count=i % 3, last_used_at=None if i < 4 else now - timedelta(hours=i))
+        for i in range(40)
+    ]
+    playbook_db.apply_delta(adds=entries)
+
+    for max_size in (0, 10, 25, 40):
+        kept, ids_to_prune = prune_playbook(playbook_db.get_all_entries(), max_size)
+        assert set(ids_to_prune) == set(playbook_db.get_ids_to_prune(max_size))
+        assert len(kept) == min(max_size, len(entries) - len([e for e in entries if e['harmful_count'] > e['helpful_count']]))
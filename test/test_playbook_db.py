@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from module.db_management import AsyncPlayBookDB
+
+def counts(db, entry_id : str) -> tuple[int, int]:
+    entry = db.get_entry(entry_id)
+    return entry['helpful_count'], entry['harmful_count']
+
+def test_add_and_update(playbook_db, make_entry):
+    entry = make_entry("first", helpful_count=3)
+    playbook_db.apply_delta(adds=[entry])
+
+    later = datetime.now() + timedelta(seconds=1)
+    delta = playbook_db.apply_delta(updates=[{**entry, "content" : "second", "helpful_count" : 0, "updated_at" : later}])
+
+    stored = playbook_db.get_entry(entry['entry_id'])
+    assert stored['content'] == "second"
+    assert stored['updated_at'] == later
+    # updates leave the counters alone
+    assert stored['helpful_count'] == 3
+    assert delta.entries == [stored]
+
+def test_counter_increments_add_up(playbook_db, make_entry):
+    entry = make_entry(helpful_count=1)
+    playbook_db.apply_delta(adds=[entry])
+
+    # two cycles that both read the entry before either one committed
+    first = playbook_db.apply_delta(counter_increments=[{"entry_id" : entry['entry_id'], "helpful" : 1}])
+    second = playbook_db.apply_delta(counter_increments=[{"entry_id" : entry['entry_id'], "helpful" : 1, "harmful" : 1}])
+
+    assert counts(playbook_db, entry['entry_id']) == (3, 1)
+    # each cycle gets the committed counts back, not the ones it computed
+    assert first.entries[0]['helpful_count'] == 2
+    assert second.entries[0]['helpful_count'] == 3
+
+def test_counter_increments_bump_updated_at(playbook_db, make_entry):
+    created = datetime.now() - timedelta(days=1)
+    entry = make_entry(updated_at=created)
+    playbook_db.apply_delta(adds=[entry])
+
+    used_at = datetime.now()
+    delta = playbook_db.apply_delta(counter_increments=[{"entry_id" : entry['entry_id'], "helpful" : 1, "last_used_at" : used_at}])
+    stored = delta.entries[0]
+    assert stored['updated_at'] > created
+    assert stored['last_used_at'] == used_at
+
+    # an increment without `last_used_at` keeps the stored one
+    playbook_db.apply_delta(counter_increments=[{"entry_id" : entry['entry_id'], "helpful" : 1}])
+    assert playbook_db.get_entry(entry['entry_id'])['last_used_at'] == used_at
+
+def test_readd_keeps_vector(playbook_db, make_entry):
+    entry = make_entry("first")
+    playbook_db.apply_delta(adds=[entry])
+    with playbook_db.engine.begin() as conn:
+        conn.execute(update(playbook_db.playbook).values(vector=b"\x00" * 16))
+
+    playbook_db.apply_delta(adds=[{**entry, "content" : "again"}])
+
+    with playbook_db.engine.connect() as conn:
+        vector = conn.execute(select(playbook_db.playbook.c.vector)).scalar_one()
+    assert playbook_db.get_entry(entry['entry_id'])['content'] == "again"
+    assert vector == b"\x00" * 16
+
+def test_ids_to_prune_poisoned(playbook_db, make_entry):
+    poisoned = make_entry(helpful_count=1, harmful_count=2)
+    even = make_entry(helpful_count=2, harmful_count=2)
+    playbook_db.apply_delta(adds=[poisoned, even])
+
+    # poisoned entries go whatever the capacity
+    assert playbook_db.get_ids_to_prune(max_size=10) == [poisoned['entry_id']]
+
+def test_ids_to_prune_eviction_order(playbook_db, make_entry):
+    now = datetime.now()
+    never_used = make_entry(helpful_count=1)
+    used_long_ago = make_entry(helpful_count=1, last_used_at=now - timedelta(days=30))
+    used_recently = make_entry(helpful_count=1, last_used_at=now)
+    most_helpful = make_entry(helpful_count=5)
+    playbook_db.apply_delta(adds=[used_recently, most_helpful, used_long_ago, never_used])
+
+    # lowest helpful_count first, then never used, then least recently used
+    assert playbook_db.get_ids_to_prune(max_size=3) == [never_used['entry_id']]
+    assert playbook_db.get_ids_to_prune(max_size=2) == [never_used['entry_id'], used_long_ago['entry_id']]
+    assert playbook_db.get_ids_to_prune(max_size=4) == []
+
+def test_apply_delta_prunes(playbook_db, make_entry):
+    kept = make_entry(helpful_count=5)
+    evicted = make_entry(helpful_count=1)
+    playbook_db.apply_delta(adds=[kept])
+
+    delta = playbook_db.apply_delta(adds=[evicted], counter_increments=[{"entry_id" : kept['entry_id'], "helpful" : 1}], max_size=1)
+
+    assert delta.pruned_ids == [evicted['entry_id']]
+    assert [entry['entry_id'] for entry in delta.entries] == [kept['entry_id']]
+    assert playbook_db.get_entry_ids() == [kept['entry_id']]
+
+def test_apply_delta_logs_changes(playbook_db, make_entry):
+    added = make_entry()
+    incremented = make_entry()
+    deleted = make_entry()
+    playbook_db.apply_delta(adds=[incremented, deleted])
+    playbook_db.ack_changes([change['seq'] for change in playbook_db.pending_changes()])
+
+    playbook_db.apply_delta(
+        adds=[added],
+        counter_increments=[{"entry_id" : incremented['entry_id'], "helpful" : 1}],
+        deletes=[deleted['entry_id']]
+    )
+
+    changes = {(change['entry_id'], change['op']) for change in playbook_db.pending_changes()}
+    assert changes == {
+        (added['entry_id'], "upsert"),
+        (incremented['entry_id'], "patch"),
+        (deleted['entry_id'], "delete"),
+    }
+
+def test_async_db_matches(playbook_db, make_entry):
+    entry = make_entry(helpful_count=1)
+
+    async def cycle():
+        db = AsyncPlayBookDB()
+        try:
+            await db.apply_delta(adds=[entry])
+            return await db.apply_delta(counter_increments=[{"entry_id" : entry['entry_id'], "helpful" : 2}], max_size=10)
+        finally:
+            await db.engine.dispose()
+
+    delta = asyncio.run(cycle())
+    assert delta.pruned_ids == []
+    assert delta.entries == [playbook_db.get_entry(entry['entry_id'])]
+    assert counts(playbook_db, entry['entry_id']) == (3, 0)
@@ -0,0 +1,49 @@
+from datetime import datetime
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from module import db_management
+from module.snapshot import ENTRY_FIELDS, SNAPSHOT_FORMAT, snapshot_schema, import_playbook
+
+DIM = 384 # paraphrase-multilingual-MiniLM-L12-v2
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+NUM_ENTRIES = 5
+
+class FakeEmbeddingModel:
+    model_name = MODEL_NAME
+
+class FakeVectorStore:
+    # only what `validate_snapshot_header` reads; an import must fail before touching the vectors
+    get_embedding_model = FakeEmbeddingModel()
+
+    def get_embedding_size(self) -> int:
+        return DIM
+
+def write_snapshot(path : str, entries : list[dict], dim : int, model_name : str):
+    header = {"format" : SNAPSHOT_FORMAT, "embedding_model" : model_name, "dimension" : dim, "exported_at" : datetime.now().isoformat()}
+    schema = snapshot_schema(dim, header)
+    columns = {field.name : [entry[field.name] for entry in entries] for field in ENTRY_FIELDS}
+    columns["vector"] = [[0.0] * dim for _ in entries]
+    with pq.ParquetWriter(path, schema) as writer:
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+@pytest.mark.parametrize("snapshot_dim, snapshot_model", [
+    pytest.param(DIM // 2, MODEL_NAME, id="dimension mismatch"),
+    pytest.param(DIM, "intfloat/multilingual-e5-small", id="model mismatch"),
+])
+def test_mismatched_import_keeps_playbook(playbook_dir, make_entry, snapshot_dim, snapshot_model):
+    db = db_management.get_db_instance()
+    for i in range(NUM_ENTRIES):
+        db.add_entry(make_entry(f"entry {i}"))
+
+    path = str(playbook_dir / "snapshot.parquet")
+    write_snapshot(path, [make_entry(f"imported {i}") for i in range(3)], snapshot_dim, snapshot_model)
+
+    with mock.patch("module.snapshot.get_vector_store_instance", return_value=FakeVectorStore()):
+        with pytest.raises(ValueError):
+            import_playbook(path, replace=True)
+
+    assert len(db_management.get_db_instance().get_entry_ids()) == NUM_ENTRIES
@@ -0,0 +1,137 @@
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from module.db_management import PlayBookDB
+from module.vector_backend import QdrantBackend, SQLiteVectorBackend, CONTENT_KEY, METADATA_KEY
+from module.vector_index import normalize_rows
+
+DIM = 384 # paraphrase-multilingual-MiniLM-L12-v2
+NUM_ENTRIES = 300
+TOP_K = 8
+
+@pytest.fixture(params=["qdrant", "sqlite"])
+def backend(request, playbook_dir, playbook_db):
+    if request.param == "sqlite":
+        backend = SQLiteVectorBackend(PlayBookDB(), "conformance")
+    else:
+        backend = QdrantBackend(str(playbook_dir / "qdrant"), "conformance")
+    yield backend
+    backend.close()
+
+@pytest.fixture
+def points(rng) -> tuple[list[str], np.ndarray, list[dict]]:
+    entry_ids = [str(uuid.uuid4()) for _ in range(NUM_ENTRIES)]
+    vectors = normalize_rows(rng.standard_normal((NUM_ENTRIES, DIM)))
+    now = datetime.now().isoformat()
+    payloads = [
+        {
+            CONTENT_KEY : f"entry {i}",
+            METADATA_KEY : {
+                "entry_id" : entry_id,
+                "category" : "strategy",
+                "helpful_count" : 1,
+                "harmful_count" : 0,
+                "created_at" : now,
+                "updated_at" : now,
+            }
+        } for i, entry_id in enumerate(entry_ids)
+    ]
+    return entry_ids, vectors, payloads
+
+@pytest.fixture
+def filled(backend, points):
+    entry_ids, vectors, payloads = points
+    for start in range(0, NUM_ENTRIES, 100):
+        end = start + 100
+        backend.upsert(entry_ids[start:end], vectors[start:end].tolist(), payloads[start:end], dim=DIM)
+    return backend
+
+def result_ids(results) -> list[str]:
+    return [doc.metadata['entry_id'] for doc, _ in results]
+
+def test_empty_store(backend, points):
+    _, vectors, _ = points
+    assert backend.count() == 0
+    assert backend.dimension() is None
+    assert backend.search(vectors[0], k=TOP_K) == []
+
+def test_count_and_dimension(filled):
+    assert filled.count() == NUM_ENTRIES
+    assert filled.dimension() == DIM
+
+def test_self_search(filled, points):
+    entry_ids, vectors, _ = points
+    for i in range(20):
+        assert result_ids(filled.search(vectors[i], k=1)) == [entry_ids[i]]
+
+def test_exact_top_k_order(filled, points, rng):
+    entry_ids, vectors, _ = points
+    for query in normalize_rows(rng.standard_normal((20, DIM))):
+        expected = [entry_ids[j] for j in np.argsort(-(vectors @ query))[:TOP_K]]
+        assert result_ids(filled.search(query, k=TOP_K)) == expected
+
+def test_score_threshold(filled, points):
+    entry_ids, vectors, _ = points
+    results = filled.search(vectors[0], k=TOP_K, score_threshold=0.99)
+    assert result_ids(results) == [entry_ids[0]]
+    assert results[0][1] == pytest.approx(1.0, abs=1e-4)
+
+def test_payload(filled, points):
+    _, vectors, _ = points
+    doc = filled.search(vectors[3], k=1)[0][0]
+    assert doc.page_content == "entry 3"
+    assert doc.metadata['category'] == "strategy"
+
+def test_upsert_replaces(filled, points, rng):
+    entry_ids, _, payloads = points
+    replaced = normalize_rows(rng.standard_normal((1, DIM)))
+    filled.upsert([entry_ids[5]], replaced.tolist(), [payloads[5]], dim=DIM)
+    assert filled.count() == NUM_ENTRIES
+    assert result_ids(filled.search(replaced[0], k=1)) == [entry_ids[5]]
+
+def test_delete(filled, points):
+    entry_ids, vectors, _ = points
+    filled.delete(entry_ids[:10])
+    assert filled.count() == NUM_ENTRIES - 10
+    assert {record.entry_id for record in filled.scroll()} == set(entry_ids[10:])
+    assert entry_ids[0] not in result_ids(filled.search(vectors[0], k=TOP_K))
+
+def test_scroll_by_ids(filled, points):
+    entry_ids, vectors, _ = points
+    filled.delete(entry_ids[:2])
+    records = list(filled.scroll(with_vectors=True, entry_ids=entry_ids[10:15] + entry_ids[:2]))
+    assert sorted(record.entry_id for record in records) == sorted(entry_ids[10:15])
+    for record in records:
+        np.testing.assert_allclose(record.vector, vectors[entry_ids.index(record.entry_id)], atol=1e-5)
+
+def test_update_metadata(filled, points, playbook_db):
+    entry_ids, _, _ = points
+    # the playbook row is updated first, then the backend is told about it (as in update_playbook_node)
+    playbook_db.apply_delta(counter_increments=[{"entry_id" : entry_ids[20], "helpful" : 4, "harmful" : 0}])
+    filled.update_metadata({entry_ids[20] : {"helpful_count" : 5, "harmful_count" : 0}})
+    record = next(filled.scroll(entry_ids=[entry_ids[20]]))
+    assert record.payload[METADATA_KEY]['helpful_count'] == 5
+
+def test_update_metadata_skips_missing_points(filled, points):
+    entry_ids, _, _ = points
+    filled.update_metadata({
+        str(uuid.uuid4()) : {"helpful_count" : 9},
+        entry_ids[21] : {"helpful_count" : 7},
+    })
+    record = next(filled.scroll(entry_ids=[entry_ids[21]]))
+    assert filled.count() == NUM_ENTRIES
+    if filled.name == "qdrant":
+        # the `sqlite` backend reads the metadata from the playbook row, which this test doesn't touch
+        assert record.payload[METADATA_KEY]['helpful_count'] == 7
+
+def test_migrate_dimension(filled, points):
+    entry_ids, vectors, _ = points
+    target = DIM // 2
+    migrated = filled.migrate(target, lambda batch : normalize_rows([record.vector[:target] for record in batch]).tolist())
+    assert migrated == NUM_ENTRIES
+    assert filled.dimension() == target
+    truncated = normalize_rows(vectors[30][:target])[0]
+    assert result_ids(filled.search(truncated, k=1)) == [entry_ids[30]]
@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+import numpy as np
+
+from bench_utils import DIM, percentile_ms, timed, playbook_db, random_points
+from module.vector_backend import VectorBackend, QdrantBackend, SQLiteVectorBackend
+from module.vector_index import normalize_rows
+from utils import Logger
+
+logger = Logger(__name__)
+
+BACKENDS = ["qdrant", "sqlite"]
+SIZES = [1_000, 10_000]
+NUM_QUERIES = 200
+TOP_K = 8
+
+def make_backend(kind : str, tmp : str) -> VectorBackend:
+    if kind == "sqlite":
+        return SQLiteVectorBackend(playbook_db(os.path.join(tmp, "playbook.db")), "bench")
+    return QdrantBackend(os.path.join(tmp, "qdrant"), "bench")
+
+def upsert(backend : VectorBackend, entry_ids, vectors, payloads):
+    for start in range(0, len(entry_ids), 1000):
+        end = start + 1000
+        backend.upsert(entry_ids[start:end], vectors[start:end].tolist(), payloads[start:end], dim=DIM)
+
+def bench(kind : str, size : int):
+    rng = np.random.default_rng(1)
+    entry_ids, vectors, payloads = random_points(rng, size)
+    queries = normalize_rows(rng.standard_normal((NUM_QUERIES, DIM)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = make_backend(kind, tmp)
+
+        upsert_s, _ = timed(lambda : upsert(backend, entry_ids, vectors, payloads))
+
+        backend.search(queries[0], k=TOP_K) # first search builds the sqlite snapshot
+        search_times = [timed(lambda : backend.search(query, k=TOP_K))[0] for query in queries]
+
+        def delete_then_search():
+            backend.delete(entry_ids[:1])
+            backend.search(queries[0], k=TOP_K)
+        write_then_search_s, _ = timed(delete_then_search)
+
+        backend.close()
+
+    logger.info(
+        f"{kind:>6} size={size:>6} | upsert {size / upsert_s:9.0f} points/s"
+        f" | search p50={percentile_ms(search_times, 50):7.3f}ms p99={percentile_ms(search_times, 99):7.3f}ms"
+        f" | delete + next search {write_then_search_s * 1000:7.2f}ms"
+    )
+
+def main():
+    for size in SIZES:
+        for kind in BACKENDS:
+            bench(kind, size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import uuid
+import tempfile
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from bench_utils import DIM, percentile_ms, timed
+from module.vector_index import PlaybookVectorIndex, normalize_rows
+from utils import Logger
+
+logger = Logger(__name__)
+
+SIZES = [200, 10_000, 100_000]
+NUM_QUERIES = 200
+TOP_K = 8
+THRESHOLD = 0.42
+
+def build_qdrant(path : str, vectors : np.ndarray, payloads : list[dict]) -> QdrantClient:
+    client = QdrantClient(path=path)
+    client.create_collection(
+        collection_name="bench",
+        vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE)
+    )
+    for start in range(0, len(vectors), 1000):
+        client.upsert(
+            collection_name="bench",
+            points=[
+                models.PointStruct(id=uuid.uuid4().hex, vector=vector.tolist(), payload=payload)
+                for vector, payload in zip(vectors[start:start + 1000], payloads[start:start + 1000])
+            ]
+        )
+    return client
+
+def bench(size : int, rng : np.random.Generator):
+    vectors = normalize_rows(rng.standard_normal((size, DIM)))
+    entry_ids = [str(uuid.uuid4()) for _ in range(size)]
+    payloads = [{"page_content" : f"entry {i}", "metadata" : {"entry_id" : entry_id}} for i, entry_id in enumerate(entry_ids)]
+    # queries close to stored vectors so the threshold actually keeps results
+    queries = normalize_rows(vectors[rng.integers(0, size, NUM_QUERIES)] + 0.5 * rng.standard_normal((NUM_QUERIES, DIM)) / np.sqrt(DIM))
+
+    index = PlaybookVectorIndex(dim=DIM)
+    index.upsert(entry_ids, vectors, payloads)
+
+    index_times = [timed(lambda : index.search(query, k=TOP_K, score_threshold=THRESHOLD))[0] for query in queries]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = build_qdrant(tmp, vectors, payloads)
+        def search(query : np.ndarray):
+            # same calls as the previous retriever path : exact count + search
+            client.count(collection_name="bench", exact=True)
+            client.query_points(collection_name="bench", query=query.tolist(), limit=TOP_K, score_threshold=THRESHOLD, with_payload=True)
+        qdrant_times = [timed(lambda : search(query))[0] for query in queries]
+        client.close()
+
+    logger.info(
+        f"size={size:>7} | index p50={percentile_ms(index_times, 50):8.3f}ms p99={percentile_ms(index_times, 99):8.3f}ms"
+        f" | qdrant p50={percentile_ms(qdrant_times, 50):8.3f}ms p99={percentile_ms(qdrant_times, 99):8.3f}ms"
+    )
+
+def main():
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        bench(size, rng)
+
+
+if __name__ == "__main__":
+    main()